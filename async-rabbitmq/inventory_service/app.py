@@ -3,7 +3,6 @@ InventoryService: Consumes OrderPlaced, reserves inventory (idempotent), publish
 """
 
 import asyncio
-import json
 import logging
 import os
 
@@ -11,37 +10,61 @@ import aio_pika
 from aio_pika import ExchangeType
 
 from common import (
-    get_reservation,
-    init_db,
-    mark_message_processed,
+    DedupStore,
+    codec,
+    metrics,
     new_event_id,
     now_iso,
+    parse_stock_levels,
+    seed_stock,
+    set_stock,
     setup_logging,
-    try_create_reservation,
+    tracing,
 )
+from common.logging import hot_path_logger
 from common.models import InventoryFailedEvent, InventoryReservedEvent, OrderPlacedEvent
+from common.storage import aio as storage_aio
 
 from broker.config import EXCHANGE, QUEUE_ORDER_PLACED, RABBIT_URL
 from broker.setup import setup_queues
 
 setup_logging("inventory-service")
+tracing.configure("inventory-service")
 logger = logging.getLogger(__name__)
+# Per-message logs (one or more per consumed event): rate limited / sampled via LOG_HOT_*
+msg_logger = hot_path_logger(__name__)
 
 DB_PATH = os.environ.get("DB_PATH", "/data/inventory.db")
 FAIL = os.environ.get("INVENTORY_FAIL", "false").lower() in ("1", "true", "yes")
+# Idempotency: in-memory cache in front of processed_messages, plus retention pruning
+DEDUP_CACHE_SIZE = int(os.environ.get("DEDUP_CACHE_SIZE", "100000"))
+DEDUP_TTL_SECONDS = float(os.environ.get("DEDUP_TTL_SECONDS", "3600"))
+DEDUP_RETENTION_SECONDS = float(os.environ.get("DEDUP_RETENTION_SECONDS", str(7 * 24 * 3600)))
+DEDUP_PRUNE_INTERVAL_SECONDS = float(os.environ.get("DEDUP_PRUNE_INTERVAL_SECONDS", "300"))
+DEDUP_BLOOM_CAPACITY = int(os.environ.get("DEDUP_BLOOM_CAPACITY", "0"))
+# Initial stock per SKU, e.g. "burger=100,fries=200"; unlisted SKUs are untracked (unlimited).
+# Only SKUs missing from the ledger are seeded; INVENTORY_STOCK_RESET=true overwrites on start.
+INVENTORY_STOCK = parse_stock_levels(os.environ.get("INVENTORY_STOCK", ""))
+INVENTORY_STOCK_RESET = os.environ.get("INVENTORY_STOCK_RESET", "false").lower() in ("1", "true", "yes")
+# Prometheus side port (common.metrics); 0 disables
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9100"))
+
+CONSUMED = metrics.counter("messages_consumed_total", "Messages consumed", ["queue", "result"])
+HANDLE_SECONDS = metrics.histogram("message_handle_seconds", "Per-message handling latency", ["queue"])
+PUBLISHED = metrics.counter("messages_published_total", "Messages published", ["routing_key"])
+PUBLISH_SECONDS = metrics.histogram("publish_seconds", "Broker publish latency", ["routing_key"])
 
 
 async def process_order_placed(body: bytes) -> OrderPlacedEvent | None:
-    """Parse OrderPlacedEvent from JSON. Returns None if malformed (poison)."""
+    """Parse OrderPlacedEvent from JSON bytes in one pass. Returns None if malformed (poison)."""
     try:
-        data = json.loads(body)
-        return OrderPlacedEvent.model_validate(data)
-    except (json.JSONDecodeError, Exception) as e:
+        return codec.decode(body, OrderPlacedEvent)
+    except Exception as e:
         logger.warning("Malformed OrderPlaced message (rejecting to DLQ): %s", type(e).__name__)
         return None
 
 
-async def run_consumer():
+async def run_consumer(dedup: DedupStore):
     connection = await aio_pika.connect_robust(RABBIT_URL)
     channel = await connection.channel()
     await channel.set_qos(prefetch_count=1)
@@ -50,22 +73,40 @@ async def run_consumer():
     exchange = await channel.declare_exchange(EXCHANGE, ExchangeType.TOPIC, durable=True)
     queues = await setup_queues(channel)
     queue = queues["order_placed"]
+    handle_seconds = HANDLE_SECONDS.labels(QUEUE_ORDER_PLACED)
+
+    async def publish(event, routing_key: str) -> None:
+        with PUBLISH_SECONDS.labels(routing_key).time(), tracing.span(f"publish {routing_key}"):
+            await exchange.publish(
+                aio_pika.Message(
+                    body=codec.encode(event),
+                    content_type=codec.CONTENT_TYPE,
+                    headers=tracing.inject(),
+                ),
+                routing_key=routing_key,
+            )
+        PUBLISHED.labels(routing_key).inc()
 
     async def on_message(message: aio_pika.abc.AbstractIncomingMessage):
+        with handle_seconds.time(), tracing.span_from(message.headers, "consume OrderPlaced"):
+            result = await handle(message)
+        CONSUMED.labels(QUEUE_ORDER_PLACED, result).inc()
+
+    async def handle(message: aio_pika.abc.AbstractIncomingMessage) -> str:
         async with message.process(ignore_processed=True):
             event = await process_order_placed(message.body)
             if event is None:
                 # Poison message: nack without requeue -> goes to DLQ
                 await message.reject(requeue=False)
-                return
+                return "poison"
 
             event_id = event.event_id
             order_id = event.order.order_id
 
             # Idempotency: skip if already processed
-            if not mark_message_processed(DB_PATH, event_id):
-                logger.info("Duplicate event %s (order %s), skipping", event_id, order_id)
-                return
+            if not await dedup.mark_processed_async(event_id):
+                msg_logger.info("Duplicate event %s (order %s), skipping", event_id, order_id)
+                return "duplicate"
 
             if FAIL:
                 fail_evt = InventoryFailedEvent.from_order(
@@ -75,26 +116,28 @@ async def run_consumer():
                     created_at=now_iso(),
                     correlation_id=order_id,
                 )
-                await exchange.publish(
-                    aio_pika.Message(
-                        body=fail_evt.model_dump_json().encode(),
-                        content_type="application/json",
-                    ),
-                    routing_key="InventoryFailed",
-                )
-                logger.info("Order %s inventory failed (simulated)", order_id)
-                return
+                await publish(fail_evt, "InventoryFailed")
+                msg_logger.info("Order %s inventory failed (simulated)", order_id)
+                return "failed"
 
-            created = try_create_reservation(
+            # Atomic per-SKU stock decrement; idempotent per order_id
+            status, reason = await storage_aio.reserve_stock(
                 DB_PATH,
                 order_id,
-                "RESERVED",
+                event.order.items,
                 event.order.model_dump(),
             )
-            if not created:
-                existing = get_reservation(DB_PATH, order_id)
-                if existing and existing["status"] == "RESERVED":
-                    logger.info("Order %s already reserved (idempotent)", order_id)
+            if status == "FAILED":
+                fail_evt = InventoryFailedEvent.from_order(
+                    order_id=order_id,
+                    reason=reason,
+                    event_id=new_event_id(),
+                    created_at=now_iso(),
+                    correlation_id=order_id,
+                )
+                await publish(fail_evt, "InventoryFailed")
+                msg_logger.info("Order %s inventory failed: %s", order_id, reason)
+                return "failed"
 
             reserved_evt = InventoryReservedEvent.from_order(
                 order_id=order_id,
@@ -102,22 +145,28 @@ async def run_consumer():
                 created_at=now_iso(),
                 correlation_id=order_id,
             )
-            await exchange.publish(
-                aio_pika.Message(
-                    body=reserved_evt.model_dump_json().encode(),
-                    content_type="application/json",
-                ),
-                routing_key="InventoryReserved",
-            )
-            logger.info("Order %s inventory reserved", order_id)
+            await publish(reserved_evt, "InventoryReserved")
+            msg_logger.info("Order %s inventory reserved", order_id)
+            return "reserved"
 
     await queue.consume(on_message)
     logger.info("InventoryService consuming %s", QUEUE_ORDER_PLACED)
 
 
 async def main():
-    init_db(DB_PATH)
-    await run_consumer()
+    if METRICS_PORT:
+        metrics.start_http_server(METRICS_PORT)
+    await storage_aio.init_db(DB_PATH)
+    (set_stock if INVENTORY_STOCK_RESET else seed_stock)(DB_PATH, INVENTORY_STOCK)
+    dedup = DedupStore(
+        DB_PATH,
+        cache_size=DEDUP_CACHE_SIZE,
+        ttl_seconds=DEDUP_TTL_SECONDS,
+        retention_seconds=DEDUP_RETENTION_SECONDS,
+        bloom_capacity=DEDUP_BLOOM_CAPACITY,
+    )
+    dedup.start_pruning(DEDUP_PRUNE_INTERVAL_SECONDS)
+    await run_consumer(dedup)
     await asyncio.Future()
 
 
@@ -3,19 +3,28 @@ NotificationService: Consumes InventoryReserved and sends confirmation.
 """
 
 import asyncio
-import json
 import logging
+import os
 
 import aio_pika
 
-from common import setup_logging
+from common import codec, metrics, setup_logging, tracing
+from common.logging import hot_path_logger
 from common.models import InventoryReservedEvent
 
 from broker.config import QUEUE_INVENTORY_RESERVED, RABBIT_URL
 from broker.setup import setup_queues
 
 setup_logging("notification-service")
+tracing.configure("notification-service")
 logger = logging.getLogger(__name__)
+msg_logger = hot_path_logger(__name__)
+
+# Prometheus side port (common.metrics); 0 disables
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9100"))
+
+CONSUMED = metrics.counter("messages_consumed_total", "Messages consumed", ["queue", "result"])
+HANDLE_SECONDS = metrics.histogram("message_handle_seconds", "Per-message handling latency", ["queue"])
 
 
 async def run_consumer():
@@ -32,18 +41,23 @@ async def run_consumer():
     await channel.set_qos(prefetch_count=1)
     queues = await setup_queues(channel)
     queue = queues["inventory_reserved"]
+    handle_seconds = HANDLE_SECONDS.labels(QUEUE_INVENTORY_RESERVED)
+    sent = CONSUMED.labels(QUEUE_INVENTORY_RESERVED, "sent")
 
     async def on_message(message: aio_pika.abc.AbstractIncomingMessage):
-        async with message.process(ignore_processed=True):
-            data = json.loads(message.body)
-            evt = InventoryReservedEvent.model_validate(data)
-            logger.info("Notification: order %s confirmed for user (correlation %s)", evt.order_id, evt.correlation_id)
+        with handle_seconds.time(), tracing.span_from(message.headers, "consume InventoryReserved"):
+            async with message.process(ignore_processed=True):
+                evt = codec.decode(message.body, InventoryReservedEvent)
+                msg_logger.info("Notification: order %s confirmed for user (correlation %s)", evt.order_id, evt.correlation_id)
+        sent.inc()
 
     await queue.consume(on_message)
     logger.info("NotificationService consuming %s", QUEUE_INVENTORY_RESERVED)
 
 
 async def main():
+    if METRICS_PORT:
+        metrics.start_http_server(METRICS_PORT)
     await run_consumer()
     await asyncio.Future()
 
@@ -2,27 +2,74 @@
 OrderService: HTTP API to place orders. Writes to local store and publishes OrderPlaced.
 """
 
+import asyncio
 import json
 import logging
 import os
 
 import aio_pika
 from aio_pika import ExchangeType
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Response
 
-from common import init_db, new_event_id, new_order_id, now_iso, save_order, setup_logging
+from common import GroupCommitWriter, codec, http_cache, init_db, metrics, new_event_id, new_order_id, now_iso, setup_logging, tracing
+from common.admission import AdmissionController, AdmissionMiddleware
+from common.idempotency import MAX_KEY_LENGTH, IdempotencyCache, IdempotencyKeyReused, fingerprint
+from common.logging import hot_path_logger
 from common.models import Order, OrderCreateRequest, OrderPlacedEvent
+from common.storage import aio as storage_aio
 
 from broker.config import EXCHANGE, RABBIT_URL
 
 setup_logging("order-service")
+tracing.configure("order-service")
 logger = logging.getLogger(__name__)
+msg_logger = hot_path_logger(__name__)
 
 app = FastAPI()
 
 DB_PATH = os.environ.get("DB_PATH", "/data/orders.db")
+ORDER_COMMIT_MAX_BATCH = int(os.environ.get("ORDER_COMMIT_MAX_BATCH", "256"))
+ORDER_COMMIT_MAX_DELAY_MS = float(os.environ.get("ORDER_COMMIT_MAX_DELAY_MS", "2"))
+# Idempotency-Key: responses kept this long (in memory, bounded) for replay
+IDEMPOTENCY_TTL_S = float(os.environ.get("IDEMPOTENCY_TTL_S", "86400"))
+IDEMPOTENCY_MAX_KEYS = int(os.environ.get("IDEMPOTENCY_MAX_KEYS", "100000"))
+# GET /order/{id}: how long clients / caches may reuse a response before revalidating
+ORDER_CACHE_MAX_AGE_S = int(os.environ.get("ORDER_CACHE_MAX_AGE_S", "1"))
+_ORDER_CACHE_CONTROL = http_cache.cache_control(ORDER_CACHE_MAX_AGE_S)
+# Admission control for POST /order (common.admission), opt-in: a slow broker or
+# disk sheds with 503 + Retry-After instead of queueing unbounded requests
+ADMISSION_CONTROL = os.environ.get("ADMISSION_CONTROL", "false").lower() in ("1", "true", "yes")
+ADMISSION_LIMIT = int(os.environ.get("ADMISSION_LIMIT", "64"))
+ADMISSION_ADAPTIVE = os.environ.get("ADMISSION_ADAPTIVE", "true").lower() in ("1", "true", "yes")
+ADMISSION_MIN_LIMIT = int(os.environ.get("ADMISSION_MIN_LIMIT", "8"))
+ADMISSION_MAX_LIMIT = int(os.environ.get("ADMISSION_MAX_LIMIT", "512"))
+ADMISSION_QUEUE_TARGET_MS = float(os.environ.get("ADMISSION_QUEUE_TARGET_MS", "50"))
+ADMISSION_MAX_QUEUE = int(os.environ.get("ADMISSION_MAX_QUEUE", "1000"))
+if ADMISSION_CONTROL:
+    app.add_middleware(
+        AdmissionMiddleware,
+        controller=AdmissionController(
+            "order",
+            limit=ADMISSION_LIMIT,
+            min_limit=ADMISSION_MIN_LIMIT,
+            max_limit=ADMISSION_MAX_LIMIT,
+            adaptive=ADMISSION_ADAPTIVE,
+            queue_target_s=ADMISSION_QUEUE_TARGET_MS / 1000.0,
+            max_queue=ADMISSION_MAX_QUEUE,
+        ),
+        routes={("POST", "/order")},
+    )
 _connection = None
 _exchange = None
+_order_writer: GroupCommitWriter | None = None
+# Failed publishes are not stored: the retry republishes under the same order_id
+_idempotency = IdempotencyCache("order", ttl_s=IDEMPOTENCY_TTL_S, max_entries=IDEMPOTENCY_MAX_KEYS)
+
+ORDERS = metrics.counter("orders_created_total", "Orders accepted by POST /order")
+ORDER_SECONDS = metrics.histogram("order_create_seconds", "POST /order latency")
+ORDER_READS = metrics.counter("order_reads_total", "GET /order/{order_id} responses", ["status"])
+PUBLISHED = metrics.counter("messages_published_total", "Messages published", ["routing_key"])
+PUBLISH_SECONDS = metrics.histogram("publish_seconds", "Broker publish latency", ["routing_key"])
 
 
 async def get_exchange() -> aio_pika.abc.AbstractExchange:
@@ -38,12 +85,80 @@ async def get_exchange() -> aio_pika.abc.AbstractExchange:
 
 @app.on_event("startup")
 def startup():
+    global _order_writer
     init_db(DB_PATH)
+    _order_writer = GroupCommitWriter(DB_PATH, ORDER_COMMIT_MAX_BATCH, ORDER_COMMIT_MAX_DELAY_MS)
+
+
+@app.on_event("shutdown")
+def shutdown():
+    if _order_writer is not None:
+        _order_writer.close()
+
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text format (common.metrics)."""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/order/{order_id}")
+async def read_order(order_id: str, response: Response, if_none_match: str | None = Header(None)):
+    """
+    Order and its current status. Strong ETag; If-None-Match with the current
+    ETag gets 304 (no body). Served from the storage read cache when possible,
+    so polling costs no SQLite read.
+    """
+    found = await storage_aio.get_order(DB_PATH, order_id)
+    if found is None:
+        ORDER_READS.labels(404).inc()
+        raise HTTPException(status_code=404, detail="Order not found")
+    order, status = found
+    headers = {"ETag": http_cache.order_etag(order, status), "Cache-Control": _ORDER_CACHE_CONTROL}
+    if http_cache.if_none_match(if_none_match, headers["ETag"]):
+        ORDER_READS.labels(304).inc()
+        return Response(status_code=304, headers=headers)
+    ORDER_READS.labels(200).inc()
+    response.headers.update(headers)
+    return {**order.model_dump(), "status": status}
 
 
 @app.post("/order")
-async def create_order(payload: OrderCreateRequest):
-    order_id = new_order_id()
+async def create_order(
+    payload: OrderCreateRequest,
+    response: Response,
+    idempotency_key: str | None = Header(None),
+):
+    """
+    With an Idempotency-Key header, repeats get the first response back
+    (Idempotent-Replayed: true) and publish nothing; concurrent repeats wait
+    for the first one. The same key with a different body is a 422.
+    """
+    if idempotency_key is None:
+        return await _place_order(payload, new_order_id())  # also the correlation_id / trace id
+    if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+    try:
+        result, replayed = await _idempotency.run(
+            idempotency_key,
+            fingerprint(codec.encode(payload)),
+            lambda order_id: _place_order(payload, order_id),
+        )
+    except IdempotencyKeyReused as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+
+async def _place_order(payload: OrderCreateRequest, order_id: str):
+    with ORDER_SECONDS.time(), tracing.span("POST /order", trace_id=order_id):
+        result = await _create_order(payload, order_id)
+    ORDERS.inc()
+    return result
+
+
+async def _create_order(payload: OrderCreateRequest, order_id: str):
     created_at = now_iso()
     order = Order(
         order_id=order_id,
@@ -51,7 +166,9 @@ async def create_order(payload: OrderCreateRequest):
         items=payload.items,
         created_at=created_at,
     )
-    save_order(DB_PATH, order, "PENDING")
+    # Group commit: resolves once the row is durable
+    with tracing.span("save order"):
+        await asyncio.wrap_future(_order_writer.submit(order, "PENDING"))
 
     event = OrderPlacedEvent.from_order(
         order=order,
@@ -61,12 +178,15 @@ async def create_order(payload: OrderCreateRequest):
     )
 
     exchange = await get_exchange()
-    await exchange.publish(
-        aio_pika.Message(
-            body=event.model_dump_json().encode(),
-            content_type="application/json",
-        ),
-        routing_key="OrderPlaced",
-    )
-    logger.info("Order %s placed, OrderPlaced published", order_id)
+    with PUBLISH_SECONDS.labels("OrderPlaced").time(), tracing.span("publish OrderPlaced"):
+        await exchange.publish(
+            aio_pika.Message(
+                body=codec.encode(event),
+                content_type=codec.CONTENT_TYPE,
+                headers=tracing.inject(),
+            ),
+            routing_key="OrderPlaced",
+        )
+    PUBLISHED.labels("OrderPlaced").inc()
+    msg_logger.info("Order %s placed, OrderPlaced published", order_id)
     return {"order_id": order_id, "status": "PENDING"}
@@ -4,7 +4,7 @@ Shared common module for sync-rest, async-rabbitmq, and streaming-kafka services
 Framework-agnostic; no FastAPI dependency. Uses Pydantic v2 for schemas.
 """
 
-from common.ids import new_event_id, new_order_id, now_iso
+from common.ids import new_event_id, new_event_ids, new_order_id, now_iso
 from common.logging import setup_logging
 from common.models import (
     BaseEvent,
@@ -19,19 +19,35 @@ from common.models import (
     ReserveResult,
 )
 from common.storage import (
+    close_all_connections,
+    configure_read_cache,
+    configure_storage,
+    count_processed_messages,
     get_order,
     get_reservation,
     init_db,
+    is_message_processed,
     mark_message_processed,
+    mark_messages_processed_many,
     save_order,
+    prune_processed_messages,
+    read_cache_stats,
+    save_orders_many,
     try_create_reservation,
+    try_create_reservations_many,
     update_order_status,
 )
+from common.storage.codec import configure_payload_codec, migrate_payload_format
+from common.storage.dedup import DedupStore
+from common.storage.group_commit import GroupCommitWriter
+from common.storage.queries import list_orders
+from common.storage.stock import get_stock, parse_stock_levels, reserve_stock, reserve_stock_many, seed_stock, set_stock
 from common.timeutils import floor_to_minute, iso_to_dt, utc_now
 
 __all__ = [
     "new_order_id",
     "new_event_id",
+    "new_event_ids",
     "now_iso",
     "setup_logging",
     "Item",
@@ -45,12 +61,33 @@ __all__ = [
     "InventoryReservedEvent",
     "InventoryFailedEvent",
     "init_db",
+    "configure_storage",
+    "close_all_connections",
+    "configure_read_cache",
+    "read_cache_stats",
     "save_order",
     "get_order",
     "update_order_status",
     "try_create_reservation",
     "get_reservation",
     "mark_message_processed",
+    "save_orders_many",
+    "try_create_reservations_many",
+    "mark_messages_processed_many",
+    "is_message_processed",
+    "prune_processed_messages",
+    "count_processed_messages",
+    "parse_stock_levels",
+    "seed_stock",
+    "set_stock",
+    "get_stock",
+    "reserve_stock",
+    "reserve_stock_many",
+    "list_orders",
+    "configure_payload_codec",
+    "migrate_payload_format",
+    "GroupCommitWriter",
+    "DedupStore",
     "utc_now",
     "floor_to_minute",
     "iso_to_dt",
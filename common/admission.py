@@ -0,0 +1,257 @@
+"""
+Admission control for HTTP services: a concurrency limit on the expensive
+routes, a short FIFO queue in front of it, and early load shedding (503 +
+Retry-After) once queueing delay passes a target.
+
+    controller = AdmissionController("order", limit=64, queue_target_s=0.05)
+    app.add_middleware(AdmissionMiddleware, controller=controller, routes={("POST", "/order")})
+
+A request that finds a free slot runs at once. Otherwise it queues, and is
+shed without waiting when the estimated wait (requests ahead x recent
+service time / limit) is already past queue_target_s, when max_queue
+requests are waiting, or when it has waited queue_target_s without getting
+a slot. Shed requests cost a few µs instead of holding a connection and
+memory until a downstream timeout.
+
+With adaptive=True the limit follows measured service time (gradient, as in
+Netflix concurrency-limits' Gradient2): a short and a long moving average
+of latency, gradient = clamp(tolerance x long / short, 0.5, 1), and each
+completion moves the limit towards limit x gradient + sqrt(limit). Latency
+at the baseline lets the limit grow, but only while requests actually use
+most of it; latency rising past tolerance x baseline (a slow dependency)
+shrinks it, so excess requests are queued and shed here instead of piling
+up downstream. The limit stays within [min_limit, max_limit].
+
+All calls come from one event loop, so there are no locks.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable
+
+from common import metrics
+
+REQUESTS = metrics.counter(
+    "admission_requests_total", "Admission decisions (admitted, shed_queue_full, shed_queue_delay)", ["name", "result"]
+)
+QUEUE_SECONDS = metrics.histogram("admission_queue_seconds", "Time admitted requests waited for a slot", ["name"])
+LIMIT = metrics.gauge("admission_limit", "Current concurrency limit", ["name"])
+INFLIGHT = metrics.gauge("admission_inflight", "Admitted requests in progress", ["name"])
+QUEUED = metrics.gauge("admission_queue_depth", "Requests waiting for a slot", ["name"])
+
+ADMITTED, SHED_QUEUE_FULL, SHED_QUEUE_DELAY = "admitted", "shed_queue_full", "shed_queue_delay"
+
+
+class Overloaded(Exception):
+    """The request was shed; retry_after_s is a hint for the Retry-After header."""
+
+    def __init__(self, reason: str, retry_after_s: float) -> None:
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after_s = retry_after_s
+
+
+class AdmissionController:
+    """
+    >>> import asyncio
+    >>> ac = AdmissionController("doc", limit=2, min_limit=1, adaptive=False, queue_target_s=0.05)
+    >>> async def demo():
+    ...     await ac.acquire(); await ac.acquire()          # both slots taken
+    ...     waiter = asyncio.ensure_future(ac.acquire())
+    ...     await asyncio.sleep(0)
+    ...     queued = ac.queued
+    ...     ac.release(0.01)                                # slot handed to the waiter
+    ...     await waiter
+    ...     try:
+    ...         await ac.acquire()                          # waits 50 ms, no slot frees up
+    ...     except Overloaded as e:
+    ...         return queued, ac.inflight, e.reason
+    >>> asyncio.run(demo())
+    (1, 2, 'shed_queue_delay')
+    """
+
+    def __init__(
+        self,
+        name: str,
+        limit: int = 64,
+        min_limit: int = 4,
+        max_limit: int = 512,
+        adaptive: bool = True,
+        queue_target_s: float = 0.05,
+        max_queue: int = 1000,
+        tolerance: float = 1.5,
+        smoothing: float = 0.2,
+        short_window: int = 10,
+        long_window: int = 500,
+    ) -> None:
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.adaptive = adaptive
+        self.queue_target_s = queue_target_s
+        self.max_queue = max_queue
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self._limit = float(max(min_limit, min(max_limit, limit)))
+        self._short_alpha = 2.0 / (short_window + 1)
+        self._long_alpha = 2.0 / (long_window + 1)
+        self._short = self._long = 0.0  # seconds; 0 until the first completion
+        self.inflight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._admitted = REQUESTS.labels(name, ADMITTED)
+        self._shed_full = REQUESTS.labels(name, SHED_QUEUE_FULL)
+        self._shed_delay = REQUESTS.labels(name, SHED_QUEUE_DELAY)
+        self._queue_seconds = QUEUE_SECONDS.labels(name)
+        self._limit_gauge = LIMIT.labels(name)
+        self._inflight_gauge = INFLIGHT.labels(name)
+        self._queued_gauge = QUEUED.labels(name)
+        self._limit_gauge.set(int(self._limit))
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def estimated_wait(self, position: int) -> float:
+        """Seconds until the request at queue position `position` (1 = next) should get a slot."""
+        return position * self._short / self._limit
+
+    def _shed(self, counter: Any, reason: str, wait_s: float) -> Overloaded:
+        counter.inc()
+        return Overloaded(reason, max(wait_s, self.queue_target_s))
+
+    async def acquire(self) -> float:
+        """Wait for a slot; returns the time spent queued. Raises Overloaded when shed."""
+        if self.inflight < self.limit and not self._waiters:
+            self.inflight += 1
+            self._inflight_gauge.set(self.inflight)
+            self._admitted.inc()
+            self._queue_seconds.observe(0.0)
+            return 0.0
+        if len(self._waiters) >= self.max_queue:
+            raise self._shed(self._shed_full, SHED_QUEUE_FULL, self.estimated_wait(len(self._waiters)))
+        wait = self.estimated_wait(len(self._waiters) + 1)
+        if wait > self.queue_target_s:
+            raise self._shed(self._shed_delay, SHED_QUEUE_DELAY, wait)
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        self._queued_gauge.set(len(self._waiters))
+        timer = loop.call_later(self.queue_target_s, self._expire, waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release_slot()  # the slot was handed over as the caller went away
+            else:
+                self._remove(waiter)
+            raise
+        finally:
+            timer.cancel()
+        queued_s = loop.time() - start
+        self._admitted.inc()
+        self._queue_seconds.observe(queued_s)
+        return queued_s
+
+    def _expire(self, waiter: asyncio.Future) -> None:
+        if not waiter.done():
+            self._remove(waiter)
+            waiter.set_exception(self._shed(self._shed_delay, SHED_QUEUE_DELAY, self.estimated_wait(len(self._waiters))))
+
+    def _remove(self, waiter: asyncio.Future) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+        self._queued_gauge.set(len(self._waiters))
+
+    def _release_slot(self) -> None:
+        self.inflight -= 1
+        while self._waiters and self.inflight < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.inflight += 1
+                waiter.set_result(None)
+        self._inflight_gauge.set(self.inflight)
+        self._queued_gauge.set(len(self._waiters))
+
+    def release(self, latency_s: float) -> None:
+        """Call once per successful acquire(), with the request's service time (not its queue time)."""
+        inflight = self.inflight
+        if self._short == 0.0:
+            self._short = self._long = latency_s
+        else:
+            self._short += self._short_alpha * (latency_s - self._short)
+            self._long += self._long_alpha * (latency_s - self._long)
+        if self.adaptive:
+            self._update_limit(inflight)
+        self._release_slot()
+
+    def _update_limit(self, inflight: int) -> None:
+        if self._long > 2 * self._short:
+            self._long *= 0.95  # latency dropped well below the baseline: let the baseline follow
+        gradient = max(0.5, min(1.0, self.tolerance * self._long / self._short)) if self._short > 0 else 1.0
+        target = self._limit * gradient + math.sqrt(self._limit)
+        if target > self._limit and inflight < self._limit / 2:
+            return  # app-limited: most of the limit is unused, so latency says nothing about a higher one
+        limit = self._limit * (1 - self.smoothing) + target * self.smoothing
+        self._limit = max(float(self.min_limit), min(float(self.max_limit), limit))
+        self._limit_gauge.set(int(self._limit))
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware: requests whose (method, path) is in routes go through
+    controller; shed ones get 503 {"detail": ...} with Retry-After (whole
+    seconds, at least 1). Other routes (/metrics, reads) are never shed.
+    """
+
+    def __init__(
+        self,
+        app: Callable[..., Awaitable[None]],
+        controller: AdmissionController,
+        routes: set[tuple[str, str]],
+    ) -> None:
+        self.app = app
+        self.controller = controller
+        self.routes = routes
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or (scope["method"], scope["path"]) not in self.routes:
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.controller.acquire()
+        except Overloaded as e:
+            await _send_503(send, e)
+            return
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(time.perf_counter() - start)
+
+
+async def _send_503(send: Callable, e: Overloaded) -> None:
+    body = b'{"detail":"Overloaded, retry later"}'
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(e.retry_after_s))).encode()),
+                (b"x-shed-reason", e.reason.encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,75 @@
+"""
+Wire codec for events and other common.models payloads.
+
+Decodes bytes straight into a model in one pass (pydantic-core parses and
+validates together, no intermediate dict from json.loads) and serializes
+straight to bytes (no str round trip through model_dump_json().encode()).
+The TypeAdapter for each type is built once and cached, and its compiled
+validator / serializer are called directly, skipping the per-call option
+handling of TypeAdapter.validate_json() / dump_json().
+
+    body = encode(event)                      # publish
+    event = decode(message.body, OrderPlacedEvent)   # consume
+    event = decode_event(message.body)        # any event, by event_type
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Annotated, Any, TypeVar, Union
+
+from pydantic import Field, TypeAdapter
+
+from common.models import InventoryFailedEvent, InventoryReservedEvent, OrderPlacedEvent
+
+T = TypeVar("T")
+
+CONTENT_TYPE = "application/json"
+
+AnyEvent = Annotated[
+    Union[OrderPlacedEvent, InventoryReservedEvent, InventoryFailedEvent],
+    Field(discriminator="event_type"),
+]
+
+
+@lru_cache(maxsize=None)
+def adapter(tp: Any) -> TypeAdapter:
+    """Cached TypeAdapter for tp (a model class or any annotated type)."""
+    return TypeAdapter(tp)
+
+
+def encode(value: Any) -> bytes:
+    """
+    Serialize a model (or anything with a TypeAdapter) to JSON bytes.
+
+    >>> from common.models import InventoryReservedEvent
+    >>> encode(InventoryReservedEvent(event_id="e1", created_at="t", order_id="o1"))
+    b'{"event_id":"e1","event_type":"InventoryReserved","created_at":"t","correlation_id":null,"order_id":"o1"}'
+    """
+    return adapter(type(value)).serializer.to_json(value)
+
+
+def decode(raw: bytes | str, tp: type[T]) -> T:
+    """
+    Parse and validate raw JSON into tp in a single pass.
+    Raises pydantic.ValidationError (also for malformed JSON).
+
+    >>> decode(b'{"event_id":"e1","created_at":"t","order_id":"o1"}', InventoryReservedEvent).order_id
+    'o1'
+    >>> decode(b"not json", InventoryReservedEvent)
+    Traceback (most recent call last):
+    ...
+    pydantic_core._pydantic_core.ValidationError: 1 validation error for InventoryReservedEvent
+    ...
+    """
+    return adapter(tp).validator.validate_json(raw)
+
+
+def decode_event(raw: bytes | str) -> OrderPlacedEvent | InventoryReservedEvent | InventoryFailedEvent:
+    """
+    Decode any event, choosing the model from its event_type.
+
+    >>> type(decode_event(b'{"event_id":"e1","event_type":"InventoryFailed","created_at":"t","order_id":"o1","reason":"x"}')).__name__
+    'InventoryFailedEvent'
+    """
+    return adapter(AnyEvent).validator.validate_json(raw)
@@ -0,0 +1,73 @@
+"""
+HTTP conditional-request helpers for read endpoints (framework-agnostic).
+
+    tag = order_etag(order, status)
+    if if_none_match(request.headers.get("if-none-match"), tag):
+        -> 304 with ETag / Cache-Control, no body
+    else:
+        -> 200 with ETag / Cache-Control
+
+An order's representation changes only when its stored row changes:
+the status, or created_at when an idempotent retry re-saves it. The ETag is
+a digest of those plus order_id, so it is strong and can be computed
+without serializing the body. A 304 costs a read-cache lookup and a hash.
+"""
+
+from __future__ import annotations
+
+import hashlib
+
+from common.models import Order
+
+
+def order_etag(order: Order, status: str) -> str:
+    """
+    Strong ETag (quoted) for GET /order/{order_id}.
+
+    >>> from common.models import Order
+    >>> o = Order(order_id="o1", user_id="u1", items=[], created_at="2024-01-01T00:00:00.000000Z")
+    >>> order_etag(o, "PENDING") == order_etag(o, "PENDING") != order_etag(o, "CONFIRMED")
+    True
+    >>> order_etag(o, "PENDING")[0], len(order_etag(o, "PENDING"))
+    ('"', 34)
+    """
+    digest = hashlib.blake2b(
+        f"{order.order_id}\0{order.created_at}\0{status}".encode(), digest_size=16
+    ).hexdigest()
+    return f'"{digest}"'
+
+
+def if_none_match(header: str | None, etag: str) -> bool:
+    """
+    True if an If-None-Match header matches etag, meaning the client's copy
+    is current and the response should be 304. Weak comparison, as RFC 9110
+    requires for If-None-Match: a W/ prefix is ignored.
+
+    >>> if_none_match('"a", W/"b"', '"b"'), if_none_match("*", '"x"'), if_none_match('"a"', '"b"')
+    (True, True, False)
+    >>> if_none_match(None, '"b"')
+    False
+    """
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def cache_control(max_age_s: int) -> str:
+    """
+    Cache-Control for a representation that may still change (a pending order).
+    Clients and shared caches may reuse it for max_age_s, then must revalidate;
+    the revalidation is a cheap If-None-Match -> 304.
+
+    >>> cache_control(2), cache_control(0)
+    ('max-age=2, must-revalidate', 'no-cache')
+    """
+    return f"max-age={max_age_s}, must-revalidate" if max_age_s > 0 else "no-cache"
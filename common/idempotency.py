@@ -0,0 +1,159 @@
+"""
+Idempotency-Key handling for POST endpoints: the first request with a key
+runs, and repeats within the TTL get its stored result back without running
+again. Concurrent requests with the same key wait for the in-flight one
+instead of starting their own (coalescing).
+
+    cache = IdempotencyCache("order", ttl_s=86400)
+    result, replayed = await cache.run(key, fingerprint(body), lambda order_id: create(order_id))
+
+Each key gets a stable id (new_order_id()) on first sight, passed to every
+attempt. Results and errors accepted by store_error are stored. Other
+errors (timeouts, 5xx) are not, so the client's retry runs again, but with
+the same id: downstream steps that are idempotent per order_id (reservations,
+order upserts) are not repeated.
+
+Reusing a key with a different request body raises IdempotencyKeyReused.
+Entries live in this process only (one process per service here, as for the
+storage read cache); expired entries are dropped lazily and the oldest are
+evicted beyond max_entries. All calls come from one event loop, so there are
+no locks.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+from common import metrics
+from common.ids import new_order_id
+
+REQUESTS = metrics.counter(
+    "idempotency_requests_total", "Requests carrying an Idempotency-Key", ["name", "result"]
+)
+KEYS = metrics.gauge("idempotency_keys", "Idempotency keys held in memory", ["name"])
+
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyKeyReused(ValueError):
+    """The key was already used for a request with a different body."""
+
+
+def fingerprint(body: bytes) -> str:
+    """
+    Digest of the request body, stored with the key.
+
+    >>> fingerprint(b'{"a":1}') == fingerprint(b'{"a":1}') != fingerprint(b'{"a":2}')
+    True
+    """
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "request_id", "expires_at", "future")
+
+    def __init__(self, fingerprint: str, request_id: str, expires_at: float) -> None:
+        self.fingerprint = fingerprint
+        self.request_id = request_id
+        self.expires_at = expires_at
+        self.future: asyncio.Future | None = None
+
+
+class IdempotencyCache:
+    """
+    >>> import asyncio
+    >>> cache = IdempotencyCache("doc", ttl_s=60)
+    >>> calls = []
+    >>> async def create(order_id):
+    ...     calls.append(order_id)
+    ...     await asyncio.sleep(0.01)
+    ...     return {"order_id": order_id}
+    >>> async def demo():
+    ...     first = await asyncio.gather(*(cache.run("k1", "fp", create) for _ in range(3)))
+    ...     again = await cache.run("k1", "fp", create)
+    ...     return [replayed for _, replayed in first], again[1], len(calls)
+    >>> asyncio.run(demo())              # one execution: two coalesced, one replayed
+    ([False, True, True], True, 1)
+    >>> asyncio.run(cache.run("k1", "other-body", create))
+    Traceback (most recent call last):
+    ...
+    common.idempotency.IdempotencyKeyReused: Idempotency-Key reused with a different request body
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl_s: float = 86400.0,
+        max_entries: int = 100_000,
+        store_error: Callable[[Exception], bool] | None = None,
+    ) -> None:
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self._store_error = store_error or (lambda e: False)
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._miss = REQUESTS.labels(name, "miss")
+        self._retry = REQUESTS.labels(name, "retry")
+        self._replayed = REQUESTS.labels(name, "replayed")
+        self._coalesced = REQUESTS.labels(name, "coalesced")
+        self._conflict = REQUESTS.labels(name, "conflict")
+        self._size = KEYS.labels(name)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def run(self, key: str, fingerprint: str, call: Callable[[str], Awaitable[Any]]) -> tuple[Any, bool]:
+        """
+        (result, replayed): call(request_id) once per key, or the stored /
+        in-flight result of an earlier request with the same key and body.
+        Stored errors are re-raised.
+        """
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= now and (entry.future is None or entry.future.done()):
+            del self._entries[key]
+            entry = None
+        if entry is not None:
+            if entry.fingerprint != fingerprint:
+                self._conflict.inc()
+                raise IdempotencyKeyReused("Idempotency-Key reused with a different request body")
+            if entry.future is not None:
+                (self._replayed if entry.future.done() else self._coalesced).inc()
+                # shield: a waiter giving up must not cancel the shared attempt
+                return await asyncio.shield(entry.future), True
+            self._retry.inc()
+        else:
+            self._miss.inc()
+            entry = _Entry(fingerprint, new_order_id(), now + self.ttl_s)
+            self._entries[key] = entry
+            self._evict(now)
+        future = entry.future = asyncio.get_running_loop().create_future()
+        try:
+            result = await call(entry.request_id)
+        except Exception as e:
+            if not self._store_error(e):
+                entry.future = None  # not stored: the next retry runs again (same request_id)
+            future.set_exception(e)
+            future.exception()  # mark retrieved; there may be no waiters
+            raise
+        except BaseException:
+            entry.future = None
+            future.cancel()
+            raise
+        future.set_result(result)
+        return result, False
+
+    def _evict(self, now: float) -> None:
+        # Insertion order == expiry order (one TTL), so expired keys sit at the front
+        entries = self._entries
+        while entries:
+            oldest = next(iter(entries.values()))
+            if oldest.future is not None and not oldest.future.done():
+                break  # never drop an in-flight key
+            if oldest.expires_at > now and len(entries) <= self.max_entries:
+                break
+            entries.popitem(last=False)
+        self._size.set(len(entries))
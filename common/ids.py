@@ -1,50 +1,133 @@
 """
 ID generation and timestamp utilities.
 
-Provides new_order_id(), new_event_id(), and now_iso() with deterministic
-UTC ISO 8601 formatting. Uses ULID when available; falls back to uuid4.
+Provides new_order_id(), new_event_id(), new_event_ids(n), and now_iso() with
+deterministic UTC ISO 8601 formatting. IDs are monotonic ULIDs: 48-bit
+millisecond timestamp + 80-bit random part, 26 Crockford base32 characters.
+Within one millisecond the random part is incremented instead of redrawn, so
+IDs from a process are strictly increasing and lexicographically sortable
+(new rows land at the right edge of SQLite primary-key B-trees).
 """
 
 from __future__ import annotations
 
-import uuid
-from typing import TYPE_CHECKING
+import os
+import threading
+import time
 
-if TYPE_CHECKING:
-    pass
+_RAND_BITS = 80
+_RAND_MAX = (1 << _RAND_BITS) - 1
+_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"  # Crockford base32
+# Every 10-bit value as two characters: a 128-bit ID is 13 table lookups
+_PAIRS = [a + b for a in _ALPHABET for b in _ALPHABET]
 
-try:
-    from ulid import ULID
-    _HAS_ULID = True
-except ImportError:
-    _HAS_ULID = False
+
+def _encode(value: int) -> str:
+    """
+    128-bit int -> 26-char ULID string.
+
+    >>> _encode(0), _encode((1 << 128) - 1)
+    ('00000000000000000000000000', '7ZZZZZZZZZZZZZZZZZZZZZZZZZ')
+    """
+    p = _PAIRS
+    return (
+        p[value >> 120] + p[value >> 110 & 1023] + p[value >> 100 & 1023] + p[value >> 90 & 1023]
+        + p[value >> 80 & 1023] + p[value >> 70 & 1023] + p[value >> 60 & 1023] + p[value >> 50 & 1023]
+        + p[value >> 40 & 1023] + p[value >> 30 & 1023] + p[value >> 20 & 1023] + p[value >> 10 & 1023]
+        + p[value & 1023]
+    )
+
+
+class MonotonicULID:
+    """
+    Thread-safe monotonic ULID generator.
+
+    >>> gen = MonotonicULID()
+    >>> ids = gen.next_many(1000)
+    >>> ids == sorted(ids) and len(set(ids)) == 1000 and len(ids[0]) == 26
+    True
+    >>> gen.next() > ids[-1]
+    True
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._last_rand = 0
+
+    def _reserve(self, n: int) -> tuple[int, int]:
+        """Reserve n consecutive values; return (timestamp_ms, first random part)."""
+        with self._lock:
+            ms = time.time_ns() // 1_000_000
+            if ms > self._last_ms:
+                rand = int.from_bytes(os.urandom(10), "big") >> 1  # leave headroom for increments
+            else:
+                # Same millisecond (or clock stepped back): continue the sequence
+                ms = self._last_ms
+                rand = self._last_rand + 1
+            if rand + n - 1 > _RAND_MAX:
+                # Random part exhausted: borrow the next millisecond
+                ms += 1
+                rand = int.from_bytes(os.urandom(10), "big") >> 1
+            self._last_ms = ms
+            self._last_rand = rand + n - 1
+        return ms, rand
+
+    def next(self) -> str:
+        ms, rand = self._reserve(1)
+        return _encode(ms << _RAND_BITS | rand)
+
+    def next_many(self, n: int) -> list[str]:
+        """n strictly increasing IDs for the cost of one lock and one urandom call."""
+        if n < 1:
+            return []
+        ms, rand = self._reserve(n)
+        base = ms << _RAND_BITS | rand
+        return [_encode(base + i) for i in range(n)]
+
+    def _reset(self) -> None:
+        # A forked child must not continue the parent's sequence within the same ms
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._last_rand = 0
+
+
+_generator = MonotonicULID()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_generator._reset)
 
 
 def new_order_id() -> str:
     """
-    Generate a new order ID. Prefers ULID (lexicographically sortable);
-    falls back to UUID4 if python-ulid is not installed.
+    Generate a new order ID (monotonic ULID; lexicographically sortable).
 
     >>> id_ = new_order_id()
-    >>> isinstance(id_, str) and len(id_) >= 26
+    >>> isinstance(id_, str) and len(id_) == 26
     True
     """
-    if _HAS_ULID:
-        return str(ULID())
-    return str(uuid.uuid4())
+    return _generator.next()
 
 
 def new_event_id() -> str:
     """
     Generate a new event ID. Same strategy as new_order_id().
 
-    >>> id_ = new_event_id()
-    >>> isinstance(id_, str) and len(id_) >= 26
+    >>> a, b = new_event_id(), new_event_id()
+    >>> a < b
+    True
+    """
+    return _generator.next()
+
+
+def new_event_ids(n: int) -> list[str]:
+    """
+    Allocate n event IDs at once (strictly increasing).
+
+    >>> ids = new_event_ids(3)
+    >>> len(ids) == 3 and ids[0] < ids[1] < ids[2]
     True
     """
-    if _HAS_ULID:
-        return str(ULID())
-    return str(uuid.uuid4())
+    return _generator.next_many(n)
 
 
 def now_iso() -> str:
@@ -0,0 +1,452 @@
+"""
+Load generator for the order services' POST /order (sync-rest and
+async-rabbitmq): open loop with constant-rate or Poisson arrivals, or closed
+loop; a warmup phase that is not recorded; HDR-style latency histograms; JSON
+results and a compare mode that flags regressions between two runs.
+
+Open loop: request i is due at start + t_i whether or not earlier requests
+have finished, and its latency is measured from that intended send time. A
+stall (in the service, or in the generator itself) is charged to every
+request that should have gone out during it. A closed-loop client would just
+stop sending and report only the one slow request: coordinated omission.
+Closed loop (N workers, each waiting for its response) is kept for comparison
+and for the old load_test.py arguments. With expected_interval_ms its
+histogram is back-filled the way HdrHistogram's recordValueWithExpectedInterval
+does.
+
+Run from repo root (httpx is needed for run, not for compare):
+    PYTHONPATH=. python -m common.loadgen run --url http://localhost:8001/order \\
+        --rate 50 --duration 30 --warmup 5 --arrival poisson --json after.json
+    PYTHONPATH=. python -m common.loadgen compare before.json after.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+from dataclasses import asdict, dataclass, field
+from typing import Any, Iterator
+
+try:
+    import httpx
+    _HAS_HTTPX = True
+except ImportError:
+    _HAS_HTTPX = False
+
+from common.ids import now_iso
+
+PERCENTILES = (50.0, 90.0, 95.0, 99.0, 99.9)
+ORDER_BODY = {"user_id": "load-test", "items": [{"sku": "burger", "qty": 1}, {"sku": "fries", "qty": 1}]}
+
+# -----------------------------------------------------------------------------
+# Histogram
+# -----------------------------------------------------------------------------
+
+_SUB_BITS = 8
+_SUB_COUNT = 1 << _SUB_BITS  # values below this are exact
+_HALF = _SUB_COUNT >> 1  # sub-buckets per power of two above it
+
+
+def _index(value: int) -> int:
+    if value < _SUB_COUNT:
+        return value
+    shift = value.bit_length() - _SUB_BITS
+    return _SUB_COUNT + (shift - 1) * _HALF + (value >> shift) - _HALF
+
+
+def _highest_equivalent(index: int) -> int:
+    """
+    Largest value that lands in the same bucket as index.
+
+    >>> [_highest_equivalent(_index(v)) for v in (255, 256, 1000, 10**6)]
+    [255, 257, 1003, 1003519]
+    """
+    if index < _SUB_COUNT:
+        return index
+    shift = (index - _SUB_COUNT) // _HALF + 1
+    top = (index - _SUB_COUNT) % _HALF + _HALF
+    return ((top + 1) << shift) - 1
+
+
+class HdrHistogram:
+    """
+    Log-linear histogram of non-negative integers (microseconds here). It is
+    exact below 256 and uses 128 sub-buckets per power of two above that, so
+    percentiles are within 1% (~2 significant digits) over any range. Storage
+    is sparse.
+
+    >>> h = HdrHistogram()
+    >>> for v in range(1, 10001): h.record(v)
+    >>> h.count, h.percentile(50), h.percentile(99.9), h.max
+    (10000, 5023, 10000, 10000)
+    >>> c = HdrHistogram(); c.record_corrected(1000, expected_interval=100)
+    >>> c.count, c.percentile(50)     # back-filled 900, 800, ..., 100
+    (10, 501)
+    """
+
+    def __init__(self) -> None:
+        self._counts: dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def record(self, value: int, count: int = 1) -> None:
+        value = max(0, int(value))
+        index = _index(value)
+        self._counts[index] = self._counts.get(index, 0) + count
+        if self.count == 0 or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.count += count
+        self.total += value * count
+
+    def record_corrected(self, value: int, expected_interval: int) -> None:
+        """
+        Record value, plus the samples a fixed-rate client would have seen
+        while this request blocked it (value - k*expected_interval, k=1,2,..).
+        """
+        self.record(value)
+        if expected_interval <= 0:
+            return
+        missing = value - expected_interval
+        while missing >= expected_interval:
+            self.record(missing)
+            missing -= expected_interval
+
+    def merge(self, other: HdrHistogram) -> None:
+        for index, n in other._counts.items():
+            self._counts[index] = self._counts.get(index, 0) + n
+        if other.count:
+            self.min = other.min if self.count == 0 else min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        self.count += other.count
+        self.total += other.total
+
+    def percentile(self, p: float) -> int:
+        if self.count == 0:
+            return 0
+        rank = max(1, math.ceil(p / 100.0 * self.count))
+        seen = 0
+        for index in sorted(self._counts):
+            seen += self._counts[index]
+            if seen >= rank:
+                return min(_highest_equivalent(index), self.max)
+        return self.max
+
+    def summary_ms(self, percentiles: tuple[float, ...] = PERCENTILES) -> dict[str, float]:
+        """{"p50": .., "p99.9": .., "max": .., "mean": ..} in ms, from µs samples."""
+        out = {f"p{p:g}": round(self.percentile(p) / 1000.0, 3) for p in percentiles}
+        out["max"] = round(self.max / 1000.0, 3)
+        out["mean"] = round(self.total / self.count / 1000.0, 3) if self.count else 0.0
+        return out
+
+
+# -----------------------------------------------------------------------------
+# Arrivals and runs
+# -----------------------------------------------------------------------------
+
+
+def arrivals(rate: float, duration_s: float, kind: str = "constant", seed: int | None = None) -> Iterator[float]:
+    """
+    Intended send times (seconds from start) for an open-loop run.
+
+    >>> list(arrivals(4, 1.0))
+    [0.0, 0.25, 0.5, 0.75]
+    >>> n = sum(1 for _ in arrivals(1000, 10.0, "poisson", seed=1)); 9500 < n < 10500
+    True
+    """
+    if rate <= 0:
+        raise ValueError("rate must be > 0")
+    if kind == "constant":
+        n = math.ceil(rate * duration_s - 1e-9)
+        for i in range(n):
+            yield i / rate
+    elif kind == "poisson":
+        rng = random.Random(seed)
+        t = rng.expovariate(rate)
+        while t < duration_s:
+            yield t
+            t += rng.expovariate(rate)
+    else:
+        raise ValueError(f"Unknown arrival process: {kind!r}")
+
+
+@dataclass
+class LoadConfig:
+    """
+    arrival: constant | poisson (open loop) or closed (concurrency workers).
+    Closed loop stops after `requests` if set, else after warmup + duration.
+    max_inflight bounds open-loop concurrency; a request waiting for a slot
+    is still timed from its intended send time.
+    """
+
+    url: str = "http://localhost:8001/order"
+    arrival: str = "constant"
+    rate: float = 50.0
+    duration_s: float = 30.0
+    warmup_s: float = 5.0
+    concurrency: int = 10
+    requests: int | None = None
+    max_inflight: int = 1000
+    timeout_s: float = 10.0
+    expected_interval_ms: float = 0.0
+    seed: int | None = None
+    body: dict[str, Any] = field(default_factory=lambda: dict(ORDER_BODY))
+
+
+class _Recorder:
+    def __init__(self) -> None:
+        self.latency = HdrHistogram()
+        self.service = HdrHistogram()
+        self.statuses: dict[str, int] = {}
+        self.first_start = math.inf
+        self.last_done = 0.0
+
+    def add(self, status: str, due: float, sent: float, done: float, expected_interval_us: int = 0) -> None:
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.latency.record_corrected(round((done - due) * 1e6), expected_interval_us)
+        self.service.record(round((done - sent) * 1e6))
+        self.first_start = min(self.first_start, due)
+        self.last_done = max(self.last_done, done)
+
+
+async def _send(client: "httpx.AsyncClient", url: str, body: bytes) -> str:
+    try:
+        resp = await client.post(url, content=body, headers={"content-type": "application/json"})
+        return str(resp.status_code)
+    except httpx.HTTPError as e:
+        return type(e).__name__
+
+
+async def _run_open(config: LoadConfig, client: "httpx.AsyncClient", body: bytes, rec: _Recorder) -> float:
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(config.max_inflight)
+    tasks: set[asyncio.Task] = set()
+    max_lag = 0.0
+
+    async def fire(due: float, measured: bool) -> None:
+        async with slots:
+            sent = loop.time()
+            status = await _send(client, config.url, body)
+        if measured:
+            rec.add(status, due, sent, loop.time())
+
+    start = loop.time() + 0.01
+    for offset in arrivals(config.rate, config.warmup_s + config.duration_s, config.arrival, config.seed):
+        due = start + offset
+        delay = due - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            max_lag = max(max_lag, -delay)
+        task = loop.create_task(fire(due, offset >= config.warmup_s))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    await asyncio.gather(*tasks)
+    return max_lag
+
+
+async def _run_closed(config: LoadConfig, client: "httpx.AsyncClient", body: bytes, rec: _Recorder) -> float:
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    measure_from = start + config.warmup_s
+    stop_at = measure_from + config.duration_s
+    remaining = iter(range(config.requests)) if config.requests is not None else None
+    expected_us = round(config.expected_interval_ms * 1000)
+
+    async def worker() -> None:
+        while True:
+            if remaining is not None:
+                if next(remaining, None) is None:
+                    return
+            elif loop.time() >= stop_at:
+                return
+            sent = loop.time()
+            status = await _send(client, config.url, body)
+            if remaining is not None or sent >= measure_from:
+                rec.add(status, sent, sent, loop.time(), expected_us)
+
+    await asyncio.gather(*(worker() for _ in range(config.concurrency)))
+    return 0.0
+
+
+async def run(config: LoadConfig, transport: "httpx.AsyncBaseTransport | None" = None) -> dict[str, Any]:
+    """
+    Drive config.url and return the results dict (see report() / compare()).
+    transport (e.g. httpx.ASGITransport) drives an in-process app instead of the network.
+    """
+    if not _HAS_HTTPX:
+        raise RuntimeError("common.loadgen.run needs httpx (pip install httpx)")
+    body = json.dumps(config.body).encode()
+    conns = config.concurrency if config.arrival == "closed" else config.max_inflight
+    limits = httpx.Limits(max_connections=conns, max_keepalive_connections=conns)
+    rec = _Recorder()
+    started_at = now_iso()
+    async with httpx.AsyncClient(limits=limits, timeout=config.timeout_s, transport=transport) as client:
+        if config.arrival == "closed":
+            max_lag = await _run_closed(config, client, body, rec)
+        else:
+            max_lag = await _run_open(config, client, body, rec)
+    requests = sum(rec.statuses.values())
+    ok = sum(n for status, n in rec.statuses.items() if status.startswith("2"))
+    elapsed = max(rec.last_done - rec.first_start, 1e-9) if requests else 0.0
+    config_out = asdict(config)
+    config_out.pop("body")
+    return {
+        "started_at": started_at,
+        "config": config_out,
+        "requests": requests,
+        "ok": ok,
+        "statuses": dict(sorted(rec.statuses.items())),
+        "error_rate": round(1 - ok / requests, 6) if requests else 0.0,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 2) if requests else 0.0,
+        "latency_ms": rec.latency.summary_ms(),
+        "service_time_ms": rec.service.summary_ms(),
+        "generator_max_lag_ms": round(max_lag * 1000, 3),
+    }
+
+
+def report(result: dict[str, Any]) -> str:
+    config = result["config"]
+    if config["arrival"] == "closed":
+        mode = f"closed loop, {config['concurrency']} workers"
+        basis = "(from send" + (", CO-corrected)" if config["expected_interval_ms"] else ", not CO-corrected)")
+    else:
+        mode = f"open loop, {config['arrival']} arrivals at {config['rate']:g} req/s"
+        basis = "(from intended send)"
+    lat, svc = result["latency_ms"], result["service_time_ms"]
+    lines = [
+        f"requests: {result['requests']}, success: {result['ok']}",
+        f"p50={lat['p50']:.2f}ms p95={lat['p95']:.2f}ms",
+        f"{mode}; statuses {result['statuses']}; {result['throughput_rps']:.1f} req/s over {result['elapsed_s']:.1f} s",
+        f"{'latency ' + basis:<40} " + "  ".join(f"{k} {v:.2f}" for k, v in lat.items()),
+        f"{'service time (from actual send)':<40} " + "  ".join(f"{k} {v:.2f}" for k, v in svc.items()),
+    ]
+    if result["generator_max_lag_ms"] > 10:
+        lines.append(
+            f"note: generator fell up to {result['generator_max_lag_ms']:.0f} ms behind schedule; "
+            "that delay is included in latency (the generator may be the bottleneck)"
+        )
+    return "\n".join(lines)
+
+
+# -----------------------------------------------------------------------------
+# Compare
+# -----------------------------------------------------------------------------
+
+
+def compare(
+    base: dict[str, Any],
+    new: dict[str, Any],
+    threshold: float = 0.10,
+    error_threshold: float = 0.01,
+) -> list[tuple[str, float, float, float, bool]]:
+    """
+    (metric, base, new, relative change, regressed) rows. Latency percentiles
+    regress when they grow by more than threshold, throughput when it falls
+    by more than threshold, error_rate when it rises by more than
+    error_threshold (absolute).
+
+    >>> a = {"latency_ms": {"p50": 10.0, "p99": 40.0}, "throughput_rps": 100.0, "error_rate": 0.0}
+    >>> b = {"latency_ms": {"p50": 10.5, "p99": 60.0}, "throughput_rps": 98.0, "error_rate": 0.0}
+    >>> [(m, regressed) for m, _, _, _, regressed in compare(a, b)]
+    [('latency p50', False), ('latency p99', True), ('throughput_rps', False), ('error_rate', False)]
+    """
+
+    def change(old: float, cur: float) -> float:
+        return (cur - old) / old if old else (0.0 if cur == old else math.inf)
+
+    rows = []
+    for key, old in base["latency_ms"].items():
+        if key in ("max", "mean") or key not in new["latency_ms"]:
+            continue
+        cur = new["latency_ms"][key]
+        rows.append((f"latency {key}", old, cur, change(old, cur), change(old, cur) > threshold))
+    old, cur = base["throughput_rps"], new["throughput_rps"]
+    rows.append(("throughput_rps", old, cur, change(old, cur), change(old, cur) < -threshold))
+    old, cur = base["error_rate"], new["error_rate"]
+    rows.append(("error_rate", old, cur, change(old, cur), cur - old > error_threshold))
+    return rows
+
+
+# -----------------------------------------------------------------------------
+# CLI
+# -----------------------------------------------------------------------------
+
+
+def add_run_arguments(parser: argparse.ArgumentParser) -> None:
+    d = LoadConfig()
+    parser.add_argument("--url", default=d.url, help="POST target (sync-rest and async-rabbitmq both serve /order on :8001)")
+    parser.add_argument("--arrival", choices=("constant", "poisson", "closed"), default=d.arrival)
+    parser.add_argument("--rate", type=float, default=d.rate, help="open loop: requests/sec")
+    parser.add_argument("--duration", type=float, default=d.duration_s, help="measured seconds (after warmup)")
+    parser.add_argument("--warmup", type=float, default=d.warmup_s, help="unrecorded seconds before measuring")
+    parser.add_argument("--concurrency", type=int, default=d.concurrency, help="closed loop: workers")
+    parser.add_argument("--requests", type=int, default=None, help="closed loop: stop after N requests (no warmup)")
+    parser.add_argument("--max-inflight", type=int, default=d.max_inflight, help="open loop: concurrent request cap")
+    parser.add_argument("--timeout", type=float, default=d.timeout_s, help="per-request timeout, seconds")
+    parser.add_argument("--expected-interval-ms", type=float, default=0.0, help="closed loop: CO correction interval")
+    parser.add_argument("--seed", type=int, default=None, help="Poisson arrivals seed")
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+
+
+def config_from_args(args: argparse.Namespace) -> LoadConfig:
+    return LoadConfig(
+        url=args.url,
+        arrival=args.arrival,
+        rate=args.rate,
+        duration_s=args.duration,
+        warmup_s=0.0 if args.requests is not None else args.warmup,
+        concurrency=args.concurrency,
+        requests=args.requests,
+        max_inflight=args.max_inflight,
+        timeout_s=args.timeout,
+        expected_interval_ms=args.expected_interval_ms,
+        seed=args.seed,
+    )
+
+
+def run_and_report(config: LoadConfig, json_path: str | None = None) -> dict[str, Any]:
+    result = asyncio.run(run(config))
+    print(report(result))
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"results written to {json_path}")
+    return result
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Open/closed-loop load generator for POST /order.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    add_run_arguments(sub.add_parser("run", help="drive a target and report latency percentiles"))
+    cmp = sub.add_parser("compare", help="compare two JSON results; exit 1 on regression")
+    cmp.add_argument("base")
+    cmp.add_argument("new")
+    cmp.add_argument("--threshold", type=float, default=0.10, help="relative latency / throughput change")
+    cmp.add_argument("--error-threshold", type=float, default=0.01, help="absolute error-rate increase")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        run_and_report(config_from_args(args), args.json_path)
+        return 0
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    rows = compare(base, new, args.threshold, args.error_threshold)
+    print(f"{'metric':<16} {'base':>10} {'new':>10} {'change':>8}")
+    for metric, old, cur, delta, regressed in rows:
+        print(f"{metric:<16} {old:>10.3f} {cur:>10.3f} {delta:>+8.1%}" + ("  REGRESSION" if regressed else ""))
+    return 1 if any(row[4] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
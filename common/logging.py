@@ -3,12 +3,34 @@ Lightweight logging setup for services.
 
 Configures stdlib logging with timestamps and service name.
 Safe for containers (logs to stdout).
+
+Two output modes (LOG_MODE env or setup_logging(mode=...)):
+- sync (default): a StreamHandler writes to stdout in the calling thread.
+- queue: the caller only pushes the record onto a bounded in-memory queue, and
+  a QueueListener thread formats it and writes it to stdout. A slow stdout
+  (docker log driver, full pipe) then no longer stalls the event loop. When
+  the queue is full, records are dropped and counted instead of blocking.
+
+LOG_FORMAT=json switches to one JSON object per line. Per-message logs on hot
+paths go through hot_path_logger(). It applies a per-logger rate limit
+(LOG_HOT_RATE records/sec) and/or 1-in-N sampling (LOG_HOT_SAMPLE) before a
+record is built. Warnings and errors always pass. RateLimitFilter and
+SamplingFilter can also be attached to any logger or handler as ordinary
+logging filters.
 """
 
 from __future__ import annotations
 
+import atexit
+import itertools
+import json
 import logging
+import os
+import queue
 import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
 
 
 class _ServiceFormatter(logging.Formatter):
@@ -23,27 +45,253 @@ class _ServiceFormatter(logging.Formatter):
         return super().format(record)
 
 
-def setup_logging(service_name: str) -> None:
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: ts, level, service, logger, msg (+ exc).
+
+    >>> rec = logging.LogRecord("orders", logging.INFO, __file__, 1, "order %s placed", ("o1",), None)
+    >>> rec.created, rec.msecs = 0.0, 0
+    >>> JsonFormatter("order-service").format(rec)
+    '{"ts": "1970-01-01T00:00:00.000Z", "level": "INFO", "service": "order-service", "logger": "orders", "msg": "order o1 placed"}'
+    """
+
+    def __init__(self, service_name: str) -> None:
+        super().__init__()
+        self._service_name = service_name
+
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "service": getattr(record, "service_name", self._service_name),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out)
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """QueueHandler for an in-process listener: never blocks, drops (and counts) when full."""
+
+    def __init__(self, q: queue.Queue) -> None:
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The listener lives in this process, so skip the stdlib's eager format + copy;
+        # only freeze the message so later mutation of args cannot change it.
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.dropped:
+            record.msg = f"{record.msg} [{self.dropped} earlier log records dropped: queue full]"
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+        else:
+            self.dropped = 0
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket per logger: at most `rate` records/sec (bursts up to `burst`)
+    below WARNING. The next record that passes notes how many were suppressed.
+
+    >>> f = RateLimitFilter(rate=1, burst=2)
+    >>> recs = [logging.LogRecord("x", logging.INFO, "", 0, "m", None, None) for _ in range(4)]
+    >>> [f.filter(r) for r in recs]
+    [True, True, False, False]
+    """
+
+    def __init__(self, rate: float, burst: int | None = None) -> None:
+        super().__init__()
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._suppressed = 0
+        self._lock = threading.Lock()
+
+    def admit(self) -> int | None:
+        """None to drop this record, else how many were suppressed since the last one passed."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens < 1:
+                self._suppressed += 1
+                return None
+            self._tokens -= 1
+            suppressed, self._suppressed = self._suppressed, 0
+        return suppressed
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        suppressed = self.admit()
+        if suppressed is None:
+            return False
+        if suppressed:
+            record.msg = f"{record.msg} [{suppressed} similar suppressed]"
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep 1 in every `every` records below WARNING (deterministic, not random).
+
+    >>> f = SamplingFilter(3)
+    >>> [f.filter(logging.LogRecord("x", logging.INFO, "", 0, "m", None, None)) for _ in range(6)]
+    [True, False, False, True, False, False]
+    """
+
+    def __init__(self, every: int) -> None:
+        super().__init__()
+        self.every = max(1, every)
+        self._count = itertools.count()  # next() is atomic under the GIL
+
+    def admit(self) -> int | None:
+        return 0 if next(self._count) % self.every == 0 else None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or self.admit() is not None
+
+
+class HotPathLogger(logging.LoggerAdapter):
+    """
+    Logger adapter that applies sampling / rate limiting before a LogRecord is
+    built, so a suppressed call costs a counter update instead of a record.
+    Warnings and errors always pass.
+
+    >>> base = logging.getLogger("doctest.hot"); base.setLevel(logging.INFO)
+    >>> log = HotPathLogger(base, [SamplingFilter(2)])
+    >>> [log.isEnabledFor(logging.INFO) for _ in range(4)]
+    [True, False, True, False]
+    """
+
+    def __init__(self, logger: logging.Logger, limiters: list) -> None:
+        super().__init__(logger, {})
+        self.limiters = limiters
+        self._suppressed = 0
+        self._lock = threading.Lock()  # callers log from many threads (worker pools)
+
+    def isEnabledFor(self, level: int) -> bool:
+        if not self.logger.isEnabledFor(level):
+            return False
+        if level >= logging.WARNING:
+            return True
+        for limiter in self.limiters:
+            suppressed = limiter.admit()
+            if suppressed is None:
+                return False
+            if suppressed:
+                with self._lock:
+                    self._suppressed += suppressed
+        return True
+
+    def process(self, msg, kwargs):
+        if self._suppressed:  # unlocked peek; the count is taken under the lock
+            with self._lock:
+                suppressed, self._suppressed = self._suppressed, 0
+            if suppressed:
+                msg = f"{msg} [{suppressed} similar suppressed]"
+        return msg, kwargs
+
+
+_hot_loggers: dict[str, HotPathLogger] = {}
+
+
+def hot_path_logger(name: str, rate: float | None = None, sample: int | None = None) -> HotPathLogger:
+    """
+    Logger for per-message logs (named "<name>.hot"), rate limited and/or sampled.
+    Defaults come from LOG_HOT_RATE (records/sec, 0 = unlimited) and
+    LOG_HOT_SAMPLE (keep 1 in N, 1 = all). One instance per name.
+    """
+    logger = _hot_loggers.get(name)
+    if logger is None:
+        rate = float(os.getenv("LOG_HOT_RATE", "0")) if rate is None else rate
+        sample = int(os.getenv("LOG_HOT_SAMPLE", "1")) if sample is None else sample
+        limiters: list = []
+        if sample > 1:
+            limiters.append(SamplingFilter(sample))
+        if rate > 0:
+            limiters.append(RateLimitFilter(rate))
+        logger = _hot_loggers[name] = HotPathLogger(logging.getLogger(f"{name}.hot"), limiters)
+    return logger
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel)  # blocking: the queue may be full at shutdown
+
+
+_installed: list[logging.Handler] = []
+_listener: QueueListener | None = None
+
+
+def _stop_listener() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()  # drains the queue before returning
+        _listener = None
+
+
+atexit.register(_stop_listener)
+
+
+def setup_logging(service_name: str, mode: str | None = None, fmt: str | None = None) -> None:
     """
     Configure root logger: timestamp + service name, stdout, INFO level.
     Idempotent for repeated calls (reconfigures handler/formatter).
     Safe for containers (stdout only).
 
+    mode: "sync" or "queue" (default LOG_MODE, else sync).
+    fmt: "text" or "json" (default LOG_FORMAT, else text).
+
     >>> setup_logging("test-service")
     >>> logging.getLogger().handlers
     [...]
     """
+    mode = mode or os.getenv("LOG_MODE", "sync")
+    fmt = fmt or os.getenv("LOG_FORMAT", "text")
+    if mode not in ("sync", "queue"):
+        raise ValueError(f"Unknown log mode: {mode!r}")
+    if fmt not in ("text", "json"):
+        raise ValueError(f"Unknown log format: {fmt!r}")
+
     root = logging.getLogger()
     root.setLevel(logging.INFO)
-    formatter = _ServiceFormatter(
-        service_name,
-        fmt="%(asctime)s [%(levelname)s] %(service_name)s %(name)s %(message)s",
-        datefmt="%Y-%m-%dT%H:%M:%S",
-    )
-    if not root.handlers:
-        handler = logging.StreamHandler(sys.stdout)
-        handler.setFormatter(formatter)
-        root.addHandler(handler)
+    if fmt == "json":
+        formatter: logging.Formatter = JsonFormatter(service_name)
     else:
+        formatter = _ServiceFormatter(
+            service_name,
+            fmt="%(asctime)s [%(levelname)s] %(service_name)s %(name)s %(message)s",
+            datefmt="%Y-%m-%dT%H:%M:%S",
+        )
+    if root.handlers and not _installed:
+        # Handlers installed by someone else (test runner, framework): just restyle them
         for h in root.handlers:
             h.setFormatter(formatter)
+        return
+
+    global _listener
+    _stop_listener()
+    for h in _installed:
+        root.removeHandler(h)
+    _installed.clear()
+
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(formatter)
+    if mode == "queue":
+        q: queue.Queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+        _listener = _Listener(q, handler, respect_handler_level=True)
+        _listener.start()
+        handler = _DroppingQueueHandler(q)
+    root.addHandler(handler)
+    _installed.append(handler)
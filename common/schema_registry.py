@@ -0,0 +1,357 @@
+"""
+Local schema registry and compact binary codec for the Kafka events.
+
+Every Kafka value starts with a magic byte and the varint schema ID of the
+writer's schema, followed by the fields in schema order without names:
+strings are varint length + UTF-8, longs are zigzag varints, nullable fields
+carry a 0/1 presence byte, and arrays are a varint count followed by records.
+A consumer decodes with the writer's schema (looked up by ID) and then
+resolves the record onto the latest registered version of the same event:
+added fields get their defaults and removed fields are dropped. Consumers
+therefore keep working while producers roll forward, and the reverse also
+holds.
+
+Schemas are registered in code, with fixed IDs, so every service agrees on
+them without a registry server. register() refuses a new version that
+breaks compatibility with the previous one. The default mode is backward:
+the new version must be able to read data written by the old one.
+
+Values that start with "{" are legacy JSON records (written before this
+codec). They still decode, so replaying a topic from the earliest offset
+works.
+
+    producer = KafkaProducer(value_serializer=serialize, ...)
+    consumer = KafkaConsumer(value_deserializer=deserialize, ...)
+"""
+
+from __future__ import annotations
+
+import json
+import struct
+from dataclasses import dataclass
+from typing import Any
+
+from common.varint import get_varint, put_varint, unzigzag, zigzag
+
+MAGIC = 0xC5
+_MISSING: Any = object()
+
+_TYPES = ("string", "long", "double", "boolean", "array")
+
+
+class SchemaError(ValueError):
+    """Unknown schema, malformed message, or a value that does not fit its schema."""
+
+
+class SchemaCompatibilityError(SchemaError):
+    """A new schema version is not compatible with the registered one."""
+
+
+@dataclass(frozen=True)
+class FieldSpec:
+    """One field: name, type (string, long, double, boolean, array), optional default."""
+
+    name: str
+    type: str
+    nullable: bool = False
+    default: Any = _MISSING
+    items: tuple[FieldSpec, ...] = ()  # record fields for type="array"
+
+    def __post_init__(self) -> None:
+        if self.type not in _TYPES:
+            raise SchemaError(f"Unknown field type {self.type!r} for {self.name}")
+        if (self.type == "array") != bool(self.items):
+            raise SchemaError(f"Field {self.name}: items is required for (and only for) arrays")
+
+    @property
+    def has_default(self) -> bool:
+        return self.default is not _MISSING
+
+
+@dataclass(frozen=True)
+class Schema:
+    """A versioned record schema for one event type (name = eventType)."""
+
+    schema_id: int
+    name: str
+    version: int
+    fields: tuple[FieldSpec, ...]
+
+    def __post_init__(self) -> None:
+        if not 0 < self.schema_id < 2**31:
+            raise SchemaError("schema_id must be a positive 31-bit integer")
+
+
+# -----------------------------------------------------------------------------
+# Record encoding
+# -----------------------------------------------------------------------------
+
+_DOUBLE = struct.Struct("<d")
+
+
+def _encode_record(out: bytearray, fields: tuple[FieldSpec, ...], record: dict[str, Any]) -> None:
+    for spec in fields:
+        value = record.get(spec.name, spec.default) if spec.has_default else record[spec.name]
+        if spec.nullable:
+            if value is None:
+                out.append(0)
+                continue
+            out.append(1)
+        kind = spec.type
+        if kind == "string":
+            data = value.encode()
+            put_varint(out, len(data))
+            out += data
+        elif kind == "long":
+            put_varint(out, zigzag(value))
+        elif kind == "double":
+            out += _DOUBLE.pack(value)
+        elif kind == "boolean":
+            out.append(1 if value else 0)
+        else:
+            put_varint(out, len(value))
+            for item in value:
+                _encode_record(out, spec.items, item)
+
+
+def _decode_record(buf: bytes, pos: int, fields: tuple[FieldSpec, ...], record: dict[str, Any]) -> int:
+    """Decode fields into record; returns the position after them."""
+    for spec in fields:
+        if spec.nullable:
+            pos += 1
+            if buf[pos - 1] == 0:
+                record[spec.name] = None
+                continue
+        kind = spec.type
+        if kind == "string":
+            n, pos = get_varint(buf, pos)
+            value = buf[pos:pos + n].decode()
+            pos += n
+        elif kind == "long":
+            z, pos = get_varint(buf, pos)
+            value = unzigzag(z)
+        elif kind == "double":
+            value = _DOUBLE.unpack_from(buf, pos)[0]
+            pos += 8
+        elif kind == "boolean":
+            value = buf[pos] == 1
+            pos += 1
+        else:
+            n, pos = get_varint(buf, pos)
+            value = []
+            for _ in range(n):
+                item: dict[str, Any] = {}
+                pos = _decode_record(buf, pos, spec.items, item)
+                value.append(item)
+        record[spec.name] = value
+    return pos
+
+
+# -----------------------------------------------------------------------------
+# Compatibility
+# -----------------------------------------------------------------------------
+
+
+def _can_read(writer: tuple[FieldSpec, ...], reader: tuple[FieldSpec, ...], path: str) -> list[str]:
+    """Problems a reader with `reader` fields has decoding data written with `writer`."""
+    problems = []
+    written = {f.name: f for f in writer}
+    for r in reader:
+        w = written.get(r.name)
+        where = f"{path}{r.name}"
+        if w is None:
+            if not r.has_default:
+                problems.append(f"{where}: added without a default")
+            continue
+        if w.type != r.type:
+            problems.append(f"{where}: type changed {w.type} -> {r.type}")
+        elif w.nullable and not r.nullable:
+            problems.append(f"{where}: nullable field made non-nullable")
+        elif r.type == "array":
+            problems.extend(_can_read(w.items, r.items, f"{where}[]."))
+    return problems
+
+
+def check_compatibility(old: Schema, new: Schema, mode: str = "backward") -> list[str]:
+    """
+    List why new cannot replace old under mode (backward, forward, full).
+    Backward: new readers read old data. Forward: old readers read new data.
+
+    >>> v1 = Schema(100, "Demo", 1, (FieldSpec("id", "string"),))
+    >>> v2 = Schema(101, "Demo", 2, (FieldSpec("id", "string"), FieldSpec("note", "string")))
+    >>> check_compatibility(v1, v2)
+    ['note: added without a default']
+    """
+    if mode not in ("backward", "forward", "full"):
+        raise ValueError(f"Unknown compatibility mode: {mode!r}")
+    problems = []
+    if mode in ("backward", "full"):
+        problems += _can_read(old.fields, new.fields, "")
+    if mode in ("forward", "full"):
+        problems += [f"forward: {p}" for p in _can_read(new.fields, old.fields, "")]
+    return problems
+
+
+def _resolve(record: dict, fields: tuple[FieldSpec, ...]) -> dict:
+    """Project a record decoded with the writer's schema onto reader fields."""
+    out = {}
+    for f in fields:
+        v = record.get(f.name, f.default)
+        if f.type == "array" and v:
+            v = [_resolve(item, f.items) for item in v]
+        out[f.name] = v
+    return out
+
+
+# -----------------------------------------------------------------------------
+# Registry
+# -----------------------------------------------------------------------------
+
+
+class SchemaRegistry:
+    """
+    Schemas by ID and by (name, version), with compatibility checks on register.
+
+    >>> reg = SchemaRegistry()
+    >>> _ = reg.register(Schema(1, "Ping", 1, (FieldSpec("id", "string"),)))
+    >>> _ = reg.register(Schema(2, "Ping", 2, (FieldSpec("id", "string"), FieldSpec("n", "long", default=0))))
+    >>> reg.deserialize(reg.serialize({"eventType": "Ping", "id": "p1", "n": 5}))
+    {'eventType': 'Ping', 'id': 'p1', 'n': 5}
+    >>> old = reg.serialize({"eventType": "Ping", "id": "p2"}, version=1)
+    >>> reg.deserialize(old)
+    {'eventType': 'Ping', 'id': 'p2', 'n': 0}
+    >>> reg.register(Schema(3, "Ping", 3, (FieldSpec("id", "long"),)))
+    Traceback (most recent call last):
+    ...
+    common.schema_registry.SchemaCompatibilityError: Ping v3 is not backward compatible with v2: id: type changed string -> long
+    """
+
+    def __init__(self, mode: str = "backward") -> None:
+        self.mode = mode
+        self._by_id: dict[int, Schema] = {}
+        self._versions: dict[str, dict[int, Schema]] = {}
+        self._latest: dict[str, Schema] = {}
+
+    def register(self, schema: Schema) -> Schema:
+        """Add schema as the next version of its name; raises SchemaCompatibilityError."""
+        existing = self._by_id.get(schema.schema_id)
+        if existing is not None:
+            if existing == schema:
+                return existing
+            raise SchemaError(f"Schema ID {schema.schema_id} already used by {existing.name} v{existing.version}")
+        versions = self._versions.setdefault(schema.name, {})
+        if versions:
+            latest = versions[max(versions)]
+            if schema.version <= latest.version:
+                raise SchemaError(f"{schema.name} v{schema.version} is not newer than v{latest.version}")
+            problems = check_compatibility(latest, schema, self.mode)
+            if problems:
+                raise SchemaCompatibilityError(
+                    f"{schema.name} v{schema.version} is not {self.mode} compatible "
+                    f"with v{latest.version}: {'; '.join(problems)}"
+                )
+        versions[schema.version] = schema
+        self._latest[schema.name] = schema
+        self._by_id[schema.schema_id] = schema
+        return schema
+
+    def get(self, name: str, version: int | None = None) -> Schema:
+        """Schema for name at version (default: latest)."""
+        if version is None and name in self._latest:
+            return self._latest[name]
+        versions = self._versions.get(name)
+        if not versions:
+            raise SchemaError(f"No schema registered for {name!r}")
+        try:
+            return versions[max(versions) if version is None else version]
+        except KeyError:
+            raise SchemaError(f"No schema {name!r} v{version}") from None
+
+    def by_id(self, schema_id: int) -> Schema:
+        try:
+            return self._by_id[schema_id]
+        except KeyError:
+            raise SchemaError(f"Unknown schema ID {schema_id}") from None
+
+    def serialize(self, event: dict[str, Any], version: int | None = None) -> bytes:
+        """Encode an event dict with the schema named by its eventType."""
+        schema = self.get(event["eventType"], version)
+        out = bytearray((MAGIC,))
+        put_varint(out, schema.schema_id)
+        try:
+            _encode_record(out, schema.fields, event)
+        except KeyError as e:
+            raise SchemaError(f"{schema.name}: missing required field {e.args[0]!r}") from None
+        except (TypeError, AttributeError, struct.error) as e:
+            raise SchemaError(f"{schema.name}: value does not match schema ({e})") from None
+        return bytes(out)
+
+    def deserialize(self, raw: bytes | None) -> dict[str, Any] | None:
+        """
+        Decode a message (binary or legacy JSON) into an event dict using the
+        latest schema. A tombstone (None or empty value) decodes to None.
+
+        >>> registry.deserialize(None), registry.deserialize(b"")
+        (None, None)
+        """
+        if not raw:
+            return None
+        if raw[0] != MAGIC:
+            if raw[:1] == b"{":
+                return json.loads(raw)
+            raise SchemaError("Not a schema-registry message (bad magic byte)")
+        try:
+            schema_id, pos = get_varint(raw, 1)
+            writer = self.by_id(schema_id)
+            record = {"eventType": writer.name}
+            _decode_record(raw, pos, writer.fields, record)
+        except (IndexError, UnicodeDecodeError, struct.error) as e:
+            raise SchemaError(f"Malformed message: {type(e).__name__}") from None
+        reader = self._latest[writer.name]
+        if reader is not writer:
+            record = {"eventType": writer.name, **_resolve(record, reader.fields)}
+        return record
+
+
+# -----------------------------------------------------------------------------
+# Kafka event schemas (IDs are part of the wire format: never reuse one)
+# -----------------------------------------------------------------------------
+
+
+_ITEM = (FieldSpec("itemId", "string"), FieldSpec("qty", "long"))
+
+registry = SchemaRegistry()
+registry.register(Schema(1, "OrderPlaced", 1, (
+    FieldSpec("orderId", "string"),
+    FieldSpec("timestampMs", "long"),
+    FieldSpec("items", "array", items=_ITEM),
+)))
+registry.register(Schema(2, "InventoryReserved", 1, (
+    FieldSpec("orderId", "string"),
+    FieldSpec("timestampMs", "long"),
+    FieldSpec("reason", "string", nullable=True, default=None),
+)))
+registry.register(Schema(3, "InventoryFailed", 1, (
+    FieldSpec("orderId", "string"),
+    FieldSpec("timestampMs", "long"),
+    FieldSpec("reason", "string", nullable=True, default=None),
+)))
+
+
+def serialize(event: dict[str, Any]) -> bytes:
+    """
+    Kafka value_serializer: event dict (with eventType) -> schema-prefixed bytes.
+
+    >>> ev = {"eventType": "OrderPlaced", "orderId": "o1", "timestampMs": 1700000000000,
+    ...       "items": [{"itemId": "burrito", "qty": 1}]}
+    >>> deserialize(serialize(ev)) == ev
+    True
+    >>> len(serialize(ev)) < len(json.dumps(ev))
+    True
+    """
+    return registry.serialize(event)
+
+
+def deserialize(raw: bytes | None) -> dict[str, Any] | None:
+    """Kafka value_deserializer: schema-prefixed bytes (or legacy JSON) -> event dict; tombstone -> None."""
+    return registry.deserialize(raw)
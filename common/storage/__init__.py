@@ -0,0 +1,649 @@
+"""
+SQLite helpers for idempotency and local persistence.
+
+Provides init_db(), order operations, reservation operations (idempotent),
+and message-id idempotency. Uses WAL mode and parameterized queries.
+
+Connections are pooled per thread (one long-lived connection per db_path per
+thread), so repeated calls reuse the open file, the parsed schema and
+sqlite3's prepared-statement cache. An asyncio event loop runs on a single
+thread, so it gets its own connection as well. PRAGMAs are tunable through
+configure_storage() or SQLITE_* environment variables.
+
+get_order() and get_reservation() are served from a bounded read-through
+cache of decoded rows (STORAGE_READ_CACHE_SIZE, 0 disables); every write
+helper invalidates the rows it changed once its transaction commits.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Any
+
+from common import metrics
+from common.models import Order
+from common.storage.codec import active_codec, codec_for
+from common.storage.read_cache import ReadCache
+
+
+_OP_SECONDS = metrics.histogram("storage_op_seconds", "SQLite storage call latency", ["op"])
+
+# -----------------------------------------------------------------------------
+# Connection pool
+# -----------------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class StorageConfig:
+    """
+    Per-connection PRAGMAs applied when a pooled connection is opened.
+
+    synchronous: OFF | NORMAL | FULL | EXTRA (FULL keeps SQLite's default durability)
+    cache_size: page cache size; negative values are KiB (SQLite convention)
+    mmap_size: bytes of the database to memory-map (0 disables mmap)
+    busy_timeout_ms: how long a writer waits on a locked database
+    cached_statements: size of sqlite3's prepared-statement cache per connection
+    """
+
+    synchronous: str = "FULL"
+    cache_size: int = -8000
+    mmap_size: int = 0
+    busy_timeout_ms: int = 5000
+    cached_statements: int = 256
+
+    def __post_init__(self) -> None:
+        if self.synchronous not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+            raise ValueError(f"Invalid synchronous mode: {self.synchronous!r}")
+
+
+def _config_from_env() -> StorageConfig:
+    return StorageConfig(
+        synchronous=os.getenv("SQLITE_SYNCHRONOUS", "FULL").upper(),
+        cache_size=int(os.getenv("SQLITE_CACHE_SIZE", "-8000")),
+        mmap_size=int(os.getenv("SQLITE_MMAP_SIZE", "0")),
+        busy_timeout_ms=int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+        cached_statements=int(os.getenv("SQLITE_CACHED_STATEMENTS", "256")),
+    )
+
+
+_config = _config_from_env()
+_local = threading.local()
+_all_connections: list[sqlite3.Connection] = []
+_all_connections_lock = threading.Lock()
+_generation = 0
+_read_cache = ReadCache(int(os.getenv("STORAGE_READ_CACHE_SIZE", "10000")))
+
+
+def configure_storage(**overrides: Any) -> StorageConfig:
+    """
+    Override PRAGMA settings (see StorageConfig) and drop pooled connections
+    so the new settings apply on next use. Returns the active config.
+
+    >>> configure_storage(synchronous="NORMAL").synchronous
+    'NORMAL'
+    >>> configure_storage(synchronous="FULL").synchronous
+    'FULL'
+    """
+    global _config
+    _config = replace(_config, **overrides)
+    close_all_connections()
+    return _config
+
+
+def _open_connection(db_path: str) -> sqlite3.Connection:
+    """Open a connection and apply the configured PRAGMAs."""
+    cfg = _config
+    conn = sqlite3.connect(
+        db_path,
+        timeout=cfg.busy_timeout_ms / 1000.0,
+        cached_statements=cfg.cached_statements,
+        check_same_thread=False,
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA synchronous={cfg.synchronous}")
+    conn.execute(f"PRAGMA cache_size={int(cfg.cache_size)}")
+    conn.execute(f"PRAGMA mmap_size={int(cfg.mmap_size)}")
+    conn.execute(f"PRAGMA busy_timeout={int(cfg.busy_timeout_ms)}")
+    with _all_connections_lock:
+        _all_connections.append(conn)
+    return conn
+
+
+def _pooled(db_path: str) -> sqlite3.Connection:
+    """Return this thread's connection for db_path, opening it on first use."""
+    conns = getattr(_local, "conns", None)
+    if conns is None or _local.generation != _generation:
+        conns = _local.conns = {}
+        _local.generation = _generation
+    conn = conns.get(db_path)
+    if conn is None:
+        conn = conns[db_path] = _open_connection(db_path)
+    return conn
+
+
+def close_all_connections() -> None:
+    """
+    Close every pooled connection (all threads). Call on shutdown, or after
+    configure_storage(); threads transparently reopen on next use.
+    """
+    global _generation
+    with _all_connections_lock:
+        conns = list(_all_connections)
+        _all_connections.clear()
+        # Bumping the generation makes every thread drop its stale handles.
+        _generation += 1
+    for conn in conns:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+
+def init_db(db_path: str) -> None:
+    """
+    Create database and tables if they do not exist.
+    Enables WAL mode for better concurrency.
+
+    Tables:
+    - orders(order_id, status, payload_json, created_at, payload_format, user_id)
+    - order_items(order_id, sku, qty, created_at) — SKU side table for queries
+    - inventory_reservations(order_id, status, payload_json, created_at, payload_format)
+    - processed_messages(message_id, seen_at)
+    - inventory_stock(sku, available)
+    """
+    path = Path(db_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    with _connection(db_path) as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS orders (
+                order_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                payload_json TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                payload_format INTEGER NOT NULL DEFAULT 0,
+                user_id TEXT
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS order_items (
+                order_id TEXT NOT NULL,
+                sku TEXT NOT NULL,
+                qty INTEGER NOT NULL,
+                created_at TEXT NOT NULL,
+                PRIMARY KEY (order_id, sku)
+            ) WITHOUT ROWID
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS inventory_reservations (
+                order_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                payload_json TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                payload_format INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS processed_messages (
+                message_id TEXT PRIMARY KEY,
+                seen_at TEXT NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS inventory_stock (
+                sku TEXT PRIMARY KEY,
+                available INTEGER NOT NULL CHECK (available >= 0)
+            )
+        """)
+        # Databases created before payload codecs: existing rows are JSON (format 0)
+        for table in ("orders", "inventory_reservations"):
+            columns = {r["name"] for r in conn.execute(f"PRAGMA table_info({table})")}
+            if "payload_format" not in columns:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN payload_format INTEGER NOT NULL DEFAULT 0")
+        # Databases created before the query indexes: backfill user_id and order_items once
+        columns = {r["name"] for r in conn.execute("PRAGMA table_info(orders)")}
+        if "user_id" not in columns:
+            conn.execute("ALTER TABLE orders ADD COLUMN user_id TEXT")
+            _backfill_order_index(conn)
+        # Keyset pagination indexes: every list_orders() filter ends in (created_at, order_id)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_created ON orders (created_at, order_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_user ON orders (user_id, created_at, order_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_status ON orders (status, created_at, order_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_order_items_sku ON order_items (sku, created_at, order_id)")
+        # Supports retention pruning (DELETE ... WHERE seen_at < cutoff)
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_processed_messages_seen_at ON processed_messages (seen_at)"
+        )
+        conn.commit()
+
+
+def _backfill_order_index(conn: sqlite3.Connection) -> None:
+    """Populate user_id and order_items from existing order payloads."""
+    rows = conn.execute("SELECT order_id, status, payload_json, payload_format FROM orders").fetchall()
+    entries = [(codec_for(r["payload_format"]).decode_order(r["payload_json"]), r["status"]) for r in rows]
+    conn.executemany(
+        "UPDATE orders SET user_id = ? WHERE order_id = ?",
+        [(o.user_id, o.order_id) for o, _ in entries],
+    )
+    _write_order_items(conn, [o for o, _ in entries])
+
+
+def configure_read_cache(max_entries: int) -> None:
+    """Resize (and clear) the get_order/get_reservation cache; 0 disables it."""
+    _read_cache.resize(max_entries)
+
+
+def read_cache_stats() -> dict[str, Any]:
+    """
+    Read-cache counters: hits, misses, hit_rate, evictions, invalidations,
+    fills_skipped (fills dropped because a write raced the read), entries.
+    """
+    return _read_cache.stats()
+
+
+def _invalidate_orders(db_path: str, order_ids: list[str]) -> None:
+    if _read_cache.enabled:
+        for order_id in order_ids:
+            _read_cache.invalidate(("orders", db_path, order_id))
+
+
+def _invalidate_reservations(db_path: str, order_ids: list[str]) -> None:
+    if _read_cache.enabled:
+        for order_id in order_ids:
+            _read_cache.invalidate(("inventory_reservations", db_path, order_id))
+
+
+@contextmanager
+def _connection(db_path: str):
+    """Context manager for this thread's pooled connection (commit on exit, rollback on error)."""
+    conn = _pooled(db_path)
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+@metrics.timed(_OP_SECONDS.labels("save_order"))
+def save_order(db_path: str, order: Order, status: str) -> None:
+    """Persist an order. Overwrites if order_id already exists."""
+    with _connection(db_path) as conn:
+        _upsert_orders(conn, [(order, status)])
+    _invalidate_orders(db_path, [order.order_id])
+
+
+@metrics.timed(_OP_SECONDS.labels("get_order"))
+def get_order(db_path: str, order_id: str) -> tuple[Order, str] | None:
+    """
+    Return (Order, status) for the given order_id, or None if not found.
+    Served from the read cache when possible; treat the result as read-only.
+
+    >>> import tempfile
+    >>> db = tempfile.mktemp(suffix=".db")
+    >>> init_db(db)
+    >>> from common.models import Order
+    >>> from common.ids import now_iso
+    >>> o = Order(order_id="o1", user_id="u1", items=[], created_at=now_iso())
+    >>> save_order(db, o, "PENDING")
+    >>> got = get_order(db, "o1")
+    >>> got is not None and got[0].order_id == "o1" and got[1] == "PENDING"
+    True
+    >>> update_order_status(db, "o1", "CONFIRMED")
+    >>> get_order(db, "o1")[1]
+    'CONFIRMED'
+    """
+    cached = peek_order(db_path, order_id)
+    if cached is not None:
+        return cached
+    return _load_order(db_path, order_id)
+
+
+def peek_order(db_path: str, order_id: str) -> tuple[Order, str] | None:
+    """get_order() from the read cache only: None on a miss, never touches SQLite."""
+    return _read_cache.get(("orders", db_path, order_id)) if _read_cache.enabled else None
+
+
+def _load_order(db_path: str, order_id: str) -> tuple[Order, str] | None:
+    """get_order() from SQLite, filling the read cache."""
+    key = ("orders", db_path, order_id)
+    token = _read_cache.token()
+    with _connection(db_path) as conn:
+        row = conn.execute(
+            "SELECT order_id, status, payload_json, created_at, payload_format FROM orders WHERE order_id = ?",
+            (order_id,),
+        ).fetchone()
+    if row is None:
+        return None
+    order = codec_for(row["payload_format"]).decode_order(row["payload_json"])
+    result = (order, row["status"])
+    if _read_cache.enabled:
+        _read_cache.fill(key, result, token)
+    return result
+
+
+@metrics.timed(_OP_SECONDS.labels("update_order_status"))
+def update_order_status(db_path: str, order_id: str, status: str) -> None:
+    """Update the status of an existing order. No-op if order_id not found."""
+    with _connection(db_path) as conn:
+        conn.execute("UPDATE orders SET status = ? WHERE order_id = ?", (status, order_id))
+    _invalidate_orders(db_path, [order_id])
+
+
+@metrics.timed(_OP_SECONDS.labels("try_create_reservation"))
+def try_create_reservation(
+    db_path: str,
+    order_id: str,
+    status: str,
+    payload: dict[str, Any],
+) -> bool:
+    """
+    Insert a reservation if one does not exist (idempotency anchor).
+    Returns True if inserted, False if order_id already existed.
+
+    >>> import tempfile
+    >>> db = tempfile.mktemp(suffix=".db")
+    >>> init_db(db)
+    >>> try_create_reservation(db, "ord1", "RESERVED", {"qty": 2})
+    True
+    >>> try_create_reservation(db, "ord1", "RESERVED", {"qty": 2})
+    False
+    """
+    codec = active_codec()
+    payload_raw = codec.encode(payload)
+    from common.ids import now_iso
+    created_at = now_iso()
+    with _connection(db_path) as conn:
+        try:
+            conn.execute(
+                """
+                INSERT INTO inventory_reservations (order_id, status, payload_json, created_at, payload_format)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (order_id, status, payload_raw, created_at, codec.format_id),
+            )
+            inserted = True
+        except sqlite3.IntegrityError:
+            inserted = False
+    if inserted:
+        _invalidate_reservations(db_path, [order_id])
+    return inserted
+
+
+@metrics.timed(_OP_SECONDS.labels("get_reservation"))
+def get_reservation(db_path: str, order_id: str) -> dict[str, Any] | None:
+    """
+    Return reservation row as dict (status, payload, created_at, order_id)
+    or None if not found. The stored payload is decoded to a dict. Served from the
+    read cache when possible; treat the result as read-only.
+    """
+    key = ("inventory_reservations", db_path, order_id)
+    cached = _read_cache.get(key) if _read_cache.enabled else None
+    if cached is not None:
+        return cached
+    token = _read_cache.token()
+    with _connection(db_path) as conn:
+        row = conn.execute(
+            "SELECT order_id, status, payload_json, created_at, payload_format FROM inventory_reservations WHERE order_id = ?",
+            (order_id,),
+        ).fetchone()
+    if row is None:
+        return None
+    result = {
+        "order_id": row["order_id"],
+        "status": row["status"],
+        "payload": codec_for(row["payload_format"]).decode(row["payload_json"]),
+        "created_at": row["created_at"],
+    }
+    if _read_cache.enabled:
+        _read_cache.fill(key, result, token)
+    return result
+
+
+@metrics.timed(_OP_SECONDS.labels("mark_message_processed"))
+def mark_message_processed(db_path: str, message_id: str) -> bool:
+    """
+    Record that a message was processed (idempotency). Returns True if inserted,
+    False if message_id was already seen.
+
+    >>> import tempfile
+    >>> db = tempfile.mktemp(suffix=".db")
+    >>> init_db(db)
+    >>> mark_message_processed(db, "msg-1")
+    True
+    >>> mark_message_processed(db, "msg-1")
+    False
+    """
+    from common.ids import now_iso
+    seen_at = now_iso()
+    with _connection(db_path) as conn:
+        try:
+            conn.execute(
+                "INSERT INTO processed_messages (message_id, seen_at) VALUES (?, ?)",
+                (message_id, seen_at),
+            )
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+
+@metrics.timed(_OP_SECONDS.labels("is_message_processed"))
+def is_message_processed(db_path: str, message_id: str) -> bool:
+    """Return True if message_id has been recorded (read-only check)."""
+    with _connection(db_path) as conn:
+        row = conn.execute(
+            "SELECT 1 FROM processed_messages WHERE message_id = ?",
+            (message_id,),
+        ).fetchone()
+    return row is not None
+
+
+@metrics.timed(_OP_SECONDS.labels("prune_processed_messages"))
+def prune_processed_messages(db_path: str, older_than: str, chunk_size: int = 5000) -> int:
+    """
+    Delete processed_messages rows with seen_at < older_than (ISO 8601, same
+    format as now_iso()). Deletes in chunks so writers are never locked out for
+    long. Returns the number of rows deleted.
+
+    >>> import tempfile
+    >>> db = tempfile.mktemp(suffix=".db")
+    >>> init_db(db)
+    >>> mark_message_processed(db, "old")
+    True
+    >>> prune_processed_messages(db, "9999-01-01T00:00:00.000000Z"), count_processed_messages(db)
+    (1, 0)
+    """
+    deleted = 0
+    while True:
+        with _connection(db_path) as conn:
+            cur = conn.execute(
+                """
+                DELETE FROM processed_messages WHERE rowid IN (
+                    SELECT rowid FROM processed_messages WHERE seen_at < ? LIMIT ?
+                )
+                """,
+                (older_than, chunk_size),
+            )
+            n = cur.rowcount
+        deleted += n
+        if n < chunk_size:
+            return deleted
+
+
+def count_processed_messages(db_path: str) -> int:
+    """Return the number of rows in processed_messages."""
+    with _connection(db_path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM processed_messages").fetchone()[0]
+
+
+# -----------------------------------------------------------------------------
+# Batch writes (one transaction per batch)
+# -----------------------------------------------------------------------------
+
+# Stay well below SQLite's host-parameter limit for IN (...) lookups.
+_IN_CHUNK = 500
+
+
+def _existing_keys(conn: sqlite3.Connection, table: str, column: str, keys: list[str]) -> set[str]:
+    """Return the subset of keys already present in table.column."""
+    found: set[str] = set()
+    for i in range(0, len(keys), _IN_CHUNK):
+        chunk = keys[i:i + _IN_CHUNK]
+        marks = ",".join("?" * len(chunk))
+        rows = conn.execute(f"SELECT {column} FROM {table} WHERE {column} IN ({marks})", chunk)
+        found.update(r[0] for r in rows)
+    return found
+
+
+def _new_flags(keys: list[str], existing: set[str]) -> list[bool]:
+    """True for keys not in existing; repeats within the batch count as duplicates."""
+    seen = set(existing)
+    flags = []
+    for key in keys:
+        flags.append(key not in seen)
+        seen.add(key)
+    return flags
+
+
+@metrics.timed(_OP_SECONDS.labels("save_orders_many"))
+def save_orders_many(db_path: str, orders: list[Order], status: str) -> list[bool]:
+    """
+    Persist a batch of orders in a single transaction (overwrite semantics as
+    in save_order). Returns one flag per order: True if the order_id was new,
+    False if it replaced an existing row.
+
+    >>> import tempfile
+    >>> db = tempfile.mktemp(suffix=".db")
+    >>> init_db(db)
+    >>> from common.models import Order
+    >>> a = Order(order_id="a", user_id="u1", items=[], created_at="t")
+    >>> save_orders_many(db, [a, a], "PENDING")
+    [True, False]
+    >>> save_orders_many(db, [a], "CONFIRMED"), get_order(db, "a")[1]
+    ([False], 'CONFIRMED')
+    """
+    if not orders:
+        return []
+    with _connection(db_path) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        flags = _insert_orders(conn, [(o, status) for o in orders])
+    _invalidate_orders(db_path, [o.order_id for o in orders])
+    return flags
+
+
+def _insert_orders(conn: sqlite3.Connection, entries: list[tuple[Order, str]]) -> list[bool]:
+    """INSERT OR REPLACE (order, status) pairs inside the caller's transaction; returns new-key flags."""
+    keys = [o.order_id for o, _ in entries]
+    flags = _new_flags(keys, _existing_keys(conn, "orders", "order_id", keys))
+    _upsert_orders(conn, entries)
+    return flags
+
+
+def _upsert_orders(conn: sqlite3.Connection, entries: list[tuple[Order, str]]) -> None:
+    """Write order rows and their order_items index rows (caller owns the transaction)."""
+    codec = active_codec()
+    conn.executemany(
+        """
+        INSERT OR REPLACE INTO orders (order_id, status, payload_json, created_at, payload_format, user_id)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        [
+            (o.order_id, status, codec.encode_order(o), o.created_at, codec.format_id, o.user_id)
+            for o, status in entries
+        ],
+    )
+    _write_order_items(conn, [o for o, _ in entries])
+
+
+def _write_order_items(conn: sqlite3.Connection, orders: list[Order]) -> None:
+    conn.executemany("DELETE FROM order_items WHERE order_id = ?", [(o.order_id,) for o in orders])
+    rows = []
+    for o in orders:
+        qty_by_sku: dict[str, int] = {}
+        for item in o.items:
+            qty_by_sku[item.sku] = qty_by_sku.get(item.sku, 0) + item.qty
+        rows.extend((o.order_id, sku, qty, o.created_at) for sku, qty in qty_by_sku.items())
+    conn.executemany(
+        "INSERT INTO order_items (order_id, sku, qty, created_at) VALUES (?, ?, ?, ?)",
+        rows,
+    )
+
+
+@metrics.timed(_OP_SECONDS.labels("try_create_reservations_many"))
+def try_create_reservations_many(
+    db_path: str,
+    reservations: list[tuple[str, str, dict[str, Any]]],
+) -> list[bool]:
+    """
+    Batch form of try_create_reservation: reservations is a list of
+    (order_id, status, payload). Inserts every new order_id in a single
+    transaction; existing rows are left untouched. Returns one flag per item:
+    True if inserted, False if the order_id already existed (or repeated
+    earlier in the batch).
+
+    >>> import tempfile
+    >>> db = tempfile.mktemp(suffix=".db")
+    >>> init_db(db)
+    >>> try_create_reservation(db, "o1", "RESERVED", {})
+    True
+    >>> try_create_reservations_many(db, [("o1", "RESERVED", {}), ("o2", "RESERVED", {}), ("o2", "RESERVED", {})])
+    [False, True, False]
+    """
+    if not reservations:
+        return []
+    from common.ids import now_iso
+    created_at = now_iso()
+    keys = [r[0] for r in reservations]
+    codec = active_codec()
+    rows = [
+        (order_id, status, codec.encode(payload), created_at, codec.format_id)
+        for order_id, status, payload in reservations
+    ]
+    with _connection(db_path) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        flags = _new_flags(keys, _existing_keys(conn, "inventory_reservations", "order_id", keys))
+        conn.executemany(
+            """
+            INSERT OR IGNORE INTO inventory_reservations (order_id, status, payload_json, created_at, payload_format)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            rows,
+        )
+    _invalidate_reservations(db_path, [k for k, new in zip(keys, flags) if new])
+    return flags
+
+
+@metrics.timed(_OP_SECONDS.labels("mark_messages_processed_many"))
+def mark_messages_processed_many(db_path: str, message_ids: list[str]) -> list[bool]:
+    """
+    Batch form of mark_message_processed, one transaction for the whole batch.
+    Returns one flag per message_id: True if newly recorded, False if it was
+    already seen (including earlier in the same batch).
+
+    >>> import tempfile
+    >>> db = tempfile.mktemp(suffix=".db")
+    >>> init_db(db)
+    >>> mark_message_processed(db, "m1")
+    True
+    >>> mark_messages_processed_many(db, ["m1", "m2", "m2", "m3"])
+    [False, True, False, True]
+    """
+    if not message_ids:
+        return []
+    from common.ids import now_iso
+    seen_at = now_iso()
+    keys = list(message_ids)
+    with _connection(db_path) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        flags = _new_flags(keys, _existing_keys(conn, "processed_messages", "message_id", keys))
+        conn.executemany(
+            "INSERT OR IGNORE INTO processed_messages (message_id, seen_at) VALUES (?, ?)",
+            [(k, seen_at) for k in keys],
+        )
+    return flags
@@ -0,0 +1,163 @@
+"""
+Awaitable wrappers around common.storage for asyncio services.
+
+Writes run on one dedicated writer thread (SQLite allows a single writer per
+file anyway, so this avoids lock contention and keeps one warm connection);
+reads run on a small reader pool so lookups are not queued behind commits.
+Either way, the event loop never blocks on disk I/O.
+
+    from common.storage import aio as storage_aio
+
+    if not await storage_aio.mark_message_processed(DB_PATH, event_id):
+        return
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from common import storage
+from common.models import Item, Order
+from common.storage import queries, stock
+
+# Same series as the sync helper, so cache hits served here stay in the get_order distribution
+_GET_ORDER_SECONDS = storage._OP_SECONDS.labels("get_order")
+
+T = TypeVar("T")
+
+_READER_THREADS = int(os.getenv("STORAGE_AIO_READERS", "4"))
+
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="storage-writer")
+_readers = ThreadPoolExecutor(max_workers=_READER_THREADS, thread_name_prefix="storage-reader")
+
+
+async def _run(executor: ThreadPoolExecutor, fn: Callable[..., T], *args: Any) -> T:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(fn, *args))
+
+
+async def init_db(db_path: str) -> None:
+    """Awaitable storage.init_db."""
+    await _run(_writer, storage.init_db, db_path)
+
+
+async def save_order(db_path: str, order: Order, status: str) -> None:
+    """Awaitable storage.save_order."""
+    await _run(_writer, storage.save_order, db_path, order, status)
+
+
+async def get_order(db_path: str, order_id: str) -> tuple[Order, str] | None:
+    """
+    Awaitable storage.get_order.
+
+    >>> import tempfile
+    >>> db = tempfile.mktemp(suffix=".db")
+    >>> async def demo():
+    ...     await init_db(db)
+    ...     await save_order(db, Order(order_id="o1", user_id="u1", items=[], created_at="t"), "PENDING")
+    ...     return (await get_order(db, "o1"))[1]
+    >>> asyncio.run(demo())
+    'PENDING'
+    """
+    start = time.perf_counter()
+    cached = storage.peek_order(db_path, order_id)  # read-cache hit: no thread hop
+    if cached is not None:
+        _GET_ORDER_SECONDS.observe(time.perf_counter() - start)
+        return cached
+    # Miss: storage.get_order (timed in the reader thread) re-checks the cache, then loads
+    return await _run(_readers, storage.get_order, db_path, order_id)
+
+
+async def update_order_status(db_path: str, order_id: str, status: str) -> None:
+    """Awaitable storage.update_order_status."""
+    await _run(_writer, storage.update_order_status, db_path, order_id, status)
+
+
+async def try_create_reservation(
+    db_path: str,
+    order_id: str,
+    status: str,
+    payload: dict[str, Any],
+) -> bool:
+    """Awaitable storage.try_create_reservation."""
+    return await _run(_writer, storage.try_create_reservation, db_path, order_id, status, payload)
+
+
+async def get_reservation(db_path: str, order_id: str) -> dict[str, Any] | None:
+    """Awaitable storage.get_reservation."""
+    return await _run(_readers, storage.get_reservation, db_path, order_id)
+
+
+async def mark_message_processed(db_path: str, message_id: str) -> bool:
+    """
+    Awaitable storage.mark_message_processed.
+
+    >>> import tempfile
+    >>> db = tempfile.mktemp(suffix=".db")
+    >>> async def demo():
+    ...     await init_db(db)
+    ...     return [await mark_message_processed(db, "m1") for _ in range(2)]
+    >>> asyncio.run(demo())
+    [True, False]
+    """
+    return await _run(_writer, storage.mark_message_processed, db_path, message_id)
+
+
+async def save_orders_many(db_path: str, orders: list[Order], status: str) -> list[bool]:
+    """Awaitable storage.save_orders_many."""
+    return await _run(_writer, storage.save_orders_many, db_path, orders, status)
+
+
+async def try_create_reservations_many(
+    db_path: str,
+    reservations: list[tuple[str, str, dict[str, Any]]],
+) -> list[bool]:
+    """Awaitable storage.try_create_reservations_many."""
+    return await _run(_writer, storage.try_create_reservations_many, db_path, reservations)
+
+
+async def mark_messages_processed_many(db_path: str, message_ids: list[str]) -> list[bool]:
+    """Awaitable storage.mark_messages_processed_many."""
+    return await _run(_writer, storage.mark_messages_processed_many, db_path, message_ids)
+
+
+async def reserve_stock(
+    db_path: str,
+    order_id: str,
+    items: list[Item],
+    payload: dict[str, Any] | None = None,
+) -> tuple[str, str | None]:
+    """Awaitable storage.stock.reserve_stock."""
+    return await _run(_writer, stock.reserve_stock, db_path, order_id, items, payload)
+
+
+async def reserve_stock_many(
+    db_path: str,
+    requests: list[tuple[str, list[Item], dict[str, Any] | None]],
+) -> list[tuple[str, str | None]]:
+    """Awaitable storage.stock.reserve_stock_many."""
+    return await _run(_writer, stock.reserve_stock_many, db_path, requests)
+
+
+async def list_orders(
+    db_path: str,
+    user_id: str | None = None,
+    status: str | None = None,
+    sku: str | None = None,
+    after: str | None = None,
+    limit: int = 50,
+    created_before: str | None = None,
+) -> tuple[list[tuple[Order, str]], str | None]:
+    """Awaitable storage.queries.list_orders."""
+    return await _run(_readers, queries.list_orders, db_path, user_id, status, sku, after, limit, created_before)
+
+
+def shutdown(wait: bool = True) -> None:
+    """Stop the writer and reader threads (pending writes finish when wait=True)."""
+    _writer.shutdown(wait=wait)
+    _readers.shutdown(wait=wait)
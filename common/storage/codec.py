@@ -0,0 +1,270 @@
+"""
+Pluggable payload codecs for stored orders and reservations.
+
+Each row records the codec that wrote it in a payload_format column, so rows
+in different formats can coexist and legacy JSON rows (format 0) keep reading
+transparently after a codec switch.
+
+| format | name    | storage | notes |
+|--------|---------|---------|-------|
+| 0      | json    | TEXT    | legacy default; Pydantic parses it directly |
+| 1      | msgpack | BLOB    | needs the optional msgpack package |
+| 2      | packed  | BLOB    | stdlib-only tagged binary (varints, no key quoting) |
+
+The codec used for new writes comes from STORAGE_PAYLOAD_CODEC (default
+json) or configure_payload_codec(). Existing rows are converted online, in
+short batches, with:
+
+    python -m common.storage.migrate /data/orders.db --to msgpack
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import struct
+from typing import Any
+
+from common.models import Order
+from common.varint import get_varint, put_varint, unzigzag, zigzag
+
+try:
+    import msgpack
+    _HAS_MSGPACK = True
+except ImportError:
+    _HAS_MSGPACK = False
+
+
+# -----------------------------------------------------------------------------
+# Codecs
+# -----------------------------------------------------------------------------
+
+
+class JsonCodec:
+    """Format 0: JSON text (the original payload_json encoding)."""
+
+    format_id = 0
+    name = "json"
+
+    def encode(self, value: dict[str, Any]) -> str:
+        return json.dumps(value)
+
+    def decode(self, raw: str | bytes) -> dict[str, Any]:
+        return json.loads(raw)
+
+    def encode_order(self, order: Order) -> str:
+        return order.model_dump_json()
+
+    def decode_order(self, raw: str | bytes) -> Order:
+        return Order.model_validate_json(raw)
+
+
+class MsgpackCodec:
+    """Format 1: msgpack (C extension; optional dependency)."""
+
+    format_id = 1
+    name = "msgpack"
+
+    def encode(self, value: dict[str, Any]) -> bytes:
+        return msgpack.packb(value, use_bin_type=True)
+
+    def decode(self, raw: bytes) -> dict[str, Any]:
+        return msgpack.unpackb(raw, raw=False)
+
+    def encode_order(self, order: Order) -> bytes:
+        return self.encode(order.model_dump(mode="json"))
+
+    def decode_order(self, raw: bytes) -> Order:
+        return Order.model_validate(self.decode(raw))
+
+
+def _put_str(out: bytearray, s: str) -> None:
+    data = s.encode()
+    put_varint(out, len(data))
+    out += data
+
+
+def _get_str(buf: bytes, pos: int) -> tuple[str, int]:
+    n, pos = get_varint(buf, pos)
+    return buf[pos:pos + n].decode(), pos + n
+
+
+class PackedCodec:
+    """
+    Format 2: stdlib-only tagged binary for JSON-compatible values.
+
+    >>> c = PackedCodec()
+    >>> v = {"order_id": "o1", "items": [{"sku": "fries", "qty": 2}], "x": None, "ok": True, "f": 1.5, "n": -3}
+    >>> c.decode(c.encode(v)) == v
+    True
+    """
+
+    format_id = 2
+    name = "packed"
+
+    def encode(self, value: Any) -> bytes:
+        out = bytearray()
+        self._encode(out, value)
+        return bytes(out)
+
+    def _encode(self, out: bytearray, v: Any) -> None:
+        if v is None:
+            out += b"N"
+        elif v is True:
+            out += b"T"
+        elif v is False:
+            out += b"F"
+        elif isinstance(v, int):
+            out += b"i"
+            put_varint(out, zigzag(v))
+        elif isinstance(v, float):
+            out += b"d" + struct.pack("<d", v)
+        elif isinstance(v, str):
+            out += b"s"
+            _put_str(out, v)
+        elif isinstance(v, (list, tuple)):
+            out += b"l"
+            put_varint(out, len(v))
+            for x in v:
+                self._encode(out, x)
+        elif isinstance(v, dict):
+            out += b"m"
+            put_varint(out, len(v))
+            for k, x in v.items():
+                _put_str(out, str(k))
+                self._encode(out, x)
+        else:
+            raise TypeError(f"Cannot pack {type(v).__name__}")
+
+    def decode(self, raw: bytes) -> Any:
+        value, _ = self._decode(bytes(raw), 0)
+        return value
+
+    def _decode(self, buf: bytes, pos: int) -> tuple[Any, int]:
+        tag = buf[pos]
+        pos += 1
+        if tag == 0x73:  # s
+            return _get_str(buf, pos)
+        if tag == 0x69:  # i
+            z, pos = get_varint(buf, pos)
+            return unzigzag(z), pos
+        if tag == 0x6D:  # m
+            n, pos = get_varint(buf, pos)
+            d = {}
+            for _ in range(n):
+                k, pos = _get_str(buf, pos)
+                d[k], pos = self._decode(buf, pos)
+            return d, pos
+        if tag == 0x6C:  # l
+            n, pos = get_varint(buf, pos)
+            items = []
+            for _ in range(n):
+                x, pos = self._decode(buf, pos)
+                items.append(x)
+            return items, pos
+        if tag == 0x64:  # d
+            return struct.unpack_from("<d", buf, pos)[0], pos + 8
+        if tag == 0x4E:
+            return None, pos
+        if tag == 0x54:
+            return True, pos
+        if tag == 0x46:
+            return False, pos
+        raise ValueError(f"Bad packed tag {tag:#x} at {pos - 1}")
+
+    def encode_order(self, order: Order) -> bytes:
+        return self.encode(order.model_dump(mode="json"))
+
+    def decode_order(self, raw: bytes) -> Order:
+        return Order.model_validate(self.decode(raw))
+
+
+_CODECS: dict[int, Any] = {JsonCodec.format_id: JsonCodec(), PackedCodec.format_id: PackedCodec()}
+if _HAS_MSGPACK:
+    _CODECS[MsgpackCodec.format_id] = MsgpackCodec()
+_BY_NAME = {c.name: c for c in _CODECS.values()}
+
+
+def get_codec(name: str):
+    """Return the codec registered under name (json, msgpack, packed)."""
+    try:
+        return _BY_NAME[name]
+    except KeyError:
+        hint = " (pip install msgpack)" if name == "msgpack" else ""
+        raise ValueError(f"Unknown or unavailable payload codec: {name!r}{hint}") from None
+
+
+def codec_for(format_id: int):
+    """Return the codec that wrote a row with this payload_format."""
+    try:
+        return _CODECS[format_id]
+    except KeyError:
+        raise ValueError(f"No codec available for payload_format {format_id}") from None
+
+
+_active = get_codec(os.getenv("STORAGE_PAYLOAD_CODEC", "json"))
+
+
+def configure_payload_codec(name: str) -> None:
+    """Select the codec used for new writes; reads always follow each row's format."""
+    global _active
+    _active = get_codec(name)
+
+
+def active_codec():
+    return _active
+
+
+# -----------------------------------------------------------------------------
+# Online migration
+# -----------------------------------------------------------------------------
+
+
+def migrate_payload_format(db_path: str, to: str, batch_size: int = 500) -> dict[str, int]:
+    """
+    Re-encode every orders / inventory_reservations row not already in codec
+    `to`, one short transaction per batch so live writers are never blocked
+    for long. Safe to interrupt and re-run. Returns rows converted per table.
+
+    >>> import tempfile
+    >>> from common.storage import init_db, save_order, get_order
+    >>> db = tempfile.mktemp(suffix=".db")
+    >>> init_db(db)
+    >>> save_order(db, Order(order_id="o1", user_id="u1", items=[], created_at="t"), "PENDING")
+    >>> migrate_payload_format(db, "packed")
+    {'orders': 1, 'inventory_reservations': 0}
+    >>> get_order(db, "o1")[0].user_id
+    'u1'
+    """
+    from common.storage import _connection
+
+    target = get_codec(to)
+    converted = {}
+    for table in ("orders", "inventory_reservations"):
+        total = 0
+        last_rowid = 0
+        while True:
+            with _connection(db_path) as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                rows = conn.execute(
+                    f"""
+                    SELECT rowid, payload_json, payload_format FROM {table}
+                    WHERE rowid > ? AND payload_format != ?
+                    ORDER BY rowid LIMIT ?
+                    """,
+                    (last_rowid, target.format_id, batch_size),
+                ).fetchall()
+                conn.executemany(
+                    f"UPDATE {table} SET payload_json = ?, payload_format = ? WHERE rowid = ?",
+                    [
+                        (target.encode(codec_for(r["payload_format"]).decode(r["payload_json"])), target.format_id, r["rowid"])
+                        for r in rows
+                    ],
+                )
+            total += len(rows)
+            if len(rows) < batch_size:
+                break
+            last_rowid = rows[-1]["rowid"]
+        converted[table] = total
+    return converted
+
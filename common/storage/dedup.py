@@ -0,0 +1,246 @@
+"""
+Layered message-id deduplication in front of processed_messages.
+
+DedupStore keeps recently seen message ids in a bounded in-process LRU with a
+TTL, so redeliveries of recent messages are answered without touching SQLite.
+An optional Bloom filter answers "definitely never seen" for is_processed()
+without a disk lookup. SQLite stays the source of truth; a background pruning
+thread deletes rows older than the retention window so the table and its
+primary-key index stop growing without bound.
+
+Hit/miss counts, LRU size and table size are exported through common.metrics
+(dedup_*{name}) as well as returned by stats().
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any
+
+from common import metrics, storage
+from common.timeutils import utc_now
+
+logger = logging.getLogger(__name__)
+
+HITS = metrics.counter("dedup_hits_total", "Message ids answered by the dedup cache", ["name"])
+MISSES = metrics.counter("dedup_misses_total", "Dedup cache misses (looked up in SQLite)", ["name"])
+EVICTIONS = metrics.counter("dedup_evictions_total", "Ids evicted from the dedup cache (LRU)", ["name"])
+BLOOM_NEGATIVES = metrics.counter("dedup_bloom_negatives_total", "is_processed() answered by the Bloom filter", ["name"])
+DB_DUPLICATES = metrics.counter("dedup_db_duplicates_total", "Duplicates only caught by SQLite", ["name"])
+PRUNED = metrics.counter("dedup_pruned_rows_total", "processed_messages rows deleted by retention", ["name"])
+CACHE_ENTRIES = metrics.gauge("dedup_cache_entries", "Ids held in the dedup cache", ["name"])
+TABLE_ROWS = metrics.gauge("dedup_table_rows", "processed_messages rows (measured on each prune)", ["name"])
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings (no deletes; false positives only).
+
+    >>> bf = BloomFilter(capacity=1000, error_rate=0.01)
+    >>> bf.add("m1")
+    >>> "m1" in bf, "m2" in bf
+    (True, False)
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01) -> None:
+        capacity = max(1, capacity)
+        self._m = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self._k = max(1, round(self._m / capacity * math.log(2)))
+        self._bits = bytearray((self._m + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self._k):
+            yield (h1 + i * h2) % self._m
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class DedupStore:
+    """
+    Idempotency store: TTL/LRU cache (+ optional Bloom filter) over SQLite.
+
+    mark_processed() has the same contract as storage.mark_message_processed():
+    True the first time a message_id is seen, False for duplicates.
+
+    >>> import tempfile
+    >>> db = tempfile.mktemp(suffix=".db")
+    >>> storage.init_db(db)
+    >>> d = DedupStore(db, cache_size=2, bloom_capacity=100)
+    >>> d.mark_processed("m1"), d.mark_processed("m1"), d.is_processed("m2")
+    (True, False, False)
+    >>> d.stats()["cache_hits"], HITS.labels("messages").value >= 1
+    (1, True)
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        cache_size: int = 100_000,
+        ttl_seconds: float = 3600.0,
+        retention_seconds: float = 7 * 24 * 3600.0,
+        bloom_capacity: int = 0,
+        bloom_error_rate: float = 0.01,
+        name: str = "messages",
+    ) -> None:
+        self._db_path = db_path
+        self._cache_size = max(1, cache_size)
+        # A cached id must not outlive its row, or the cache and table would disagree.
+        self._ttl = min(ttl_seconds, retention_seconds)
+        self._retention = retention_seconds
+        self._cache: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+        self._bloom: BloomFilter | None = None
+        if bloom_capacity > 0:
+            self._bloom = BloomFilter(bloom_capacity, bloom_error_rate)
+            self._load_bloom()
+        self._stop = threading.Event()
+        self._pruner: threading.Thread | None = None
+        self._counters = {
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "cache_evictions": 0,
+            "bloom_negatives": 0,
+            "db_duplicates": 0,
+            "pruned_rows": 0,
+        }
+        self._table_size: int | None = None
+        self._hits = HITS.labels(name)
+        self._misses = MISSES.labels(name)
+        self._evictions = EVICTIONS.labels(name)
+        self._bloom_negatives = BLOOM_NEGATIVES.labels(name)
+        self._db_duplicates = DB_DUPLICATES.labels(name)
+        self._pruned = PRUNED.labels(name)
+        self._cache_entries = CACHE_ENTRIES.labels(name)
+        self._table_rows = TABLE_ROWS.labels(name)
+
+    def _load_bloom(self) -> None:
+        with storage._connection(self._db_path) as conn:
+            for (message_id,) in conn.execute("SELECT message_id FROM processed_messages"):
+                self._bloom.add(message_id)
+
+    # -- cache ---------------------------------------------------------------
+
+    def _cache_hit(self, message_id: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            expires = self._cache.get(message_id)
+            if expires is not None and expires > now:
+                self._cache.move_to_end(message_id)
+                self._counters["cache_hits"] += 1
+                self._hits.inc()
+                return True
+            if expires is not None:
+                del self._cache[message_id]
+            self._counters["cache_misses"] += 1
+            self._misses.inc()
+            return False
+
+    def _remember(self, message_id: str) -> None:
+        with self._lock:
+            self._cache[message_id] = time.monotonic() + self._ttl
+            self._cache.move_to_end(message_id)
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+                self._counters["cache_evictions"] += 1
+                self._evictions.inc()
+            self._cache_entries.set(len(self._cache))
+            if self._bloom is not None:
+                self._bloom.add(message_id)
+
+    # -- dedup API -----------------------------------------------------------
+
+    def mark_processed(self, message_id: str) -> bool:
+        """Record message_id; True if new, False if duplicate (cache or SQLite)."""
+        if self._cache_hit(message_id):
+            return False
+        inserted = storage.mark_message_processed(self._db_path, message_id)
+        self._after_insert(message_id, inserted)
+        return inserted
+
+    async def mark_processed_async(self, message_id: str) -> bool:
+        """Same as mark_processed(); the SQLite insert runs on common.storage.aio's writer."""
+        if self._cache_hit(message_id):
+            return False
+        from common.storage import aio as storage_aio
+        inserted = await storage_aio.mark_message_processed(self._db_path, message_id)
+        self._after_insert(message_id, inserted)
+        return inserted
+
+    def _after_insert(self, message_id: str, inserted: bool) -> None:
+        if not inserted:
+            with self._lock:
+                self._counters["db_duplicates"] += 1
+            self._db_duplicates.inc()
+        self._remember(message_id)
+
+    def is_processed(self, message_id: str) -> bool:
+        """Read-only check; the Bloom filter short-circuits ids never seen."""
+        if self._cache_hit(message_id):
+            return True
+        if self._bloom is not None and message_id not in self._bloom:
+            with self._lock:
+                self._counters["bloom_negatives"] += 1
+            self._bloom_negatives.inc()
+            return False
+        return storage.is_message_processed(self._db_path, message_id)
+
+    # -- retention -----------------------------------------------------------
+
+    def prune(self) -> int:
+        """Delete rows older than the retention window; refreshes table_size."""
+        cutoff = (utc_now() - timedelta(seconds=self._retention)).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        deleted = storage.prune_processed_messages(self._db_path, cutoff)
+        size = storage.count_processed_messages(self._db_path)
+        with self._lock:
+            self._counters["pruned_rows"] += deleted
+            self._table_size = size
+        self._pruned.inc(deleted)
+        self._table_rows.set(size)
+        return deleted
+
+    def start_pruning(self, interval_seconds: float = 300.0) -> None:
+        """Run prune() every interval_seconds on a daemon thread."""
+        if self._pruner is not None:
+            return
+
+        def loop() -> None:
+            while not self._stop.wait(interval_seconds):
+                try:
+                    deleted = self.prune()
+                    logger.info("Dedup prune: deleted %d rows; %s", deleted, self.stats())
+                except Exception as e:
+                    logger.warning("Dedup prune failed: %s", e)
+
+        self._pruner = threading.Thread(target=loop, name="dedup-pruner", daemon=True)
+        self._pruner.start()
+
+    def stop(self) -> None:
+        """Stop the pruning thread, if running."""
+        self._stop.set()
+        if self._pruner is not None:
+            self._pruner.join()
+            self._pruner = None
+
+    def stats(self) -> dict[str, Any]:
+        """Counters plus cache hit rate, cache size and last-measured table size."""
+        with self._lock:
+            out: dict[str, Any] = dict(self._counters)
+            lookups = out["cache_hits"] + out["cache_misses"]
+            out["cache_hit_rate"] = out["cache_hits"] / lookups if lookups else 0.0
+            out["cache_entries"] = len(self._cache)
+            out["table_size"] = self._table_size
+        return out
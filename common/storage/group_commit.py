@@ -0,0 +1,118 @@
+"""
+Group-commit writer for order persistence.
+
+Concurrent callers submit orders; a single background thread collects them
+over a short window (max_batch rows or max_delay_ms, whichever comes first)
+and writes the whole group in one transaction. Each caller's future resolves
+only after the transaction holding its row has committed, so durability is
+the same as save_order() while commits (and fsyncs) are shared.
+"""
+
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from common import metrics
+from common.models import Order
+from common.storage import _connection, _insert_orders, _invalidate_orders
+
+logger = logging.getLogger(__name__)
+
+_BATCH_SIZE = metrics.histogram("group_commit_batch_size", "Orders per group commit", buckets=metrics.SIZE_BUCKETS)
+_COMMIT_SECONDS = metrics.histogram("group_commit_seconds", "Group commit transaction time")
+
+_STOP = object()
+
+
+class GroupCommitWriter:
+    """
+    Batch concurrent save_order() calls into shared transactions.
+
+    submit() returns a concurrent.futures.Future resolving to True if the
+    order_id was new, False if it replaced an existing row. From asyncio, use
+    `await asyncio.wrap_future(writer.submit(order, status))`.
+
+    >>> import tempfile
+    >>> from common.storage import init_db, get_order
+    >>> db = tempfile.mktemp(suffix=".db")
+    >>> init_db(db)
+    >>> w = GroupCommitWriter(db)
+    >>> o = Order(order_id="o1", user_id="u1", items=[], created_at="t")
+    >>> w.submit(o, "PENDING").result(timeout=5)
+    True
+    >>> w.close()
+    >>> get_order(db, "o1")[1]
+    'PENDING'
+    """
+
+    def __init__(self, db_path: str, max_batch: int = 256, max_delay_ms: float = 2.0) -> None:
+        self._db_path = db_path
+        self._max_batch = max(1, max_batch)
+        self._max_delay = max(0.0, max_delay_ms) / 1000.0
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="group-commit-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, order: Order, status: str) -> Future:
+        """Queue an order for the next group commit."""
+        if self._closed:
+            raise RuntimeError("GroupCommitWriter is closed")
+        fut: Future = Future()
+        self._queue.put((order, status, fut))
+        return fut
+
+    def close(self, timeout: float | None = None) -> None:
+        """Flush everything already submitted, then stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _collect(self, first: tuple) -> tuple[list[tuple], bool]:
+        """Gather a group starting with `first`; returns (group, stop_requested)."""
+        group = [first]
+        deadline = time.monotonic() + self._max_delay
+        while len(group) < self._max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return group, True
+            group.append(item)
+        return group, False
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            group, stop = self._collect(first)
+            self._commit(group)
+
+    def _commit(self, group: list[tuple]) -> None:
+        # Submitters that cancelled while queued are dropped; the rest can no longer cancel.
+        group = [g for g in group if g[2].set_running_or_notify_cancel()]
+        if not group:
+            return
+        _BATCH_SIZE.observe(len(group))
+        try:
+            with _COMMIT_SECONDS.time(), _connection(self._db_path) as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                flags = _insert_orders(conn, [(order, status) for order, status, _ in group])
+            _invalidate_orders(self._db_path, [order.order_id for order, _, _ in group])
+        except Exception as e:
+            logger.warning("Group commit of %d orders failed: %s", len(group), e)
+            for _, _, fut in group:
+                fut.set_exception(e)
+            return
+        for (_, _, fut), flag in zip(group, flags):
+            fut.set_result(flag)
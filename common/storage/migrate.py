@@ -0,0 +1,30 @@
+"""
+Online payload migration command.
+
+    python -m common.storage.migrate /data/orders.db --to msgpack [--batch 500]
+
+Re-encodes orders and inventory_reservations rows with the given codec in
+short transactions while services keep running (see common.storage.codec).
+"""
+
+from __future__ import annotations
+
+import argparse
+
+from common.storage import init_db
+from common.storage.codec import _BY_NAME, migrate_payload_format
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Re-encode stored payloads with another codec (online).")
+    parser.add_argument("db_path")
+    parser.add_argument("--to", required=True, choices=sorted(_BY_NAME))
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args()
+
+    init_db(args.db_path)  # adds payload_format to pre-codec databases
+    print(migrate_payload_format(args.db_path, args.to, args.batch))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Indexed order queries with keyset pagination.
+
+orders.user_id and the order_items side table (one row per order/SKU) are
+kept in sync by every order write helper, and each filter has an index that
+ends in (created_at, order_id). list_orders() therefore seeks straight to the
+cursor position and reads `limit` rows, so page N costs the same as page 1
+(OFFSET pagination would re-read every earlier row).
+
+Cursors are opaque strings; pass next_cursor back as `after` to get the
+following page. None means there are no more rows.
+"""
+
+from __future__ import annotations
+
+import base64
+
+from common import metrics
+from common.models import Order
+from common.storage import _OP_SECONDS, _connection
+from common.storage.codec import codec_for
+
+MAX_PAGE_SIZE = 1000
+_SEP = "\x1f"
+
+
+def encode_cursor(created_at: str, order_id: str) -> str:
+    """
+    Opaque cursor for the row (created_at, order_id).
+
+    >>> decode_cursor(encode_cursor("2026-01-01T00:00:00Z", "o1"))
+    ('2026-01-01T00:00:00Z', 'o1')
+    """
+    return base64.urlsafe_b64encode(f"{created_at}{_SEP}{order_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
+    """Inverse of encode_cursor(); raises ValueError on a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, order_id = raw.split(_SEP)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError(f"Invalid cursor: {cursor!r}") from None
+    return created_at, order_id
+
+
+@metrics.timed(_OP_SECONDS.labels("list_orders"))
+def list_orders(
+    db_path: str,
+    user_id: str | None = None,
+    status: str | None = None,
+    sku: str | None = None,
+    after: str | None = None,
+    limit: int = 50,
+    created_before: str | None = None,
+) -> tuple[list[tuple[Order, str]], str | None]:
+    """
+    Return ((Order, status) rows, next_cursor) ordered by (created_at, order_id).
+    Filters combine with AND; sku matches orders containing that SKU.
+    created_before (an ISO timestamp, exclusive) bounds the same index range
+    from above, so "PENDING orders older than N seconds" reads only those rows
+    (idx_orders_status) and the last page has next_cursor None.
+
+    >>> import tempfile
+    >>> from common.models import Item
+    >>> from common.storage import init_db, save_orders_many, update_order_status
+    >>> db = tempfile.mktemp(suffix=".db")
+    >>> init_db(db)
+    >>> _ = save_orders_many(db, [
+    ...     Order(order_id=f"o{i}", user_id=f"u{i % 2}", created_at=f"t{i}",
+    ...           items=[Item(sku="burger" if i % 3 else "fries", qty=1)])
+    ...     for i in range(6)], "PENDING")
+    >>> update_order_status(db, "o4", "RESERVED")
+    >>> page, cursor = list_orders(db, user_id="u0", limit=2)
+    >>> [o.order_id for o, _ in page]
+    ['o0', 'o2']
+    >>> [o.order_id for o, _ in list_orders(db, user_id="u0", after=cursor)[0]]
+    ['o4']
+    >>> list_orders(db, user_id="u0", after=cursor)[1] is None
+    True
+    >>> [o.order_id for o, _ in list_orders(db, sku="fries")[0]]
+    ['o0', 'o3']
+    >>> [(o.order_id, s) for o, s in list_orders(db, status="RESERVED", sku="burger")[0]]
+    [('o4', 'RESERVED')]
+    >>> stale, cursor = list_orders(db, status="PENDING", created_before="t3")   # PENDING, older than cutoff
+    >>> [o.order_id for o, _ in stale], cursor
+    (['o0', 'o1', 'o2'], None)
+    """
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+    # With a SKU filter, drive the scan from order_items (sku, created_at, order_id).
+    key = "i" if sku is not None else "o"
+    sql = "SELECT o.order_id, o.status, o.payload_json, o.payload_format, o.created_at FROM orders o"
+    where: list[str] = []
+    args: list = []
+    if sku is not None:
+        sql += " JOIN order_items i ON i.order_id = o.order_id"
+        where.append("i.sku = ?")
+        args.append(sku)
+    if user_id is not None:
+        where.append("o.user_id = ?")
+        args.append(user_id)
+    if status is not None:
+        where.append("o.status = ?")
+        args.append(status)
+    if after is not None:
+        where.append(f"({key}.created_at, {key}.order_id) > (?, ?)")
+        args.extend(decode_cursor(after))
+    if created_before is not None:
+        where.append(f"{key}.created_at < ?")
+        args.append(created_before)
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {key}.created_at, {key}.order_id LIMIT ?"
+    args.append(limit + 1)
+
+    with _connection(db_path) as conn:
+        rows = conn.execute(sql, args).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["order_id"])
+    page = [(codec_for(r["payload_format"]).decode_order(r["payload_json"]), r["status"]) for r in rows]
+    return page, next_cursor
@@ -0,0 +1,102 @@
+"""
+Bounded read-through cache for decoded storage rows.
+
+Holds already-decoded values (Order objects, reservation dicts) so hot
+get_order / get_reservation calls skip both SQLite and JSON/Pydantic decoding.
+Every write path invalidates the affected key after it commits. A reader that
+raced with a write (read the old row before the commit, fills after the
+invalidation) is detected with a write sequence number and does not fill.
+
+The cache is per process: it sees only this process's writes, so enable it
+only where one process owns the database (the default for every service here).
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class ReadCache:
+    """
+    LRU cache with write-sequence guarded fills.
+
+    >>> c = ReadCache(max_entries=2)
+    >>> t = c.token(); c.fill("a", 1, t); c.get("a")
+    1
+    >>> t = c.token(); c.invalidate("b"); c.fill("b", 2, t); c.get("b") is None
+    True
+    >>> c.stats()["hits"], c.stats()["fills_skipped"]
+    (1, 1)
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self._max = max_entries
+        self._data: OrderedDict[Hashable, Any] = OrderedDict()
+        # key -> write seq of its last invalidation (bounded; see _evicted_seq)
+        self._written: OrderedDict[Hashable, int] = OrderedDict()
+        self._evicted_seq = 0
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "fills_skipped": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self._max > 0
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self._counters["misses"] += 1
+                return None
+            self._data.move_to_end(key)
+            self._counters["hits"] += 1
+            return value
+
+    def token(self) -> int:
+        """Write sequence to pass to fill(); take it before reading the row."""
+        with self._lock:
+            return self._seq
+
+    def fill(self, key: Hashable, value: Any, token: int) -> None:
+        """Cache value unless key was written since token was taken."""
+        with self._lock:
+            if self._written.get(key, 0) > token or self._evicted_seq > token:
+                self._counters["fills_skipped"] += 1
+                return
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self._max:
+                self._data.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop key; call after the write that changed it has committed."""
+        with self._lock:
+            self._seq += 1
+            self._data.pop(key, None)
+            self._written[key] = self._seq
+            self._written.move_to_end(key)
+            while len(self._written) > 4 * max(self._max, 1):
+                _, seq = self._written.popitem(last=False)
+                self._evicted_seq = max(self._evicted_seq, seq)
+            self._counters["invalidations"] += 1
+
+    def resize(self, max_entries: int) -> None:
+        with self._lock:
+            self._max = max_entries
+            self._seq += 1
+            self._evicted_seq = self._seq
+            self._data.clear()
+            self._written.clear()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            out: dict[str, Any] = dict(self._counters)
+            lookups = out["hits"] + out["misses"]
+            out["hit_rate"] = out["hits"] / lookups if lookups else 0.0
+            out["entries"] = len(self._data)
+            out["max_entries"] = self._max
+        return out
@@ -0,0 +1,237 @@
+"""
+Hash-sharded SQLite backend with the same function signatures as common.storage.
+
+SQLite allows one writer per database file, so a single orders.db caps write
+throughput. Here db_path names a logical database that is split across N files
+(orders.db -> orders.0-of-4.db ... orders.3-of-4.db). Rows are routed by a
+stable hash (CRC32) of order_id / message_id. Each shard has exactly one
+writer thread, so writers never contend for a file lock, while writes to
+different shards commit in parallel. Reads go straight to the owning shard
+from the calling thread (WAL readers do not block writers). scan_orders()
+fans out to every shard and merges the results.
+
+The shard count comes from STORAGE_SHARDS (default 4) or configure_shards().
+It is part of the file names, so changing it starts a fresh set of shards
+instead of misrouting keys. The stock ledger (common.storage.stock) is not
+sharded: a reservation must decrement several SKUs atomically.
+
+    from common.storage import sharded as storage
+
+    storage.init_db(DB_PATH)
+    storage.save_order(DB_PATH, order, "PENDING")
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, TypeVar
+
+from common import storage
+from common.models import Order
+from common.storage.codec import codec_for
+
+T = TypeVar("T")
+
+_shards = int(os.getenv("STORAGE_SHARDS", "4"))
+_writers: dict[str, ThreadPoolExecutor] = {}
+_writers_lock = threading.Lock()
+_scan_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="shard-scan")
+
+
+def configure_shards(n: int) -> None:
+    """Set the shard count used by subsequent calls (process-wide)."""
+    global _shards
+    if n < 1:
+        raise ValueError("shard count must be >= 1")
+    _shards = n
+
+
+def shard_paths(db_path: str) -> list[str]:
+    """
+    File path of every shard of db_path.
+
+    >>> configure_shards(2)
+    >>> shard_paths("/data/orders.db")
+    ['/data/orders.0-of-2.db', '/data/orders.1-of-2.db']
+    """
+    p = Path(db_path)
+    return [str(p.with_name(f"{p.stem}.{i}-of-{_shards}{p.suffix}")) for i in range(_shards)]
+
+
+def shard_for(db_path: str, key: str) -> str:
+    """Path of the shard that owns key."""
+    paths = shard_paths(db_path)
+    return paths[zlib.crc32(key.encode()) % len(paths)]
+
+
+def _writer(shard_path: str) -> ThreadPoolExecutor:
+    executor = _writers.get(shard_path)
+    if executor is None:
+        with _writers_lock:
+            executor = _writers.get(shard_path)
+            if executor is None:
+                executor = _writers[shard_path] = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="shard-writer"
+                )
+    return executor
+
+
+def _write(shard_path: str, fn: Callable[..., T], *args: Any) -> T:
+    return _writer(shard_path).submit(fn, shard_path, *args).result()
+
+
+def _partition(db_path: str, keys: list[str]) -> dict[str, list[int]]:
+    """Map shard path -> indexes (into keys) routed to it."""
+    parts: dict[str, list[int]] = {}
+    for i, key in enumerate(keys):
+        parts.setdefault(shard_for(db_path, key), []).append(i)
+    return parts
+
+
+def _write_many(db_path: str, keys: list[str], items: list[Any], fn: Callable[..., list[bool]], *extra: Any) -> list[bool]:
+    """Split a batch by shard, write every part on its shard's writer in parallel, reassemble flags."""
+    parts = _partition(db_path, keys)
+    futures: dict[str, Future] = {
+        path: _writer(path).submit(fn, path, [items[i] for i in idxs], *extra)
+        for path, idxs in parts.items()
+    }
+    flags = [False] * len(keys)
+    for path, idxs in parts.items():
+        for i, flag in zip(idxs, futures[path].result()):
+            flags[i] = flag
+    return flags
+
+
+# -----------------------------------------------------------------------------
+# Same signatures as common.storage
+# -----------------------------------------------------------------------------
+
+
+def init_db(db_path: str) -> None:
+    """Create every shard file and its tables."""
+    for path in shard_paths(db_path):
+        _write(path, storage.init_db)
+
+
+def save_order(db_path: str, order: Order, status: str) -> None:
+    """Persist an order on its shard. Overwrites if order_id already exists."""
+    _write(shard_for(db_path, order.order_id), storage.save_order, order, status)
+
+
+def get_order(db_path: str, order_id: str) -> tuple[Order, str] | None:
+    """
+    Return (Order, status) from the owning shard, or None if not found.
+
+    >>> import tempfile, os
+    >>> db = os.path.join(tempfile.mkdtemp(), "orders.db")
+    >>> configure_shards(4)
+    >>> init_db(db)
+    >>> save_order(db, Order(order_id="o1", user_id="u1", items=[], created_at="t"), "PENDING")
+    >>> get_order(db, "o1")[1]
+    'PENDING'
+    """
+    return storage.get_order(shard_for(db_path, order_id), order_id)
+
+
+def update_order_status(db_path: str, order_id: str, status: str) -> None:
+    """Update the status of an existing order. No-op if order_id not found."""
+    _write(shard_for(db_path, order_id), storage.update_order_status, order_id, status)
+
+
+def try_create_reservation(
+    db_path: str,
+    order_id: str,
+    status: str,
+    payload: dict[str, Any],
+) -> bool:
+    """Insert a reservation on its shard if one does not exist."""
+    return _write(shard_for(db_path, order_id), storage.try_create_reservation, order_id, status, payload)
+
+
+def get_reservation(db_path: str, order_id: str) -> dict[str, Any] | None:
+    """Return the reservation from the owning shard, or None."""
+    return storage.get_reservation(shard_for(db_path, order_id), order_id)
+
+
+def mark_message_processed(db_path: str, message_id: str) -> bool:
+    """Record message_id on its shard; False if already seen."""
+    return _write(shard_for(db_path, message_id), storage.mark_message_processed, message_id)
+
+
+def save_orders_many(db_path: str, orders: list[Order], status: str) -> list[bool]:
+    """
+    Batch save split across shards; each shard commits its part in parallel.
+
+    >>> import tempfile, os
+    >>> db = os.path.join(tempfile.mkdtemp(), "orders.db")
+    >>> init_db(db)
+    >>> orders = [Order(order_id=f"o{i}", user_id="u1", items=[], created_at="t") for i in range(3)]
+    >>> save_orders_many(db, orders + orders[:1], "PENDING")
+    [True, True, True, False]
+    """
+    return _write_many(db_path, [o.order_id for o in orders], orders, storage.save_orders_many, status)
+
+
+def try_create_reservations_many(
+    db_path: str,
+    reservations: list[tuple[str, str, dict[str, Any]]],
+) -> list[bool]:
+    """Batch reservation insert split across shards."""
+    return _write_many(db_path, [r[0] for r in reservations], reservations, storage.try_create_reservations_many)
+
+
+def mark_messages_processed_many(db_path: str, message_ids: list[str]) -> list[bool]:
+    """Batch message-id insert split across shards."""
+    return _write_many(db_path, list(message_ids), list(message_ids), storage.mark_messages_processed_many)
+
+
+# -----------------------------------------------------------------------------
+# Fan-out reads
+# -----------------------------------------------------------------------------
+
+
+def _scan_shard(shard_path: str, status: str | None) -> list[tuple[Order, str]]:
+    sql = "SELECT status, payload_json, payload_format FROM orders"
+    args: tuple = ()
+    if status is not None:
+        sql += " WHERE status = ?"
+        args = (status,)
+    with storage._connection(shard_path) as conn:
+        rows = conn.execute(sql, args).fetchall()
+    return [(codec_for(r["payload_format"]).decode_order(r["payload_json"]), r["status"]) for r in rows]
+
+
+def scan_orders(db_path: str, status: str | None = None) -> list[tuple[Order, str]]:
+    """
+    Return (Order, status) for every order (optionally with the given status)
+    across all shards, read in parallel and sorted by created_at.
+    """
+    futures = [_scan_pool.submit(_scan_shard, path, status) for path in shard_paths(db_path)]
+    merged = [row for fut in futures for row in fut.result()]
+    merged.sort(key=lambda r: (r[0].created_at, r[0].order_id))
+    return merged
+
+
+def count_rows(db_path: str, table: str) -> int:
+    """Total row count of table across all shards."""
+    if table not in ("orders", "inventory_reservations", "processed_messages"):
+        raise ValueError(f"Unknown table: {table}")
+
+    def count(path: str) -> int:
+        with storage._connection(path) as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    return sum(fut.result() for fut in [_scan_pool.submit(count, p) for p in shard_paths(db_path)])
+
+
+def shutdown(wait: bool = True) -> None:
+    """Stop all shard writer threads."""
+    with _writers_lock:
+        executors = list(_writers.values())
+        _writers.clear()
+    for executor in executors:
+        executor.shutdown(wait=wait)
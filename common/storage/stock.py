@@ -0,0 +1,200 @@
+"""
+Per-SKU stock ledger and atomic multi-item reservation.
+
+inventory_stock holds the available quantity per SKU. reserve_stock()
+decrements every item of an order in one transaction, or none of them, and
+records the outcome in inventory_reservations so repeated calls for the same
+order_id return the original result (idempotent). SKUs that were never stocked
+are untracked and always available, which keeps services that do not seed a
+ledger behaving as before.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+from common import metrics
+from common.models import Item
+from common.storage import _OP_SECONDS, _connection, _invalidate_reservations
+from common.storage.codec import active_codec, codec_for
+
+
+def parse_stock_levels(spec: str) -> dict[str, int]:
+    """
+    Parse an INVENTORY_STOCK value ("sku=qty,sku=qty") into {sku: qty}.
+
+    >>> parse_stock_levels("burger=100, fries=200")
+    {'burger': 100, 'fries': 200}
+    >>> parse_stock_levels("")
+    {}
+    """
+    levels = {}
+    for entry in filter(None, (e.strip() for e in spec.split(","))):
+        sku, qty = entry.split("=", 1)
+        levels[sku.strip()] = int(qty)
+    return levels
+
+
+def seed_stock(db_path: str, levels: dict[str, int]) -> None:
+    """
+    Insert stock for SKUs not in the ledger yet; existing SKUs keep their
+    current quantity, so a restart does not refill what was reserved.
+
+    >>> import tempfile
+    >>> from common.storage import init_db
+    >>> db = tempfile.mktemp(suffix=".db")
+    >>> init_db(db)
+    >>> seed_stock(db, {"burger": 2})
+    >>> reserve_stock(db, "o1", [Item(sku="burger", qty=1)])
+    ('RESERVED', None)
+    >>> seed_stock(db, {"burger": 2, "fries": 5})
+    >>> get_stock(db)
+    {'burger': 1, 'fries': 5}
+    """
+    with _connection(db_path) as conn:
+        conn.executemany(
+            "INSERT INTO inventory_stock (sku, available) VALUES (?, ?) ON CONFLICT (sku) DO NOTHING",
+            list(levels.items()),
+        )
+
+
+def set_stock(db_path: str, levels: dict[str, int]) -> None:
+    """Set available quantity for each SKU (insert or overwrite). A reset; use seed_stock() at startup."""
+    with _connection(db_path) as conn:
+        conn.executemany(
+            """
+            INSERT INTO inventory_stock (sku, available) VALUES (?, ?)
+            ON CONFLICT (sku) DO UPDATE SET available = excluded.available
+            """,
+            list(levels.items()),
+        )
+
+
+def get_stock(db_path: str) -> dict[str, int]:
+    """Return {sku: available} for every tracked SKU."""
+    with _connection(db_path) as conn:
+        rows = conn.execute("SELECT sku, available FROM inventory_stock").fetchall()
+    return {row["sku"]: row["available"] for row in rows}
+
+
+@metrics.timed(_OP_SECONDS.labels("reserve_stock"))
+def reserve_stock(
+    db_path: str,
+    order_id: str,
+    items: list[Item],
+    payload: dict[str, Any] | None = None,
+) -> tuple[str, str | None]:
+    """
+    Atomically reserve all items for order_id. Returns (status, reason):
+    ("RESERVED", None) or ("FAILED", reason). Idempotent per order_id: a
+    repeated call returns the recorded outcome without touching stock.
+    payload is stored with the reservation (defaults to the items).
+
+    >>> import tempfile
+    >>> from common.storage import init_db, get_reservation
+    >>> db = tempfile.mktemp(suffix=".db")
+    >>> init_db(db)
+    >>> set_stock(db, {"burger": 2, "fries": 1})
+    >>> reserve_stock(db, "o1", [Item(sku="burger", qty=1), Item(sku="fries", qty=1)])
+    ('RESERVED', None)
+    >>> reserve_stock(db, "o2", [Item(sku="burger", qty=1), Item(sku="fries", qty=1)])
+    ('FAILED', 'Insufficient stock for fries (requested 1, available 0)')
+    >>> reserve_stock(db, "o1", [Item(sku="burger", qty=1)])
+    ('RESERVED', None)
+    >>> get_stock(db)
+    {'burger': 1, 'fries': 0}
+    """
+    with _connection(db_path) as conn:
+        # Take the write lock up front so the check-and-decrement is serialized.
+        conn.execute("BEGIN IMMEDIATE")
+        result = _reserve_in_txn(conn, order_id, items, payload, active_codec())
+    _invalidate_reservations(db_path, [order_id])
+    return result
+
+
+@metrics.timed(_OP_SECONDS.labels("reserve_stock_many"))
+def reserve_stock_many(
+    db_path: str,
+    requests: list[tuple[str, list[Item], dict[str, Any] | None]],
+) -> list[tuple[str, str | None]]:
+    """
+    reserve_stock() for many orders in one transaction: (order_id, items,
+    payload) in, one (status, reason) per request out, in order. Each order is
+    still all-or-nothing (its own savepoint), and a failed order does not
+    affect the others. Same idempotency: an order_id seen before, or earlier
+    in the same batch, returns its recorded outcome.
+
+    >>> import tempfile
+    >>> from common.storage import init_db
+    >>> db = tempfile.mktemp(suffix=".db")
+    >>> init_db(db)
+    >>> set_stock(db, {"burger": 1})
+    >>> reserve_stock_many(db, [("o1", [Item(sku="burger", qty=1)], None), ("o2", [Item(sku="burger", qty=1)], None), ("o1", [], None)])
+    [('RESERVED', None), ('FAILED', 'Insufficient stock for burger (requested 1, available 0)'), ('RESERVED', None)]
+    """
+    if not requests:
+        return []
+    codec = active_codec()
+    with _connection(db_path) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        results = [_reserve_in_txn(conn, order_id, items, payload, codec) for order_id, items, payload in requests]
+    _invalidate_reservations(db_path, [order_id for order_id, _, _ in requests])
+    return results
+
+
+def _reserve_in_txn(
+    conn: Any,
+    order_id: str,
+    items: list[Item],
+    payload: dict[str, Any] | None,
+    codec: Any,
+) -> tuple[str, str | None]:
+    """Check-and-decrement for one order inside an open write transaction."""
+    from common.ids import now_iso
+
+    existing = conn.execute(
+        "SELECT status, payload_json, payload_format FROM inventory_reservations WHERE order_id = ?",
+        (order_id,),
+    ).fetchone()
+    if existing is not None:
+        stored = codec_for(existing["payload_format"]).decode(existing["payload_json"])
+        return existing["status"], stored.get("reason")
+
+    wanted: dict[str, int] = {}
+    for item in items:
+        wanted[item.sku] = wanted.get(item.sku, 0) + item.qty
+    if payload is None:
+        payload = {"items": [item.model_dump() for item in items]}
+
+    reason = None
+    conn.execute("SAVEPOINT reserve_items")
+    for sku in sorted(wanted):
+        qty = wanted[sku]
+        cur = conn.execute(
+            "UPDATE inventory_stock SET available = available - ? WHERE sku = ? AND available >= ?",
+            (qty, sku, qty),
+        )
+        if cur.rowcount == 1:
+            continue
+        row = conn.execute("SELECT available FROM inventory_stock WHERE sku = ?", (sku,)).fetchone()
+        if row is None:
+            continue  # untracked SKU
+        reason = f"Insufficient stock for {sku} (requested {qty}, available {row['available']})"
+        break
+    if reason is None:
+        conn.execute("RELEASE reserve_items")
+        status = "RESERVED"
+    else:
+        conn.execute("ROLLBACK TO reserve_items")
+        conn.execute("RELEASE reserve_items")
+        status = "FAILED"
+        payload = {**payload, "reason": reason}
+
+    conn.execute(
+        """
+        INSERT INTO inventory_reservations (order_id, status, payload_json, created_at, payload_format)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        (order_id, status, codec.encode(payload), now_iso(), codec.format_id),
+    )
+    return status, reason
@@ -0,0 +1,80 @@
+"""
+Event codec benchmark: messages/sec on one core for the old path
+(json.loads + model_validate, model_dump_json().encode()) vs common.codec
+(validate_json from bytes, dump_json to bytes via cached TypeAdapters).
+
+Run from repo root:
+    PYTHONPATH=. python common/tests/bench_event_codec.py [n_messages]
+"""
+
+import json
+import sys
+import time
+
+from common import codec, new_event_id, new_order_id, now_iso
+from common.models import InventoryReservedEvent, Item, Order, OrderPlacedEvent
+
+
+def sample_events(n):
+    placed = []
+    for i in range(n):
+        order = Order(
+            order_id=new_order_id(),
+            user_id=f"u{i % 100}",
+            items=[Item(sku="burger", qty=1), Item(sku="fries", qty=2), Item(sku="soda", qty=1)],
+            created_at=now_iso(),
+        )
+        placed.append(OrderPlacedEvent.from_order(order, new_event_id(), now_iso(), order.order_id))
+    reserved = [
+        InventoryReservedEvent.from_order(e.order.order_id, new_event_id(), now_iso(), e.order.order_id)
+        for e in placed
+    ]
+    return placed, reserved
+
+
+def rate(fn, items):
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for x in items:
+            fn(x)
+        best = min(best, time.perf_counter() - start)
+    return len(items) / best
+
+
+def main(n=20000):
+    placed, reserved = sample_events(n)
+    placed_bytes = [e.model_dump_json().encode() for e in placed]
+    reserved_bytes = [e.model_dump_json().encode() for e in reserved]
+    assert [codec.encode(e) for e in placed] == placed_bytes
+    assert [codec.decode(b, OrderPlacedEvent) for b in placed_bytes] == placed
+
+    cases = [
+        ("decode OrderPlaced", placed_bytes,
+         lambda b: OrderPlacedEvent.model_validate(json.loads(b)),
+         lambda b: codec.decode(b, OrderPlacedEvent)),
+        ("decode InventoryReserved", reserved_bytes,
+         lambda b: InventoryReservedEvent.model_validate(json.loads(b)),
+         lambda b: codec.decode(b, InventoryReservedEvent)),
+        ("encode OrderPlaced", placed,
+         lambda e: e.model_dump_json().encode(),
+         codec.encode),
+        ("encode InventoryReserved", reserved,
+         lambda e: e.model_dump_json().encode(),
+         codec.encode),
+    ]
+    print(f"messages: {n} (single thread)")
+    for name, items, old, new in cases:
+        old_rate = rate(old, items)
+        new_rate = rate(new, items)
+        print(f"{name:>25}: old {old_rate:9.0f} msg/s | codec {new_rate:9.0f} msg/s | {new_rate / old_rate:.2f}x")
+
+    # Consumer round trip as in the inventory service: decode OrderPlaced, encode InventoryReserved
+    pairs = list(zip(placed_bytes, reserved))
+    old_rt = rate(lambda p: (OrderPlacedEvent.model_validate(json.loads(p[0])), p[1].model_dump_json().encode()), pairs)
+    new_rt = rate(lambda p: (codec.decode(p[0], OrderPlacedEvent), codec.encode(p[1])), pairs)
+    print(f"{'consume + publish':>25}: old {old_rt:9.0f} msg/s | codec {new_rt:9.0f} msg/s | {new_rt / old_rt:.2f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
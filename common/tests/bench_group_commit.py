@@ -0,0 +1,64 @@
+"""
+Throughput benchmark: concurrent save_order() (one commit per request) vs
+GroupCommitWriter (shared commits), with N threads each persisting orders and
+waiting for durability.
+
+Run from repo root:
+    PYTHONPATH=. python common/tests/bench_group_commit.py [n_orders] [concurrency]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import GroupCommitWriter, init_db, save_order
+from common.ids import now_iso
+from common.models import Item, Order
+
+
+def _orders(n):
+    items = [Item(sku="burger", qty=1), Item(sku="fries", qty=1)]
+    return [Order(order_id=f"o-{i}", user_id="bench", items=items, created_at=now_iso()) for i in range(n)]
+
+
+def _timed(n, concurrency, fn, orders):
+    latencies = []
+
+    def one(order):
+        start = time.perf_counter()
+        fn(order)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, orders))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return n / elapsed, latencies[int(0.5 * n)], latencies[int(0.99 * n)]
+
+
+def main(n=5000, concurrency=32):
+    with tempfile.TemporaryDirectory() as tmp:
+        direct_db = os.path.join(tmp, "direct.db")
+        group_db = os.path.join(tmp, "group.db")
+        init_db(direct_db)
+        init_db(group_db)
+
+        direct = _timed(n, concurrency, lambda o: save_order(direct_db, o, "PENDING"), _orders(n))
+
+        writer = GroupCommitWriter(group_db, max_batch=256, max_delay_ms=2)
+        group = _timed(n, concurrency, lambda o: writer.submit(o, "PENDING").result(), _orders(n))
+        writer.close()
+
+    print(f"orders: {n}, concurrency: {concurrency}")
+    print(f"{'mode':<14} {'orders/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, (rate, p50, p99) in (("save_order", direct), ("group commit", group)):
+        print(f"{name:<14} {rate:>10.0f} {p50:>8.2f} {p99:>8.2f}")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    c = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    main(n, c)
@@ -0,0 +1,78 @@
+"""
+ID generator benchmark: IDs/sec for uuid4, python-ulid (if installed), the
+monotonic generator (single and batch), plus SQLite insert cost with each ID
+as the TEXT PRIMARY KEY (random vs sortable keys: B-tree page splits, file size).
+
+Run from repo root:
+    PYTHONPATH=. python common/tests/bench_ids.py [n_ids] [n_rows]
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+
+from common.ids import new_event_id, new_event_ids
+
+try:
+    from ulid import ULID
+    _HAS_ULID = True
+except ImportError:
+    _HAS_ULID = False
+
+
+def rate(fn, n):
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        fn(n)
+        best = min(best, time.perf_counter() - start)
+    return n / best
+
+
+def insert_cost(ids, tmp, name):
+    path = os.path.join(tmp, f"{name}.db")
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE t (id TEXT PRIMARY KEY, payload TEXT NOT NULL)")
+    payload = "x" * 200
+    start = time.perf_counter()
+    for i in range(0, len(ids), 1000):
+        with conn:
+            conn.executemany("INSERT INTO t VALUES (?, ?)", [(k, payload) for k in ids[i:i + 1000]])
+    elapsed = time.perf_counter() - start
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    pages = conn.execute("PRAGMA page_count").fetchone()[0]
+    conn.close()
+    return len(ids) / elapsed, pages
+
+
+def main(n=200000, rows=200000):
+    gens = {
+        "uuid4": lambda k: [str(uuid.uuid4()) for _ in range(k)],
+        "monotonic ULID": lambda k: [new_event_id() for _ in range(k)],
+        "monotonic ULID batch": lambda k: new_event_ids(k),
+    }
+    if _HAS_ULID:
+        gens["python-ulid"] = lambda k: [str(ULID()) for _ in range(k)]
+    else:
+        print("(python-ulid not installed: skipping its row)")
+
+    print(f"generation ({n} ids, single thread):")
+    for name, fn in gens.items():
+        print(f"  {name:>22}: {rate(fn, n):10.0f} ids/s")
+
+    print(f"\nSQLite inserts ({rows} rows, 1000 per transaction, TEXT PRIMARY KEY):")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ("uuid4", "monotonic ULID batch") + (("python-ulid",) if _HAS_ULID else ()):
+            ids = gens[name](rows)
+            per_sec, pages = insert_cost(ids, tmp, name.replace(" ", "_"))
+            print(f"  {name:>22}: {per_sec:10.0f} rows/s, {pages} pages")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    r = int(sys.argv[2]) if len(sys.argv) > 2 else 200000
+    main(n, r)
@@ -0,0 +1,80 @@
+"""
+Kafka event codec benchmark: bytes on the wire and (de)serialization CPU per
+event for the old JSON serializers vs the schema-registry binary codec, using
+the events the streaming-kafka services actually exchange.
+
+Run from repo root:
+    PYTHONPATH=. python common/tests/bench_kafka_codec.py [n_events]
+"""
+
+import json
+import random
+import sys
+import time
+import uuid
+
+from common.schema_registry import deserialize, serialize
+
+
+def json_serialize(v):
+    return json.dumps(v).encode("utf-8")
+
+
+def json_deserialize(b):
+    return json.loads(b.decode("utf-8"))
+
+
+def sample_events(n):
+    rng = random.Random(1)
+    base = int(time.time() * 1000)
+    orders, inventory = [], []
+    for i in range(n):
+        order_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        ts = base + i * 10
+        orders.append({
+            "eventType": "OrderPlaced",
+            "orderId": order_id,
+            "timestampMs": ts,
+            "items": [{"itemId": "burrito", "qty": 1}],
+        })
+        ok = rng.random() >= 0.02
+        inventory.append({
+            "eventType": "InventoryReserved" if ok else "InventoryFailed",
+            "orderId": order_id,
+            "timestampMs": ts,
+            "reason": None if ok else "OUT_OF_STOCK",
+        })
+    return orders, inventory
+
+
+def per_event_us(fn, items):
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for x in items:
+            fn(x)
+        best = min(best, time.perf_counter() - start)
+    return best / len(items) * 1e6
+
+
+def main(n=50000):
+    orders, inventory = sample_events(n)
+    print(f"events: {n} per topic (single thread)")
+    print(f"{'':>18} {'bytes/event':>18} {'serialize µs':>20} {'deserialize µs':>20}")
+    for name, events in (("order-events", orders), ("inventory-events", inventory)):
+        old = [json_serialize(e) for e in events]
+        new = [serialize(e) for e in events]
+        assert [deserialize(b) for b in new] == events
+        old_bytes = sum(map(len, old)) / n
+        new_bytes = sum(map(len, new)) / n
+        old_ser, new_ser = per_event_us(json_serialize, events), per_event_us(serialize, events)
+        old_de, new_de = per_event_us(json_deserialize, old), per_event_us(deserialize, new)
+        print(f"{name:>18} {old_bytes:7.1f} -> {new_bytes:5.1f} ({1 - new_bytes / old_bytes:4.0%} less)"
+              f" {old_ser:6.2f} -> {new_ser:5.2f} ({old_ser / new_ser:3.1f}x)"
+              f" {old_de:6.2f} -> {new_de:5.2f} ({old_de / new_de:3.1f}x)")
+    # Legacy JSON records still on the topics decode through the same deserializer
+    assert deserialize(json_serialize(orders[0])) == orders[0]
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
@@ -0,0 +1,82 @@
+"""
+Logging overhead benchmark: time spent in the calling thread per log call for
+sync vs queue mode, text vs JSON, and hot-path sampling / rate limiting. It
+also runs with a slow stdout (each write sleeps, like a backed-up docker log
+pipe) to show whether the caller is stalled.
+
+Run from repo root:
+    PYTHONPATH=. python common/tests/bench_logging.py [n_calls] [slow_write_us]
+"""
+
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from common.logging import _stop_listener, hot_path_logger, setup_logging
+
+
+class SlowStream:
+    """File-like stdout whose writes block for delay seconds."""
+
+    def __init__(self, inner, delay):
+        self.inner = inner
+        self.delay = delay
+
+    def write(self, s):
+        time.sleep(self.delay)
+        return self.inner.write(s)
+
+    def flush(self):
+        self.inner.flush()
+
+
+def run(out, mode, fmt, n, logger_factory=logging.getLogger):
+    real_stdout = sys.stdout
+    sys.stdout = out
+    try:
+        setup_logging("bench-service", mode=mode, fmt=fmt)
+        log = logger_factory("bench")
+        start = time.perf_counter()
+        for i in range(n):
+            log.info("Order %s inventory reserved", i)
+        caller = time.perf_counter() - start
+        _stop_listener()  # drain the queue (no-op in sync mode)
+        total = time.perf_counter() - start
+    finally:
+        sys.stdout = real_stdout
+    return caller / n * 1e6, total
+
+
+def main(n=50000, slow_write_us=20):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "stdout.log")
+        with open(path, "w") as f:
+            cases = [
+                ("sync text", "sync", "text", logging.getLogger),
+                ("sync json", "sync", "json", logging.getLogger),
+                ("queue text", "queue", "text", logging.getLogger),
+                ("queue json", "queue", "json", logging.getLogger),
+                ("sync, sample 1/100", "sync", "text", lambda name: hot_path_logger(name + ".s", sample=100)),
+                ("sync, rate 100/s", "sync", "text", lambda name: hot_path_logger(name + ".r", rate=100)),
+            ]
+            print(f"calls: {n}, stdout -> file")
+            for name, mode, fmt, factory in cases:
+                us, total = run(f, mode, fmt, n, factory)
+                print(f"  {name:>20}: {us:6.2f} µs/call in caller, {total:5.2f}s until written")
+
+            slow = SlowStream(f, slow_write_us / 1e6)
+            m = min(n, 20000)
+            print(f"\ncalls: {m}, slow stdout ({slow_write_us} µs per write)")
+            for name, mode in (("sync text", "sync"), ("queue text", "queue")):
+                us, total = run(slow, mode, "text", m)
+                print(f"  {name:>20}: {us:6.2f} µs/call in caller, {total:5.2f}s until written")
+    # Leave the root logger writing to the real stdout again
+    setup_logging("bench-service", mode="sync")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    w = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    main(n, w)
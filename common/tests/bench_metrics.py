@@ -0,0 +1,73 @@
+"""
+Metrics overhead benchmark: ns per counter inc / histogram observe / timed
+call, and the cost of an instrumented storage call (get_order with and without
+the storage_op_seconds histogram).
+
+Run from repo root:
+    PYTHONPATH=. python common/tests/bench_metrics.py [n]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from common import get_order, init_db, metrics, save_order
+from common.models import Item, Order
+
+
+def per_call_ns(fn, n):
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(n):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return best / n * 1e9
+
+
+def main(n=200000):
+    c = metrics.Counter("bench_total", "bench")
+    cl = metrics.Counter("bench_labelled_total", "bench", ["result"])
+    h = metrics.Histogram("bench_seconds", "bench")
+    ok = cl.labels("ok")
+
+    @metrics.timed(h)
+    def timed_noop():
+        pass
+
+    def noop():
+        pass
+
+    def ctx():
+        with h.time():
+            pass
+
+    print(f"calls: {n}")
+    base = per_call_ns(noop, n)
+    print(f"  {'empty call':>28}: {base:7.0f} ns")
+    for name, fn in (
+        ("counter.inc()", c.inc),
+        ("labels('ok').inc()", lambda: cl.labels("ok").inc()),
+        ("cached child.inc()", ok.inc),
+        ("histogram.observe()", lambda: h.observe(0.003)),
+        ("with histogram.time()", ctx),
+        ("@timed call", timed_noop),
+    ):
+        print(f"  {name:>28}: {per_call_ns(fn, n):7.0f} ns")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "bench.db")
+        init_db(db)
+        save_order(db, Order(order_id="o1", user_id="u1", items=[Item(sku="burger", qty=1)], created_at="t"), "PENDING")
+        m = min(n, 50000)
+        raw = get_order.__wrapped__
+        plain = per_call_ns(lambda: raw(db, "o1"), m)
+        instrumented = per_call_ns(lambda: get_order(db, "o1"), m)
+        print(f"\nget_order (read cache warm), {m} calls")
+        print(f"  {'uninstrumented':>28}: {plain:7.0f} ns")
+        print(f"  {'storage_op_seconds':>28}: {instrumented:7.0f} ns")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
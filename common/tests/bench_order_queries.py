@@ -0,0 +1,115 @@
+"""
+Order query benchmark: list_orders() keyset pages over the indexed columns vs
+the old approach (load every order, decode, filter in Python). Prints the
+SQLite query plan for each filter so index use can be checked.
+
+Run from repo root:
+    PYTHONPATH=. python common/tests/bench_order_queries.py [n_orders] [page_size]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+from common import Order, init_db, list_orders, save_orders_many
+from common.models import Item
+from common.storage import _connection
+from common.storage.codec import codec_for
+
+SKUS = [f"sku-{i}" for i in range(200)]
+STATUSES = ["PENDING", "RESERVED", "FAILED"]
+
+
+def build(db, n):
+    rng = random.Random(7)
+    batch = []
+    for i in range(n):
+        items = [Item(sku=s, qty=rng.randint(1, 3)) for s in rng.sample(SKUS, rng.randint(1, 4))]
+        batch.append(Order(order_id=f"o-{i:08d}", user_id=f"u-{rng.randrange(n // 50 or 1)}", items=items,
+                           created_at=f"2026-01-01T00:00:{i:010d}Z"))
+        if len(batch) == 1000:
+            save_orders_many(db, batch, rng.choice(STATUSES))
+            batch = []
+    if batch:
+        save_orders_many(db, batch, "PENDING")
+
+
+def full_scan(db, **filters):
+    with _connection(db) as conn:
+        rows = conn.execute("SELECT status, payload_json, payload_format FROM orders").fetchall()
+    out = []
+    for r in rows:
+        order = codec_for(r["payload_format"]).decode_order(r["payload_json"])
+        if filters.get("user_id") not in (None, order.user_id):
+            continue
+        if filters.get("status") not in (None, r["status"]):
+            continue
+        if filters.get("sku") is not None and filters["sku"] not in {i.sku for i in order.items}:
+            continue
+        out.append((order, r["status"]))
+    out.sort(key=lambda r: (r[0].created_at, r[0].order_id))
+    return out
+
+
+def timed(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def main(n=50000, page_size=50):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "orders.db")
+        init_db(db)
+        start = time.perf_counter()
+        build(db, n)
+        print(f"orders: {n}, page size: {page_size}, load: {time.perf_counter() - start:.1f}s")
+
+        cases = {
+            "user_id": {"user_id": "u-3"},
+            "status": {"status": "RESERVED"},
+            "sku": {"sku": "sku-17"},
+            "user_id+status": {"user_id": "u-3", "status": "PENDING"},
+            "unfiltered": {},
+        }
+        for name, filters in cases.items():
+            scan_ms, expected = timed(lambda: full_scan(db, **filters), repeat=1)
+            first_ms, (page, cursor) = timed(lambda: list_orders(db, limit=page_size, **filters))
+            # Walk every page; total must equal the scan result
+            seen = list(page)
+            pages = 1
+            deep_cursor = None
+            while cursor:
+                more, cursor = list_orders(db, after=cursor, limit=page_size, **filters)
+                seen.extend(more)
+                pages += 1
+                if pages == max(2, len(expected) // page_size // 2):
+                    deep_cursor = cursor
+            assert [o.order_id for o, _ in seen] == [o.order_id for o, _ in expected], name
+            deep_ms = timed(lambda: list_orders(db, after=deep_cursor, limit=page_size, **filters))[0] if deep_cursor else 0.0
+            print(f"{name:>15}: {len(expected):6d} rows, {pages:4d} pages | "
+                  f"first page {first_ms:6.2f}ms, middle page {deep_ms:6.2f}ms | full scan {scan_ms:8.1f}ms")
+
+        print("\nquery plans:")
+        with _connection(db) as conn:
+            for name, sql, args in [
+                ("user_id", "SELECT * FROM orders o WHERE o.user_id = ? AND (o.created_at, o.order_id) > (?, ?) "
+                            "ORDER BY o.created_at, o.order_id LIMIT 51", ("u-3", "", "")),
+                ("status", "SELECT * FROM orders o WHERE o.status = ? ORDER BY o.created_at, o.order_id LIMIT 51",
+                 ("RESERVED",)),
+                ("sku", "SELECT o.* FROM orders o JOIN order_items i ON i.order_id = o.order_id WHERE i.sku = ? "
+                        "ORDER BY i.created_at, i.order_id LIMIT 51", ("sku-17",)),
+            ]:
+                plan = [r["detail"] for r in conn.execute("EXPLAIN QUERY PLAN " + sql, args)]
+                print(f"  {name}: {' | '.join(plan)}")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    p = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    main(n, p)
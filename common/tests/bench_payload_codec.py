@@ -0,0 +1,52 @@
+"""
+Payload codec benchmark: bytes per row and encode/decode time for orders and
+reservation payloads, per codec (json, msgpack if installed, packed).
+
+Run from repo root:
+    PYTHONPATH=. python common/tests/bench_payload_codec.py [n_rows]
+"""
+
+import sys
+import time
+
+from common.ids import new_order_id, now_iso
+from common.models import Item, Order
+from common.storage.codec import _BY_NAME
+
+
+def _us_per_op(fn, values):
+    start = time.perf_counter()
+    for v in values:
+        fn(v)
+    return (time.perf_counter() - start) / len(values) * 1e6
+
+
+def main(n=20000):
+    items = [Item(sku="burger", qty=1), Item(sku="fries", qty=2)]
+    orders = [Order(order_id=new_order_id(), user_id="user-123", items=items, created_at=now_iso()) for _ in range(n)]
+    reservations = [{"order_id": o.order_id, "items": [i.model_dump() for i in o.items]} for o in orders]
+
+    print(f"rows: {n}")
+    print(f"{'codec':<8} {'kind':<12} {'bytes/row':>10} {'encode us':>10} {'decode us':>10}")
+    for name, codec in _BY_NAME.items():
+        enc_orders = [codec.encode_order(o) for o in orders]
+        enc_res = [codec.encode(r) for r in reservations]
+        for kind, size, enc, dec in (
+            (
+                "order",
+                sum(len(e if isinstance(e, bytes) else e.encode()) for e in enc_orders) / n,
+                _us_per_op(codec.encode_order, orders),
+                _us_per_op(codec.decode_order, enc_orders),
+            ),
+            (
+                "reservation",
+                sum(len(e if isinstance(e, bytes) else e.encode()) for e in enc_res) / n,
+                _us_per_op(codec.encode, reservations),
+                _us_per_op(codec.decode, enc_res),
+            ),
+        ):
+            print(f"{name:<8} {kind:<12} {size:>10.1f} {enc:>10.2f} {dec:>10.2f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,66 @@
+"""
+Polling benchmark: get_order / get_reservation on a small set of hot ids,
+read cache disabled vs enabled, with a trickle of status updates so the
+invalidation path is exercised.
+
+Run from repo root:
+    PYTHONPATH=. python common/tests/bench_read_cache.py [n_reads] [hot_ids]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+from common import (
+    configure_read_cache,
+    get_order,
+    get_reservation,
+    init_db,
+    read_cache_stats,
+    save_order,
+    try_create_reservation,
+    update_order_status,
+)
+from common.ids import now_iso
+from common.models import Item, Order
+
+
+def run(db, ids, n, rng):
+    start = time.perf_counter()
+    for i in range(n):
+        order_id = rng.choice(ids)
+        if i % 100 == 0:
+            update_order_status(db, order_id, "CONFIRMED" if i % 200 else "PENDING")
+        assert get_order(db, order_id) is not None
+        assert get_reservation(db, order_id) is not None
+    return 2 * n / (time.perf_counter() - start)
+
+
+def main(n=20000, hot=100):
+    items = [Item(sku="burger", qty=1), Item(sku="fries", qty=1)]
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "orders.db")
+        init_db(db)
+        ids = [f"o-{i}" for i in range(hot)]
+        for order_id in ids:
+            save_order(db, Order(order_id=order_id, user_id="bench", items=items, created_at=now_iso()), "PENDING")
+            try_create_reservation(db, order_id, "RESERVED", {"items": [i.model_dump() for i in items]})
+
+        configure_read_cache(0)
+        uncached = run(db, ids, n, random.Random(1))
+        configure_read_cache(10000)
+        cached = run(db, ids, n, random.Random(1))
+        stats = read_cache_stats()
+
+    print(f"reads: {2 * n}, hot ids: {hot}, status update every 100 polls")
+    print(f"no cache: {uncached:.0f} reads/s")
+    print(f"cache:    {cached:.0f} reads/s ({cached / uncached:.1f}x)")
+    print(f"cache stats: {stats}")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    h = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    main(n, h)
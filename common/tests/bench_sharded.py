@@ -0,0 +1,57 @@
+"""
+Write-scaling benchmark for common.storage.sharded: concurrent save_order()
+and save_orders_many() throughput at several shard counts.
+
+Run from repo root (use a multi-core box to see full scaling):
+    PYTHONPATH=. python common/tests/bench_sharded.py [n_orders] [concurrency]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common.ids import now_iso
+from common.models import Item, Order
+from common.storage import sharded
+
+SHARD_COUNTS = [1, 2, 4, 8]
+
+
+def _orders(n):
+    items = [Item(sku="burger", qty=1), Item(sku="fries", qty=1)]
+    return [Order(order_id=f"o-{i}", user_id="bench", items=items, created_at=now_iso()) for i in range(n)]
+
+
+def _rate(n, fn, work, concurrency):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(fn, work))
+    return n / (time.perf_counter() - start)
+
+
+def main(n=4000, concurrency=16):
+    print(f"orders: {n}, concurrency: {concurrency}, cpus: {os.cpu_count()}")
+    print(f"{'shards':>6} {'single orders/s':>16} {'batch(100) orders/s':>20}")
+    for shards in SHARD_COUNTS:
+        sharded.configure_shards(shards)
+        with tempfile.TemporaryDirectory() as tmp:
+            db = os.path.join(tmp, "orders.db")
+            sharded.init_db(db)
+            single = _rate(n, lambda o: sharded.save_order(db, o, "PENDING"), _orders(n), concurrency)
+
+            batch_db = os.path.join(tmp, "orders_batch.db")
+            sharded.init_db(batch_db)
+            orders = _orders(n)
+            chunks = [orders[i:i + 100] for i in range(0, n, 100)]
+            batch = _rate(n, lambda c: sharded.save_orders_many(batch_db, c, "PENDING"), chunks, concurrency)
+            assert sharded.count_rows(batch_db, "orders") == n
+            sharded.shutdown()
+        print(f"{shards:>6} {single:>16.0f} {batch:>20.0f}")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+    c = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    main(n, c)
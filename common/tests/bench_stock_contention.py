@@ -0,0 +1,78 @@
+"""
+Contention benchmark: many concurrent reserve_stock() calls hitting a few hot
+SKUs ("burger", "fries"). Reports reservations/sec, latency, outcomes, and
+checks the ledger never oversells.
+
+Run from repo root:
+    PYTHONPATH=. python common/tests/bench_stock_contention.py [n_orders] [concurrency] [stock_per_sku]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from common import get_stock, init_db, reserve_stock, set_stock
+from common.models import Item
+
+HOT_SKUS = ["burger", "fries", "soda"]
+
+
+def main(n=5000, concurrency=32, stock_per_sku=4000):
+    rng = random.Random(42)
+    orders = []
+    for i in range(n):
+        skus = rng.sample(HOT_SKUS, rng.randint(1, len(HOT_SKUS)))
+        orders.append((f"o-{i}", [Item(sku=s, qty=rng.randint(1, 2)) for s in skus]))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "inventory.db")
+        init_db(db)
+        initial = {sku: stock_per_sku for sku in HOT_SKUS}
+        set_stock(db, initial)
+
+        latencies = []
+        outcomes = Counter()
+
+        def one(order):
+            order_id, items = order
+            start = time.perf_counter()
+            status, _ = reserve_stock(db, order_id, items)
+            latencies.append((time.perf_counter() - start) * 1000)
+            outcomes[status] += 1
+            return order, status
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(one, orders))
+        elapsed = time.perf_counter() - start
+
+        # Replaying every order must not change anything (idempotent per order_id).
+        for (order_id, items), status in results:
+            assert reserve_stock(db, order_id, items)[0] == status
+        final = get_stock(db)
+
+    used = Counter()
+    for (_, items), status in results:
+        if status == "RESERVED":
+            for item in items:
+                used[item.sku] += item.qty
+    for sku in HOT_SKUS:
+        assert final[sku] >= 0 and initial[sku] - final[sku] == used[sku], sku
+
+    latencies.sort()
+    print(f"orders: {n}, concurrency: {concurrency}, stock per SKU: {stock_per_sku}")
+    print(f"reservations/s: {n / elapsed:.0f}")
+    print(f"p50={latencies[int(0.5 * n)]:.2f}ms p99={latencies[int(0.99 * n)]:.2f}ms")
+    print(f"outcomes: {dict(outcomes)}")
+    print(f"final stock: {final} (no oversell, ledger matches reservations)")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    c = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    s = int(sys.argv[3]) if len(sys.argv) > 3 else 4000
+    main(n, c, s)
@@ -0,0 +1,178 @@
+"""
+Microbenchmark: ops/sec for each common.storage helper, one-shot connections
+(the pre-pool behaviour: connect + close per call) vs the per-thread pool.
+
+Run from repo root:
+    PYTHONPATH=. python common/tests/bench_storage.py [n_ops]
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+from common import (
+    get_order,
+    get_reservation,
+    init_db,
+    mark_message_processed,
+    save_order,
+    try_create_reservation,
+    update_order_status,
+)
+from common.ids import now_iso
+from common.models import Item, Order
+
+
+# -----------------------------------------------------------------------------
+# Baseline: the original connect-per-call helpers
+# -----------------------------------------------------------------------------
+
+
+@contextmanager
+def _oneshot(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def legacy_save_order(db_path, order, status):
+    with _oneshot(db_path) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO orders (order_id, status, payload_json, created_at) VALUES (?, ?, ?, ?)",
+            (order.order_id, status, order.model_dump_json(), order.created_at),
+        )
+
+
+def legacy_get_order(db_path, order_id):
+    with _oneshot(db_path) as conn:
+        row = conn.execute(
+            "SELECT order_id, status, payload_json, created_at FROM orders WHERE order_id = ?",
+            (order_id,),
+        ).fetchone()
+    if row is None:
+        return None
+    return (Order.model_validate_json(row["payload_json"]), row["status"])
+
+
+def legacy_update_order_status(db_path, order_id, status):
+    with _oneshot(db_path) as conn:
+        conn.execute("UPDATE orders SET status = ? WHERE order_id = ?", (status, order_id))
+
+
+def legacy_try_create_reservation(db_path, order_id, status, payload):
+    with _oneshot(db_path) as conn:
+        try:
+            conn.execute(
+                "INSERT INTO inventory_reservations (order_id, status, payload_json, created_at) VALUES (?, ?, ?, ?)",
+                (order_id, status, json.dumps(payload), now_iso()),
+            )
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+
+def legacy_get_reservation(db_path, order_id):
+    with _oneshot(db_path) as conn:
+        row = conn.execute(
+            "SELECT order_id, status, payload_json, created_at FROM inventory_reservations WHERE order_id = ?",
+            (order_id,),
+        ).fetchone()
+    if row is None:
+        return None
+    return {"order_id": row["order_id"], "status": row["status"], "payload": json.loads(row["payload_json"])}
+
+
+def legacy_mark_message_processed(db_path, message_id):
+    with _oneshot(db_path) as conn:
+        try:
+            conn.execute(
+                "INSERT INTO processed_messages (message_id, seen_at) VALUES (?, ?)",
+                (message_id, now_iso()),
+            )
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+
+# -----------------------------------------------------------------------------
+# Harness
+# -----------------------------------------------------------------------------
+
+
+def _orders(n, prefix):
+    items = [Item(sku="burger", qty=1), Item(sku="fries", qty=1)]
+    return [
+        Order(order_id=f"{prefix}-{i}", user_id="bench", items=items, created_at=now_iso())
+        for i in range(n)
+    ]
+
+
+def _rate(fn, args_list):
+    start = time.perf_counter()
+    for args in args_list:
+        fn(*args)
+    elapsed = time.perf_counter() - start
+    return len(args_list) / elapsed if elapsed > 0 else float("inf")
+
+
+def run_suite(db, n, helpers):
+    save, get, update, reserve, get_res, mark = helpers
+    orders = _orders(n, "o")
+    ids = [o.order_id for o in orders]
+    payload = {"items": [{"sku": "burger", "qty": 1}]}
+    return {
+        "save_order": _rate(save, [(db, o, "PENDING") for o in orders]),
+        "get_order": _rate(get, [(db, i) for i in ids]),
+        "update_order_status": _rate(update, [(db, i, "CONFIRMED") for i in ids]),
+        "try_create_reservation": _rate(reserve, [(db, i, "RESERVED", payload) for i in ids]),
+        "get_reservation": _rate(get_res, [(db, i) for i in ids]),
+        "mark_message_processed": _rate(mark, [(db, f"m-{i}") for i in ids]),
+    }
+
+
+def main(n=2000):
+    legacy = (
+        legacy_save_order,
+        legacy_get_order,
+        legacy_update_order_status,
+        legacy_try_create_reservation,
+        legacy_get_reservation,
+        legacy_mark_message_processed,
+    )
+    pooled = (
+        save_order,
+        get_order,
+        update_order_status,
+        try_create_reservation,
+        get_reservation,
+        mark_message_processed,
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        db_before = os.path.join(tmp, "before.db")
+        db_after = os.path.join(tmp, "after.db")
+        init_db(db_before)
+        init_db(db_after)
+        before = run_suite(db_before, n, legacy)
+        after = run_suite(db_after, n, pooled)
+
+    print(f"ops per helper: {n}")
+    print(f"{'helper':<24} {'before ops/s':>14} {'after ops/s':>14} {'speedup':>8}")
+    for name in before:
+        b, a = before[name], after[name]
+        print(f"{name:<24} {b:>14.0f} {a:>14.0f} {a / b:>7.2f}x")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    main(n)
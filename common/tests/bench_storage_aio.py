@@ -0,0 +1,94 @@
+"""
+Event-loop lag benchmark: an aio-pika-style handler (mark_message_processed ->
+try_create_reservation -> get_reservation) run concurrently on one event loop,
+calling blocking common.storage vs awaitable common.storage.aio.
+
+A probe task sleeps 1 ms in a loop and records how late it wakes up (event
+loop lag). Handler latency p50/p99 is reported alongside.
+
+Run from repo root:
+    PYTHONPATH=. python common/tests/bench_storage_aio.py [n_messages] [concurrency]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from common import storage
+from common.storage import aio as storage_aio
+
+
+def _pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))] if values else 0.0
+
+
+async def _probe(lags, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append((time.perf_counter() - start) * 1000 - 1.0)
+
+
+async def blocking_handler(db, i):
+    if not storage.mark_message_processed(db, f"m-{i}"):
+        return
+    if not storage.try_create_reservation(db, f"o-{i}", "RESERVED", {"i": i}):
+        storage.get_reservation(db, f"o-{i}")
+
+
+async def aio_handler(db, i):
+    if not await storage_aio.mark_message_processed(db, f"m-{i}"):
+        return
+    if not await storage_aio.try_create_reservation(db, f"o-{i}", "RESERVED", {"i": i}):
+        await storage_aio.get_reservation(db, f"o-{i}")
+
+
+async def run(db, handler, n, concurrency):
+    lags, latencies = [], []
+    stop = asyncio.Event()
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with sem:
+            start = time.perf_counter()
+            await handler(db, i)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    probe = asyncio.create_task(_probe(lags, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe
+    return {
+        "msgs/s": n / elapsed,
+        "lag p99 ms": _pct(lags, 0.99),
+        "lag max ms": max(lags) if lags else 0.0,
+        "handler p50 ms": _pct(latencies, 0.5),
+        "handler p99 ms": _pct(latencies, 0.99),
+    }
+
+
+def main(n=2000, concurrency=16):
+    with tempfile.TemporaryDirectory() as tmp:
+        before_db = os.path.join(tmp, "before.db")
+        after_db = os.path.join(tmp, "after.db")
+        storage.init_db(before_db)
+        storage.init_db(after_db)
+        before = asyncio.run(run(before_db, blocking_handler, n, concurrency))
+        after = asyncio.run(run(after_db, aio_handler, n, concurrency))
+        storage_aio.shutdown()
+
+    print(f"messages: {n}, concurrency: {concurrency}")
+    print(f"{'metric':<16} {'blocking':>10} {'aio':>10}")
+    for key in before:
+        print(f"{key:<16} {before[key]:>10.2f} {after[key]:>10.2f}")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    c = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    main(n, c)
@@ -0,0 +1,75 @@
+"""
+Throughput benchmark: single-row storage helpers (one commit per row) vs the
+batch helpers (one transaction per batch).
+
+Run from repo root:
+    PYTHONPATH=. python common/tests/bench_storage_batch.py [n_rows] [batch_size]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from common import (
+    init_db,
+    mark_message_processed,
+    mark_messages_processed_many,
+    save_order,
+    save_orders_many,
+    try_create_reservation,
+    try_create_reservations_many,
+)
+from common.ids import now_iso
+from common.models import Item, Order
+
+
+def _rows_per_sec(n, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    return n / elapsed if elapsed > 0 else float("inf")
+
+
+def _chunks(seq, size):
+    return [seq[i:i + size] for i in range(0, len(seq), size)]
+
+
+def main(n=5000, batch_size=500):
+    items = [Item(sku="burger", qty=1), Item(sku="fries", qty=1)]
+    orders = [Order(order_id=f"o-{i}", user_id="bench", items=items, created_at=now_iso()) for i in range(n)]
+    payload = {"items": [{"sku": "burger", "qty": 1}]}
+    reservations = [(o.order_id, "RESERVED", payload) for o in orders]
+    message_ids = [f"m-{i}" for i in range(n)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        single_db = os.path.join(tmp, "single.db")
+        batch_db = os.path.join(tmp, "batch.db")
+        init_db(single_db)
+        init_db(batch_db)
+
+        results = {
+            "orders": (
+                _rows_per_sec(n, lambda: [save_order(single_db, o, "PENDING") for o in orders]),
+                _rows_per_sec(n, lambda: [save_orders_many(batch_db, c, "PENDING") for c in _chunks(orders, batch_size)]),
+            ),
+            "reservations": (
+                _rows_per_sec(n, lambda: [try_create_reservation(single_db, *r) for r in reservations]),
+                _rows_per_sec(n, lambda: [try_create_reservations_many(batch_db, c) for c in _chunks(reservations, batch_size)]),
+            ),
+            "processed_messages": (
+                _rows_per_sec(n, lambda: [mark_message_processed(single_db, m) for m in message_ids]),
+                _rows_per_sec(n, lambda: [mark_messages_processed_many(batch_db, c) for c in _chunks(message_ids, batch_size)]),
+            ),
+        }
+
+    print(f"rows: {n}, batch_size: {batch_size}")
+    print(f"{'table':<20} {'single rows/s':>14} {'batch rows/s':>14} {'speedup':>8}")
+    for name, (single, batch) in results.items():
+        print(f"{name:<20} {single:>14.0f} {batch:>14.0f} {batch / single:>7.1f}x")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    b = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    main(n, b)
@@ -0,0 +1,487 @@
+"""
+Lightweight cross-transport tracing keyed on correlation_id.
+
+A trace is every span that shares a trace_id, and the trace_id is the
+correlation_id (the order_id). Spans are timed in-process. Trace context
+crosses process boundaries in three headers: HTTP request headers, AMQP
+message headers, or Kafka record headers.
+
+    x-correlation-id   trace id
+    x-parent-span      span id of the sender
+    x-sent-at          sender wall clock (unix seconds) at inject time
+
+When a receiver opens span_from(headers, ...), it also records a
+"<name> [wait]" span running from x-sent-at to the moment of receipt. That
+span is the network plus queue time of the hop. All services run on one
+host here, so their clocks agree.
+
+    tracing.configure("order-service")              # TRACE_SINK env picks the sink
+    with tracing.span("POST /order", trace_id=order_id):
+        with tracing.span("http inventory /reserve"):
+            await client.post(url, headers=tracing.inject())
+
+    with tracing.span_from(message.headers, "consume OrderPlaced"):   # receiver
+        ...
+
+Finished spans are queued to a background thread, which writes them to the
+sink. A sink path ending in .db/.sqlite is a SQLite table (safe with several
+processes on one shared volume). Any other path is a JSON-lines file. With
+no sink, span IDs are still propagated but nothing is recorded. The queue
+holds at most TRACE_QUEUE_SIZE spans (default 10000). Spans that do not fit,
+or that the sink fails to write (bad path, locked file), are dropped. They
+are counted in tracing_spans_dropped_total{reason}, and a warning is logged
+at most once a minute.
+
+Report:
+
+    python -m common.tracing /traces/spans.db [--slowest 10] [--trace ID]
+"""
+
+from __future__ import annotations
+
+import argparse
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, Mapping
+
+from common import metrics
+
+logger = logging.getLogger(__name__)
+
+SPANS_DROPPED = metrics.counter("tracing_spans_dropped_total", "Spans not recorded", ["reason"])
+_WARN_INTERVAL_S = 60.0
+
+HEADER_TRACE = "x-correlation-id"
+HEADER_PARENT = "x-parent-span"
+HEADER_SENT = "x-sent-at"
+
+_service = "unknown"
+_sink: _Sink | None = None
+
+
+def _new_span_id() -> str:
+    return f"{random.getrandbits(64):016x}"
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "service", "name", "start", "duration_ms", "attrs")
+
+    def __init__(self, trace_id: str, parent_id: str | None, name: str, attrs: dict[str, Any]) -> None:
+        self.trace_id = trace_id
+        self.span_id = _new_span_id()
+        self.parent_id = parent_id
+        self.service = _service
+        self.name = name
+        self.start = time.time()
+        self.duration_ms = 0.0
+        self.attrs = attrs
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "service": self.service,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": self.duration_ms,
+            "attrs": self.attrs,
+        }
+
+
+_current: contextvars.ContextVar[Span | None] = contextvars.ContextVar("trace_span", default=None)
+
+
+def current() -> Span | None:
+    """Innermost open span in this context (thread / asyncio task), if any."""
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, trace_id: str | None = None, parent_id: str | None = None, **attrs: Any) -> Iterator[Span]:
+    """
+    Time a block as one span. trace_id / parent_id default to the enclosing span
+    (a new trace if there is none).
+
+    >>> with span("outer", trace_id="o1") as outer:
+    ...     with span("inner") as inner:
+    ...         pass
+    >>> inner.trace_id, inner.parent_id == outer.span_id
+    ('o1', True)
+    """
+    parent = _current.get()
+    if trace_id is None:
+        trace_id = parent.trace_id if parent is not None else _new_span_id()
+    if parent_id is None and parent is not None and parent.trace_id == trace_id:
+        parent_id = parent.span_id
+    s = Span(trace_id, parent_id, name, attrs)
+    token = _current.set(s)
+    t0 = time.perf_counter()
+    try:
+        yield s
+    except BaseException as e:
+        s.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        s.duration_ms = (time.perf_counter() - t0) * 1000.0
+        _current.reset(token)
+        if _sink is not None:
+            _sink.put(s.as_dict())
+
+
+def inject(headers: dict[str, Any] | None = None) -> dict[str, Any]:
+    """
+    Add the current trace context to headers (HTTP / AMQP); returns headers.
+
+    >>> with span("send", trace_id="o1") as s:
+    ...     h = inject({"content-type": "application/json"})
+    >>> h[HEADER_TRACE], h[HEADER_PARENT] == s.span_id, sorted(h)[0]
+    ('o1', True, 'content-type')
+    """
+    headers = {} if headers is None else headers
+    s = _current.get()
+    if s is not None:
+        headers[HEADER_TRACE] = s.trace_id
+        headers[HEADER_PARENT] = s.span_id
+        headers[HEADER_SENT] = repr(time.time())
+    return headers
+
+
+def kafka_headers() -> list[tuple[str, bytes]]:
+    """Current trace context as Kafka record headers."""
+    return [(k, v.encode()) for k, v in inject().items()]
+
+
+def extract(headers: Mapping[str, Any] | list[tuple[str, bytes]] | None) -> tuple[str | None, str | None, float | None]:
+    """
+    (trace_id, parent_span_id, sent_at) from HTTP/AMQP headers or Kafka header tuples.
+
+    >>> extract([("x-correlation-id", b"o1"), ("x-parent-span", b"ab"), ("x-sent-at", b"12.5")])
+    ('o1', 'ab', 12.5)
+    >>> extract(None)
+    (None, None, None)
+    """
+    if not headers:
+        return None, None, None
+    if isinstance(headers, list):
+        headers = dict(headers)
+
+    def get(key: str) -> str | None:
+        v = headers.get(key)
+        return v.decode() if isinstance(v, (bytes, bytearray)) else v
+
+    sent = get(HEADER_SENT)
+    try:
+        sent_at = float(sent) if sent is not None else None
+    except ValueError:
+        sent_at = None
+    return get(HEADER_TRACE), get(HEADER_PARENT), sent_at
+
+
+@contextmanager
+def span_from(headers: Any, name: str, trace_id: str | None = None, **attrs: Any) -> Iterator[Span]:
+    """
+    Receiver side: continue the sender's trace (trace_id falls back to the given
+    one, e.g. the event's correlation_id) and record the hop's transit time.
+
+    >>> with span("publish", trace_id="o1"):
+    ...     h = inject()
+    >>> with span_from(h, "consume") as s:
+    ...     pass
+    >>> s.trace_id, s.parent_id == h[HEADER_PARENT]
+    ('o1', True)
+    """
+    remote_trace, parent_id, sent_at = extract(headers)
+    trace_id = remote_trace or trace_id
+    if trace_id is None:
+        with span(name, **attrs) as s:
+            yield s
+        return
+    if sent_at is not None and _sink is not None:
+        now = time.time()
+        _sink.put({
+            "trace_id": trace_id,
+            "span_id": _new_span_id(),
+            "parent_id": parent_id,
+            "service": _service,
+            "name": f"{name} [wait]",
+            "start": sent_at,
+            "duration_ms": max(0.0, (now - sent_at) * 1000.0),
+            "attrs": {},
+        })
+    with span(name, trace_id=trace_id, parent_id=parent_id, **attrs) as s:
+        yield s
+
+
+# -----------------------------------------------------------------------------
+# Sinks
+# -----------------------------------------------------------------------------
+
+
+_SPAN_COLUMNS = ("trace_id", "span_id", "parent_id", "service", "name", "start", "duration_ms", "attrs")
+
+
+class _Sink:
+    """
+    Background writer: span dicts are queued by callers and written in batches.
+    Tracing must never take a service down or grow it without bound, so a full
+    queue or a failing sink drops spans (counted, warned about once a minute).
+    """
+
+    def __init__(self, path: str, maxsize: int = 10000) -> None:
+        self.path = path
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._opened = False
+        self._dropped_full = SPANS_DROPPED.labels("queue_full")
+        self._dropped_error = SPANS_DROPPED.labels("write_error")
+        self._warn_lock = threading.Lock()
+        self._next_warning = 0.0
+        self._unreported = 0
+        self._thread = threading.Thread(target=self._run, name="trace-sink", daemon=True)
+        self._thread.start()
+
+    def put(self, record: dict[str, Any]) -> None:
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._dropped_full.inc()
+            self._warn(1, "queue full")
+
+    def close(self) -> None:
+        try:
+            self._queue.put(None, timeout=5)
+        except queue.Full:
+            pass
+        self._thread.join(timeout=5)
+
+    def _warn(self, dropped: int, reason: str) -> None:
+        with self._warn_lock:
+            self._unreported += dropped
+            now = time.monotonic()
+            if now < self._next_warning:
+                return
+            self._next_warning = now + _WARN_INTERVAL_S
+            dropped, self._unreported = self._unreported, 0
+        logger.warning("Trace sink %s: dropped %d spans (%s)", self.path, dropped, reason)
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < 1000:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            batch = [r for r in batch if r is not None]
+            if batch:
+                try:
+                    if not self._opened:  # retried per batch: the path may appear / unlock later
+                        self._open()
+                        self._opened = True
+                    self._write(batch)
+                except Exception as e:
+                    self._dropped_error.inc(len(batch))
+                    self._warn(len(batch), f"{type(e).__name__}: {e}")
+            if stop:
+                return
+
+    def _open(self) -> None:
+        raise NotImplementedError
+
+    def _write(self, batch: list[dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+
+class _JsonLinesSink(_Sink):
+    def _open(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+    def _write(self, batch: list[dict[str, Any]]) -> None:
+        data = "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in batch)
+        with open(self.path, "a") as f:  # append mode: several processes can share one file
+            f.write(data)
+
+
+class _SqliteSink(_Sink):
+    def _open(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        _create_spans_table(self._conn)
+
+    def _write(self, batch: list[dict[str, Any]]) -> None:
+        rows = [tuple(json.dumps(r["attrs"]) if c == "attrs" else r[c] for c in _SPAN_COLUMNS) for r in batch]
+        with self._conn:
+            self._conn.executemany(f"INSERT INTO spans ({', '.join(_SPAN_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+
+def _create_spans_table(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS spans (
+            trace_id TEXT NOT NULL,
+            span_id TEXT NOT NULL,
+            parent_id TEXT,
+            service TEXT NOT NULL,
+            name TEXT NOT NULL,
+            start REAL NOT NULL,
+            duration_ms REAL NOT NULL,
+            attrs TEXT
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_spans_trace ON spans(trace_id)")
+
+
+def _is_sqlite(path: str) -> bool:
+    return path.endswith((".db", ".sqlite", ".sqlite3"))
+
+
+def configure(service_name: str, sink: str | None = None) -> None:
+    """
+    Set the service name stamped on spans and open the sink (default TRACE_SINK
+    env; empty disables recording). Idempotent.
+    """
+    global _service, _sink
+    _service = service_name
+    path = os.getenv("TRACE_SINK", "") if sink is None else sink
+    if _sink is not None and _sink.path == path:
+        return
+    shutdown()
+    if path:
+        maxsize = int(os.getenv("TRACE_QUEUE_SIZE", "10000"))
+        _sink = (_SqliteSink if _is_sqlite(path) else _JsonLinesSink)(path, maxsize)
+
+
+def shutdown() -> None:
+    """Flush queued spans and close the sink."""
+    global _sink
+    if _sink is not None:
+        sink, _sink = _sink, None
+        sink.close()
+
+
+atexit.register(shutdown)
+
+
+# -----------------------------------------------------------------------------
+# Report
+# -----------------------------------------------------------------------------
+
+
+def load_spans(path: str) -> list[dict[str, Any]]:
+    """All spans from a sink file (SQLite or JSON lines)."""
+    if _is_sqlite(path):
+        conn = sqlite3.connect(path)
+        try:
+            cur = conn.execute(f"SELECT {', '.join(_SPAN_COLUMNS)} FROM spans")
+            return [dict(zip(_SPAN_COLUMNS, row), attrs=json.loads(row[-1] or "{}")) for row in cur]
+        finally:
+            conn.close()
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def hop_breakdown(spans: list[dict[str, Any]]) -> list[tuple[str, str, int, float, float, float]]:
+    """
+    Per (service, span name): count, p50, p95, max duration in ms; slowest p95 first.
+
+    >>> hop_breakdown([{"service": "inv", "name": "reserve", "duration_ms": d} for d in (1.0, 2.0, 3.0)])
+    [('inv', 'reserve', 3, 2.0, 3.0, 3.0)]
+    """
+    groups: dict[tuple[str, str], list[float]] = {}
+    for s in spans:
+        groups.setdefault((s["service"], s["name"]), []).append(s["duration_ms"])
+    rows = []
+    for (service, name), values in groups.items():
+        values.sort()
+        rows.append((service, name, len(values), _percentile(values, 0.5), _percentile(values, 0.95), values[-1]))
+    rows.sort(key=lambda r: r[4], reverse=True)
+    return rows
+
+
+def traces(spans: list[dict[str, Any]]) -> dict[str, list[dict[str, Any]]]:
+    """Spans grouped by trace_id, each list ordered by start time."""
+    out: dict[str, list[dict[str, Any]]] = {}
+    for s in spans:
+        out.setdefault(s["trace_id"], []).append(s)
+    for group in out.values():
+        group.sort(key=lambda s: s["start"])
+    return out
+
+
+def end_to_end_ms(trace: list[dict[str, Any]]) -> float:
+    """First span start to last span end, in ms."""
+    start = min(s["start"] for s in trace)
+    end = max(s["start"] + s["duration_ms"] / 1000.0 for s in trace)
+    return (end - start) * 1000.0
+
+
+def format_trace(trace: list[dict[str, Any]]) -> str:
+    """Spans of one trace as an indented timeline (offset from trace start, duration)."""
+    t0 = min(s["start"] for s in trace)
+    by_id = {s["span_id"]: s for s in trace}
+
+    def depth(s: dict[str, Any]) -> int:
+        d, seen = 0, set()
+        while s.get("parent_id") in by_id and s["parent_id"] not in seen:
+            seen.add(s["parent_id"])
+            s = by_id[s["parent_id"]]
+            d += 1
+        return d
+
+    lines = []
+    for s in trace:
+        offset = (s["start"] - t0) * 1000.0
+        lines.append(f"  {offset:9.2f} ms  {s['duration_ms']:9.2f} ms  {'  ' * depth(s)}{s['service']}: {s['name']}")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Per-hop latency breakdown and slowest traces from a trace sink.")
+    parser.add_argument("sink", help="TRACE_SINK file (.db/.sqlite or JSON lines)")
+    parser.add_argument("--slowest", type=int, default=5, help="show the N slowest traces")
+    parser.add_argument("--trace", help="show one trace (correlation_id)")
+    args = parser.parse_args()
+
+    spans = load_spans(args.sink)
+    grouped = traces(spans)
+    if args.trace:
+        if args.trace not in grouped:
+            raise SystemExit(f"No spans for trace {args.trace}")
+        print(f"trace {args.trace}: {end_to_end_ms(grouped[args.trace]):.2f} ms end to end")
+        print(format_trace(grouped[args.trace]))
+        return
+
+    print(f"{len(spans)} spans, {len(grouped)} traces\n")
+    print(f"{'service':<22} {'span':<36} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+    for service, name, count, p50, p95, mx in hop_breakdown(spans):
+        print(f"{service:<22} {name:<36} {count:>7} {p50:>9.2f} {p95:>9.2f} {mx:>9.2f}")
+
+    totals = sorted(((end_to_end_ms(t), tid) for tid, t in grouped.items()), reverse=True)
+    if totals:
+        e2e = sorted(ms for ms, _ in totals)
+        print(f"\nend to end: p50 {_percentile(e2e, 0.5):.2f} ms, p95 {_percentile(e2e, 0.95):.2f} ms, max {e2e[-1]:.2f} ms")
+    for ms, tid in totals[: args.slowest]:
+        print(f"\ntrace {tid}: {ms:.2f} ms")
+        print(format_trace(grouped[tid]))
+
+
+if __name__ == "__main__":
+    main()
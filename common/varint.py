@@ -0,0 +1,50 @@
+"""
+Unsigned LEB128 varints and zigzag for signed integers, shared by the binary
+codecs (storage payloads, Kafka events). Stdlib only.
+"""
+
+from __future__ import annotations
+
+
+def put_varint(out: bytearray, n: int) -> None:
+    """
+    Append n (>= 0) as a varint: 7 bits per byte, high bit set on all but the last.
+
+    >>> out = bytearray(); put_varint(out, 1); put_varint(out, 300); bytes(out)
+    b'\\x01\\xac\\x02'
+    """
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def get_varint(buf: bytes, pos: int) -> tuple[int, int]:
+    """
+    Read a varint at pos; returns (value, position after it).
+
+    >>> get_varint(b'\\x01\\xac\\x02', 1)
+    (300, 3)
+    """
+    n = shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+
+def zigzag(n: int) -> int:
+    """
+    Map signed to unsigned so small magnitudes stay small.
+
+    >>> [zigzag(v) for v in (0, -1, 1, -2)], unzigzag(zigzag(-300))
+    ([0, 1, 2, 3], -300)
+    """
+    return n << 1 if n >= 0 else ((-n) << 1) - 1
+
+
+def unzigzag(z: int) -> int:
+    return (z >> 1) ^ -(z & 1)
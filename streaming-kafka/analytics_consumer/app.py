@@ -4,6 +4,9 @@ import time
 from collections import defaultdict
 from kafka import KafkaConsumer
 
+from common import metrics, tracing
+from common.schema_registry import deserialize
+
 KAFKA_BOOTSTRAP = os.getenv("KAFKA_BOOTSTRAP", "kafka:29092")
 ORDER_TOPIC = os.getenv("ORDER_TOPIC", "order-events")
 INVENTORY_TOPIC = os.getenv("INVENTORY_TOPIC", "inventory-events")
@@ -11,6 +14,12 @@ GROUP_ID = os.getenv("ANALYTICS_GROUP", "analytics-consumer-group")
 
 METRICS_PATH = os.getenv("METRICS_PATH", "/data/metrics.json")
 FLUSH_EVERY_SECONDS = int(os.getenv("FLUSH_EVERY_SECONDS", "3"))
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))  # Prometheus /metrics; 0 disables
+
+CONSUMED = metrics.counter("kafka_events_consumed_total", "Events consumed", ["topic"])
+DUPLICATES = metrics.counter("kafka_events_duplicate_total", "Replayed events skipped by dedup", ["topic"])
+LAG = metrics.gauge("kafka_consumer_lag", "High watermark minus next offset", ["topic", "partition"])
+FLUSH_SECONDS = metrics.histogram("analytics_flush_seconds", "metrics.json write latency")
 
 def bucket_minute(ts_ms: int) -> int:
     return ts_ms // 60000  # minute bucket since epoch
@@ -23,21 +32,27 @@ inventory_failed = 0
 seen_orders = set()
 seen_inventory = set()
 
+tracing.configure("analytics_consumer")  # TRACE_SINK env
+
 consumer = KafkaConsumer(
     bootstrap_servers=KAFKA_BOOTSTRAP,
     group_id=GROUP_ID,
     enable_auto_commit=True,
     auto_offset_reset="earliest",
-    value_deserializer=lambda b: json.loads(b.decode("utf-8")),
+    value_deserializer=deserialize,
     key_deserializer=lambda b: b.decode("utf-8") if b else None,
 )
 
 consumer.subscribe([ORDER_TOPIC, INVENTORY_TOPIC])
 
+if METRICS_PORT:
+    metrics.start_http_server(METRICS_PORT)
+
 print(f"[analytics] Group='{GROUP_ID}' subscribed to: {ORDER_TOPIC}, {INVENTORY_TOPIC}")
 last_flush = time.time()
 last_heartbeat = time.time()
 
+@metrics.timed(FLUSH_SECONDS)
 def flush_metrics():
     failure_rate = (inventory_failed / total_inventory_events) if total_inventory_events else 0.0
     opm_sorted = dict(sorted((str(k), v) for k, v in orders_per_minute.items()))
@@ -63,14 +78,24 @@ while True:
         print(f"[analytics] alive (orders={total_orders_seen}, inv={total_inventory_events})")
         last_heartbeat = now
 
-    for _, msgs in records.items():
+    for tp, msgs in records.items():
+        CONSUMED.labels(tp.topic).inc(len(msgs))
+        highwater = consumer.highwater(tp)
+        if highwater is not None:
+            LAG.labels(tp.topic, tp.partition).set(highwater - msgs[-1].offset - 1)
         for m in msgs:
             ev = m.value
+            if ev is None:
+                continue  # tombstone / empty value
             topic = m.topic
+            # Zero-length span: records the produce -> consume transit ([wait]) for this hop
+            with tracing.span_from(m.headers, f"consume {topic}", trace_id=ev.get("orderId") or m.key):
+                pass
 
             if topic == ORDER_TOPIC:
                 order_id = ev.get("orderId") or m.key
                 if not order_id or order_id in seen_orders:
+                    DUPLICATES.labels(topic).inc()
                     continue
                 seen_orders.add(order_id)
 
@@ -82,6 +107,7 @@ while True:
                 order_id = ev.get("orderId") or m.key
                 dedup_key = f"{order_id}:{ev.get('eventType')}"
                 if not order_id or dedup_key in seen_inventory:
+                    DUPLICATES.labels(topic).inc()
                     continue
                 seen_inventory.add(dedup_key)
 
@@ -1,9 +1,11 @@
-import json
 import os
 import random
 import time
 from kafka import KafkaConsumer, KafkaProducer
 
+from common import metrics, tracing
+from common.schema_registry import deserialize, serialize
+
 KAFKA_BOOTSTRAP = os.getenv("KAFKA_BOOTSTRAP", "kafka:29092")
 ORDER_TOPIC = os.getenv("ORDER_TOPIC", "order-events")
 INVENTORY_TOPIC = os.getenv("INVENTORY_TOPIC", "inventory-events")
@@ -11,6 +13,15 @@ GROUP_ID = os.getenv("CONSUMER_GROUP", "inventory-consumer-group")
 
 SLEEP_MS = int(os.getenv("INVENTORY_SLEEP_MS", "0"))
 FAIL_RATE = float(os.getenv("FAIL_RATE", "0.02"))
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))  # Prometheus /metrics; 0 disables
+
+CONSUMED = metrics.counter("kafka_events_consumed_total", "Events consumed", ["topic"])
+PRODUCED = metrics.counter("kafka_events_produced_total", "Events produced", ["topic", "event_type"])
+PRODUCE_SECONDS = metrics.histogram("kafka_produce_seconds", "Produce + broker ack latency", ["topic"])
+HANDLE_SECONDS = metrics.histogram("kafka_handle_seconds", "Per-event handling latency", ["topic"])
+LAG = metrics.gauge("kafka_consumer_lag", "High watermark minus next offset", ["topic", "partition"])
+
+tracing.configure("inventory_consumer")  # TRACE_SINK env
 
 consumer = KafkaConsumer(
     ORDER_TOPIC,
@@ -18,18 +29,25 @@ consumer = KafkaConsumer(
     group_id=GROUP_ID,
     enable_auto_commit=True,
     auto_offset_reset="earliest",
-    value_deserializer=lambda b: json.loads(b.decode("utf-8")),
+    value_deserializer=deserialize,
     key_deserializer=lambda b: b.decode("utf-8") if b else None,
 )
 
 producer = KafkaProducer(
     bootstrap_servers=KAFKA_BOOTSTRAP,
-    value_serializer=lambda v: json.dumps(v).encode("utf-8"),
+    value_serializer=serialize,
     key_serializer=lambda k: str(k).encode("utf-8"),
     acks="all",
     retries=5,
 )
 
+if METRICS_PORT:
+    metrics.start_http_server(METRICS_PORT)
+
+consumed = CONSUMED.labels(ORDER_TOPIC)
+handle_seconds = HANDLE_SECONDS.labels(ORDER_TOPIC)
+produce_seconds = PRODUCE_SECONDS.labels(INVENTORY_TOPIC)
+
 print(f"[inventory] STARTED. Group='{GROUP_ID}' consuming '{ORDER_TOPIC}' -> producing '{INVENTORY_TOPIC}'")
 print(f"[inventory] Throttle SLEEP_MS={SLEEP_MS}, FAIL_RATE={FAIL_RATE}")
 
@@ -41,25 +59,36 @@ while True:
     if not records:
         continue
 
-    for _, msgs in records.items():
+    for tp, msgs in records.items():
+        highwater = consumer.highwater(tp)
+        if highwater is not None:
+            LAG.labels(tp.topic, tp.partition).set(highwater - msgs[-1].offset - 1)
         for m in msgs:
+            start = time.perf_counter()
             ev = m.value
+            if ev is None:
+                continue  # tombstone / empty value
             order_id = m.key or ev.get("orderId") or "unknown"
             order_id = str(order_id)
 
-            if SLEEP_MS > 0:
-                time.sleep(SLEEP_MS / 1000.0)
+            with tracing.span_from(m.headers, f"consume {ORDER_TOPIC}", trace_id=order_id):
+                if SLEEP_MS > 0:
+                    time.sleep(SLEEP_MS / 1000.0)
 
-            ok = random.random() >= FAIL_RATE
-            out = {
-                "eventType": "InventoryReserved" if ok else "InventoryFailed",
-                "orderId": order_id,
-                "timestampMs": int(ev.get("timestampMs", int(time.time() * 1000))),
-                "reason": None if ok else "OUT_OF_STOCK",
-            }
+                ok = random.random() >= FAIL_RATE
+                out = {
+                    "eventType": "InventoryReserved" if ok else "InventoryFailed",
+                    "orderId": order_id,
+                    "timestampMs": int(ev.get("timestampMs", int(time.time() * 1000))),
+                    "reason": None if ok else "OUT_OF_STOCK",
+                }
 
-            future = producer.send(INVENTORY_TOPIC, key=order_id, value=out)
-            md = future.get(timeout=10)  # forces error visibility + confirms publish
+                with produce_seconds.time(), tracing.span(f"produce {out['eventType']}"):
+                    future = producer.send(INVENTORY_TOPIC, key=order_id, value=out, headers=tracing.kafka_headers())
+                    md = future.get(timeout=10)  # forces error visibility + confirms publish
+            PRODUCED.labels(INVENTORY_TOPIC, out["eventType"]).inc()
+            consumed.inc()
+            handle_seconds.observe(time.perf_counter() - start)
             processed += 1
             failed += 0 if ok else 1
 
@@ -1,18 +1,22 @@
-import json
 import os
 import time
 import uuid
 from kafka import KafkaProducer
 
+from common import tracing
+from common.schema_registry import serialize
+
 KAFKA_BOOTSTRAP = os.getenv("KAFKA_BOOTSTRAP", "kafka:29092")
 ORDER_TOPIC = os.getenv("ORDER_TOPIC", "order-events")
 CLIENT_ID = os.getenv("PRODUCER_CLIENT_ID", "producer_order")
 
+tracing.configure("producer_order")  # TRACE_SINK env
+
 def make_producer():
     return KafkaProducer(
         bootstrap_servers=KAFKA_BOOTSTRAP,
         client_id=CLIENT_ID,
-        value_serializer=lambda v: json.dumps(v).encode("utf-8"),
+        value_serializer=serialize,  # schema-ID-prefixed binary (common.schema_registry)
         key_serializer=lambda k: k.encode("utf-8"),
         acks="all",
         linger_ms=5,
@@ -34,11 +38,14 @@ def publish_orders(n: int, base_ts_ms: int, step_ms: int = 10):
             "items": [{"itemId": "burrito", "qty": 1}],
         }
 
-        producer.send(
-            ORDER_TOPIC,
-            key=order_id,
-            value=event
-        )
+        # Trace context travels in record headers; the orderId is the trace id
+        with tracing.span("produce OrderPlaced", trace_id=order_id):
+            producer.send(
+                ORDER_TOPIC,
+                key=order_id,
+                value=event,
+                headers=tracing.kafka_headers(),
+            )
 
         if (i + 1) % 1000 == 0:
             producer.flush()
@@ -47,6 +54,7 @@ def publish_orders(n: int, base_ts_ms: int, step_ms: int = 10):
     producer.flush()
     dt = time.time() - t0
     print(f"Done. Published {n} OrderPlaced events in {dt:.2f}s")
+    tracing.shutdown()
 
 if __name__ == "__main__":
     # Run defaults if executed directly
@@ -2,14 +2,25 @@ import os
 import time
 import logging
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 
 # common module: models, storage, logging
-from common import setup_logging, try_create_reservation, get_reservation, init_db
+from common import (
+    metrics,
+    setup_logging,
+    parse_stock_levels,
+    reserve_stock,
+    reserve_stock_many,
+    seed_stock,
+    set_stock,
+    init_db,
+    tracing,
+)
 from common.models import ReserveRequest, ReserveResult
 
 # Logging via common (stdout, timestamps, service name)
 setup_logging("inventory-service")
+tracing.configure("inventory-service")
 logger = logging.getLogger(__name__)
 
 app = FastAPI()
@@ -17,40 +28,58 @@ app = FastAPI()
 DB_PATH = os.getenv("DB_PATH", "/data/inventory.db")
 DELAY_MS = int(os.getenv("INVENTORY_DELAY_MS", "0"))
 FAIL = os.getenv("INVENTORY_FAIL", "false").lower() in ("1", "true", "yes")
+# Initial stock per SKU, e.g. "burger=100,fries=200"; unlisted SKUs are untracked (unlimited).
+# Only SKUs missing from the ledger are seeded; INVENTORY_STOCK_RESET=true overwrites on start.
+INVENTORY_STOCK = parse_stock_levels(os.getenv("INVENTORY_STOCK", ""))
+INVENTORY_STOCK_RESET = os.getenv("INVENTORY_STOCK_RESET", "false").lower() in ("1", "true", "yes")
+
+RESERVATIONS = metrics.counter("inventory_reservations_total", "Reservation outcomes", ["status"])
 
 
 @app.on_event("startup")
 def startup():
-    """Ensure SQLite DB and tables exist using common.storage."""
+    """Ensure SQLite DB and tables exist using common.storage; seed stock levels."""
     init_db(DB_PATH)
+    (set_stock if INVENTORY_STOCK_RESET else seed_stock)(DB_PATH, INVENTORY_STOCK)
+
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text format (common.metrics)."""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 
 @app.post("/reserve")
-def reserve(payload: ReserveRequest):
+def reserve(payload: ReserveRequest, request: Request):
+    # common.tracing: continue the caller's trace (x-correlation-id header, else order_id)
+    with tracing.span_from(request.headers, "POST /reserve", trace_id=payload.order_id):
+        if DELAY_MS > 0:
+            time.sleep(DELAY_MS / 1000.0)
+
+        if FAIL:
+            RESERVATIONS.labels("ERROR").inc()
+            raise HTTPException(status_code=500, detail="Simulated inventory failure")
+
+        order_id = payload.order_id
+        # common.storage: atomic, idempotent stock reservation; a retry returns the original result
+        status, reason = reserve_stock(DB_PATH, order_id, payload.items, payload.model_dump())
+    RESERVATIONS.labels(status).inc()
+    return ReserveResult(order_id=order_id, status=status, reason=reason).model_dump()
+
+
+@app.post("/reserve/batch")
+def reserve_batch(payload: list[ReserveRequest]):
+    """Many reservations in one SQLite transaction; one ReserveResult per request, in order."""
     if DELAY_MS > 0:
         time.sleep(DELAY_MS / 1000.0)
 
     if FAIL:
+        RESERVATIONS.labels("ERROR").inc(len(payload))
         raise HTTPException(status_code=500, detail="Simulated inventory failure")
 
-    order_id = payload.order_id
-    # common.storage: idempotent reservation; if already exists, return existing result
-    created = try_create_reservation(
-        DB_PATH,
-        order_id,
-        "RESERVED",
-        payload.model_dump(),
-    )
-    if created:
-        return ReserveResult(order_id=order_id, status="RESERVED", reason=None).model_dump()
-
-    # Reservation already existed: return existing result from common.storage
-    existing = get_reservation(DB_PATH, order_id)
-    if existing:
-        return ReserveResult(
-            order_id=order_id,
-            status=existing["status"],
-            reason=None,
-        ).model_dump()
-
-    return ReserveResult(order_id=order_id, status="RESERVED", reason=None).model_dump()
+    outcomes = reserve_stock_many(DB_PATH, [(r.order_id, r.items, r.model_dump()) for r in payload])
+    results = []
+    for r, (status, reason) in zip(payload, outcomes):
+        RESERVATIONS.labels(status).inc()
+        results.append(ReserveResult(order_id=r.order_id, status=status, reason=reason).model_dump())
+    return results
@@ -1,21 +1,40 @@
 import logging
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 
 # common module: models, logging
-from common import setup_logging
+from common import metrics, setup_logging, tracing
 from common.models import NotificationRequest
 
 # Logging via common (stdout, timestamps, service name)
 setup_logging("notification-service")
+tracing.configure("notification-service")
 logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
+NOTIFICATIONS = metrics.counter("notifications_sent_total", "Notifications sent")
+
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text format (common.metrics)."""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 
 @app.post("/send")
-def send(payload: NotificationRequest):
+def send(payload: NotificationRequest, request: Request):
     # common.models.NotificationRequest (order_id, user_id, message)
     order_id = payload.order_id
-    # In a real service we'd send email/SMS. Here we just echo.
-    return {"status": "sent", "order_id": order_id}
+    NOTIFICATIONS.inc()
+    with tracing.span_from(request.headers, "POST /send", trace_id=order_id):
+        # In a real service we'd send email/SMS. Here we just echo.
+        return {"status": "sent", "order_id": order_id}
+
+
+@app.post("/send/batch")
+def send_batch(payload: list[NotificationRequest]):
+    """Many notifications in one call (order service NOTIFY_MODE=deferred)."""
+    NOTIFICATIONS.inc(len(payload))
+    # In a real service we'd hand these to an email/SMS provider's bulk API.
+    return {"status": "sent", "count": len(payload)}
@@ -1,26 +1,48 @@
+import asyncio
+import math
 import os
 import logging
+import time
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Response
 import httpx
 
+try:
+    import h2  # noqa: F401  (httpx[http2])
+    _HAS_H2 = True
+except ImportError:
+    _HAS_H2 = False
+
 # common module: models, ids, storage, logging
 from common import (
+    GroupCommitWriter,
+    codec,
+    http_cache,
+    metrics,
     init_db,
     new_order_id,
     now_iso,
-    save_order,
     setup_logging,
+    tracing,
 )
+from common.admission import AdmissionController, AdmissionMiddleware
+from common.idempotency import MAX_KEY_LENGTH, IdempotencyCache, IdempotencyKeyReused, fingerprint
 from common.models import (
     NotificationRequest,
     Order,
     OrderCreateRequest,
     ReserveRequest,
 )
+from common.storage import aio as storage_aio
+
+from batcher import MicroBatcher
+from notifier import DeferredNotifier
+from resilience import AdaptiveTimeout, CircuitBreaker, RetryBudget
 
 # Logging via common (stdout, timestamps, service name)
 setup_logging("order-service")
+tracing.configure("order-service")
 logger = logging.getLogger(__name__)
 
 app = FastAPI()
@@ -29,18 +51,320 @@ DB_PATH = os.getenv("DB_PATH", "/data/orders.db")
 INVENTORY_URL = os.getenv("INVENTORY_URL", "http://localhost:8000")
 NOTIFICATION_URL = os.getenv("NOTIFICATION_URL", "http://localhost:8000")
 INVENTORY_TIMEOUT_MS = int(os.getenv("INVENTORY_TIMEOUT_MS", "1000"))
+# Inventory resilience (resilience.py), opt-in: breaker + adaptive timeout (capped
+# at INVENTORY_TIMEOUT_MS) + budgeted retries; false = one attempt, fixed timeout
+INVENTORY_RESILIENCE = os.getenv("INVENTORY_RESILIENCE", "false").lower() in ("1", "true", "yes")
+INVENTORY_TIMEOUT_MIN_MS = float(os.getenv("INVENTORY_TIMEOUT_MIN_MS", "50"))
+INVENTORY_TIMEOUT_QUANTILE = float(os.getenv("INVENTORY_TIMEOUT_QUANTILE", "0.99"))
+INVENTORY_TIMEOUT_MULTIPLIER = float(os.getenv("INVENTORY_TIMEOUT_MULTIPLIER", "1.5"))
+INVENTORY_MAX_RETRIES = int(os.getenv("INVENTORY_MAX_RETRIES", "2"))
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.1"))
+RETRY_BUDGET_MIN_PER_S = float(os.getenv("RETRY_BUDGET_MIN_PER_S", "5"))
+CB_FAILURE_THRESHOLD = int(os.getenv("CB_FAILURE_THRESHOLD", "5"))
+CB_RESET_TIMEOUT_MS = float(os.getenv("CB_RESET_TIMEOUT_MS", "5000"))
+# Micro-batching: merge concurrent reservations into POST /reserve/batch calls
+INVENTORY_BATCH = os.getenv("INVENTORY_BATCH", "false").lower() in ("1", "true", "yes")
+INVENTORY_BATCH_MAX = int(os.getenv("INVENTORY_BATCH_MAX", "64"))
+INVENTORY_BATCH_DELAY_MS = float(os.getenv("INVENTORY_BATCH_DELAY_MS", "2"))
+# Idempotency-Key: responses kept this long (in memory, bounded) for replay
+IDEMPOTENCY_TTL_S = float(os.getenv("IDEMPOTENCY_TTL_S", "86400"))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "100000"))
+# GET /order/{id}: how long clients / caches may reuse a response before revalidating
+ORDER_CACHE_MAX_AGE_S = int(os.getenv("ORDER_CACHE_MAX_AGE_S", "1"))
+# Admission control for POST /order (common.admission), opt-in: concurrency limit,
+# adaptive from measured latency; 503 + Retry-After once queueing delay passes the target
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "false").lower() in ("1", "true", "yes")
+ADMISSION_LIMIT = int(os.getenv("ADMISSION_LIMIT", "64"))
+ADMISSION_ADAPTIVE = os.getenv("ADMISSION_ADAPTIVE", "true").lower() in ("1", "true", "yes")
+ADMISSION_MIN_LIMIT = int(os.getenv("ADMISSION_MIN_LIMIT", "8"))
+ADMISSION_MAX_LIMIT = int(os.getenv("ADMISSION_MAX_LIMIT", "512"))
+ADMISSION_QUEUE_TARGET_MS = float(os.getenv("ADMISSION_QUEUE_TARGET_MS", "50"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "1000"))
+# Group commit window for order writes (rows per transaction / max wait)
+ORDER_COMMIT_MAX_BATCH = int(os.getenv("ORDER_COMMIT_MAX_BATCH", "256"))
+ORDER_COMMIT_MAX_DELAY_MS = float(os.getenv("ORDER_COMMIT_MAX_DELAY_MS", "2"))
+
+# Outbound HTTP: one keep-alive pool per downstream host, created at startup
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY_S = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_S", "30"))
+INVENTORY_POOL_SIZE = int(os.getenv("INVENTORY_POOL_SIZE", str(HTTP_MAX_CONNECTIONS)))
+NOTIFICATION_POOL_SIZE = int(os.getenv("NOTIFICATION_POOL_SIZE", str(HTTP_MAX_CONNECTIONS)))
+# HTTP/2 needs httpx[http2] and an h2-capable (TLS) upstream; uvicorn itself speaks HTTP/1.1
+HTTP2 = os.getenv("HTTP2", "false").lower() in ("1", "true", "yes")
+# Old behaviour (new client + connections per order), for load-test comparisons
+HTTP_CLIENT_PER_REQUEST = os.getenv("HTTP_CLIENT_PER_REQUEST", "false").lower() in ("1", "true", "yes")
+
+# Notifications: "sync" waits for /send before responding; "deferred" queues them
+# for a background task that sends batches to /send/batch with retries
+NOTIFY_MODE = os.getenv("NOTIFY_MODE", "sync")
+NOTIFY_QUEUE_SIZE = int(os.getenv("NOTIFY_QUEUE_SIZE", "10000"))
+NOTIFY_BATCH_SIZE = int(os.getenv("NOTIFY_BATCH_SIZE", "64"))
+NOTIFY_MAX_RETRIES = int(os.getenv("NOTIFY_MAX_RETRIES", "3"))
+NOTIFY_RETRY_BASE_MS = float(os.getenv("NOTIFY_RETRY_BASE_MS", "100"))
+
+_inventory_breaker = CircuitBreaker("inventory", CB_FAILURE_THRESHOLD, CB_RESET_TIMEOUT_MS / 1000.0)
+_inventory_timeout = AdaptiveTimeout(
+    "inventory",
+    min_s=INVENTORY_TIMEOUT_MIN_MS / 1000.0,
+    max_s=INVENTORY_TIMEOUT_MS / 1000.0,
+    quantile=INVENTORY_TIMEOUT_QUANTILE,
+    multiplier=INVENTORY_TIMEOUT_MULTIPLIER,
+)
+_inventory_retry_budget = RetryBudget("inventory", RETRY_BUDGET_RATIO, RETRY_BUDGET_MIN_PER_S)
+# 4xx answers are final and replayed; 5xx (timeouts, downstream errors) are not stored, so a retry runs again
+_idempotency = IdempotencyCache(
+    "order",
+    ttl_s=IDEMPOTENCY_TTL_S,
+    max_entries=IDEMPOTENCY_MAX_KEYS,
+    store_error=lambda e: isinstance(e, HTTPException) and e.status_code < 500,
+)
+
+_admission = AdmissionController(
+    "order",
+    limit=ADMISSION_LIMIT,
+    min_limit=ADMISSION_MIN_LIMIT,
+    max_limit=ADMISSION_MAX_LIMIT,
+    adaptive=ADMISSION_ADAPTIVE,
+    queue_target_s=ADMISSION_QUEUE_TARGET_MS / 1000.0,
+    max_queue=ADMISSION_MAX_QUEUE,
+)
+if ADMISSION_CONTROL:
+    # Only order creation is limited: reads and /metrics stay available under overload
+    app.add_middleware(AdmissionMiddleware, controller=_admission, routes={("POST", "/order")})
+
+_order_writer: GroupCommitWriter | None = None
+_reserve_batcher: MicroBatcher | None = None
+_notifier: DeferredNotifier | None = None
+_inventory_client: httpx.AsyncClient | None = None
+_notification_client: httpx.AsyncClient | None = None
+_JSON_HEADERS = {"content-type": codec.CONTENT_TYPE}
+_ORDER_CACHE_CONTROL = http_cache.cache_control(ORDER_CACHE_MAX_AGE_S)
+
+ORDERS = metrics.counter("orders_created_total", "POST /order responses", ["status"])
+ORDER_SECONDS = metrics.histogram("order_create_seconds", "POST /order latency")
+ORDER_READS = metrics.counter("order_reads_total", "GET /order/{order_id} responses", ["status"])
+INVENTORY_CALL_SECONDS = metrics.histogram("inventory_call_seconds", "Order -> inventory /reserve call latency")
+NOTIFICATION_CALL_SECONDS = metrics.histogram("notification_call_seconds", "Order -> notification /send call latency")
+
+
+def _make_client(pool_size: int) -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=pool_size,
+        max_keepalive_connections=min(HTTP_MAX_KEEPALIVE, pool_size),
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_S,
+    )
+    return httpx.AsyncClient(limits=limits, http2=HTTP2 and _HAS_H2)
+
+
+@asynccontextmanager
+async def _http_clients():
+    """(inventory client, notification client): the shared pools, or a throwaway client."""
+    if HTTP_CLIENT_PER_REQUEST or _inventory_client is None:
+        async with httpx.AsyncClient() as client:
+            yield client, client
+    else:
+        yield _inventory_client, _notification_client
 
 
 @app.on_event("startup")
 def startup():
-    """Ensure SQLite DB and tables exist using common.storage."""
+    """Ensure SQLite DB and tables exist using common.storage; start the order writer and HTTP pools."""
+    global _order_writer, _inventory_client, _notification_client, _notifier, _reserve_batcher
     init_db(DB_PATH)
+    _order_writer = GroupCommitWriter(DB_PATH, ORDER_COMMIT_MAX_BATCH, ORDER_COMMIT_MAX_DELAY_MS)
+    if HTTP2 and not _HAS_H2:
+        logger.warning("HTTP2=true but h2 is not installed (pip install 'httpx[http2]'); using HTTP/1.1")
+    _inventory_client = _make_client(INVENTORY_POOL_SIZE)
+    _notification_client = _make_client(NOTIFICATION_POOL_SIZE)
+    if INVENTORY_BATCH:
+        _reserve_batcher = MicroBatcher(
+            "inventory_reserve", _flush_reservations, INVENTORY_BATCH_MAX, INVENTORY_BATCH_DELAY_MS / 1000.0
+        )
+    if NOTIFY_MODE == "deferred":
+        _notifier = DeferredNotifier(
+            _send_notifications,
+            maxsize=NOTIFY_QUEUE_SIZE,
+            batch_size=NOTIFY_BATCH_SIZE,
+            max_retries=NOTIFY_MAX_RETRIES,
+            retry_base_s=NOTIFY_RETRY_BASE_MS / 1000.0,
+        )
+        _notifier.start()
+    elif NOTIFY_MODE != "sync":
+        raise ValueError(f"Unknown NOTIFY_MODE: {NOTIFY_MODE!r}")
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Send queued notifications; close the HTTP pools; flush pending order writes."""
+    global _inventory_client, _notification_client, _notifier
+    if _notifier is not None:
+        await _notifier.close()
+        _notifier = None
+    for client in (_inventory_client, _notification_client):
+        if client is not None:
+            await client.aclose()
+    _inventory_client = _notification_client = None
+    if _order_writer is not None:
+        _order_writer.close()
+
+
+async def _send_notifications(batch: list[NotificationRequest]) -> None:
+    """DeferredNotifier sink: one POST /send/batch per batch; raises so the notifier retries."""
+    async with _http_clients() as (_, client):
+        with NOTIFICATION_CALL_SECONDS.time():
+            resp = await client.post(
+                f"{NOTIFICATION_URL}/send/batch",
+                content=codec.adapter(list[NotificationRequest]).serializer.to_json(batch),
+                headers=_JSON_HEADERS,
+            )
+        resp.raise_for_status()
+
+
+async def _flush_reservations(batch: list[ReserveRequest]) -> list[tuple[int, dict | None]]:
+    """MicroBatcher sink: one POST /reserve/batch; (status code, ReserveResult dict) per request."""
+    async with _http_clients() as (client, _):
+        resp = await client.post(
+            f"{INVENTORY_URL}/reserve/batch",
+            content=codec.adapter(list[ReserveRequest]).serializer.to_json(batch),
+            headers=_JSON_HEADERS,
+            timeout=INVENTORY_TIMEOUT_MS / 1000.0,
+        )
+    if resp.status_code != 200:
+        return [(resp.status_code, None)] * len(batch)
+    return [(200, result) for result in resp.json()]
+
+
+async def _post_reserve(client: httpx.AsyncClient, reserve_payload: ReserveRequest, body: bytes) -> tuple[int, dict | None]:
+    """One reservation attempt: (status code, ReserveResult dict if 200), batched or direct."""
+    if _reserve_batcher is not None:
+        return await _reserve_batcher.submit(reserve_payload)
+    resp = await client.post(
+        f"{INVENTORY_URL}/reserve",
+        content=body,
+        headers=tracing.inject(dict(_JSON_HEADERS)),
+        timeout=INVENTORY_TIMEOUT_MS / 1000.0,
+    )
+    return resp.status_code, resp.json() if resp.status_code == 200 else None
+
+
+async def _reserve_inventory(client: httpx.AsyncClient, reserve_payload: ReserveRequest) -> dict:
+    """
+    Reserve via POST /reserve (or /reserve/batch through the micro-batcher);
+    returns the ReserveResult dict (status RESERVED or FAILED with a reason)
+    or raises HTTPException.
+
+    With INVENTORY_RESILIENCE: 503 + Retry-After while the breaker is open;
+    each attempt is bounded by the adaptive timeout; timeouts, connection
+    errors and 5xx are retried (reserve is idempotent per order_id) while the
+    retry budget allows. 504 = timed out / unreachable, 502 = error response.
+    """
+    body = codec.encode(reserve_payload)
+    attempts = INVENTORY_MAX_RETRIES + 1 if INVENTORY_RESILIENCE else 1
+    if INVENTORY_RESILIENCE:
+        _inventory_retry_budget.deposit()
+    for attempt in range(attempts):
+        if INVENTORY_RESILIENCE and not _inventory_breaker.allow():
+            raise HTTPException(
+                status_code=503,
+                detail="Inventory unavailable (circuit open)",
+                headers={"Retry-After": str(max(1, math.ceil(_inventory_breaker.retry_after())))},
+            )
+        timeout = _inventory_timeout.current() if INVENTORY_RESILIENCE else INVENTORY_TIMEOUT_MS / 1000.0
+        start = time.perf_counter()
+        try:
+            with INVENTORY_CALL_SECONDS.time(), tracing.span("http inventory /reserve", attempt=attempt):
+                status_code, result = await asyncio.wait_for(_post_reserve(client, reserve_payload, body), timeout)
+        except (asyncio.TimeoutError, httpx.TimeoutException, httpx.RequestError) as e:
+            logger.warning("Inventory request failed (attempt %d): %s", attempt + 1, type(e).__name__)
+            if isinstance(e, (asyncio.TimeoutError, httpx.TimeoutException)):
+                _inventory_timeout.observe(timeout)
+            error = HTTPException(status_code=504, detail="Inventory request timed out")
+        else:
+            if status_code < 500:
+                _inventory_timeout.observe(time.perf_counter() - start)
+                _inventory_breaker.record_success()
+                if status_code != 200:
+                    raise HTTPException(status_code=502, detail="Inventory reservation failed")
+                return result
+            error = HTTPException(status_code=502, detail="Inventory reservation failed")
+        if INVENTORY_RESILIENCE:
+            _inventory_breaker.record_failure()
+        if attempt + 1 == attempts or not _inventory_retry_budget.try_withdraw():
+            raise error
+
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text format (common.metrics)."""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/order/{order_id}")
+async def read_order(order_id: str, response: Response, if_none_match: str | None = Header(None)):
+    """
+    Order and its current status. Strong ETag; If-None-Match with the current
+    ETag gets 304 (no body). Served from the storage read cache when possible,
+    so polling costs no SQLite read.
+    """
+    found = await storage_aio.get_order(DB_PATH, order_id)
+    if found is None:
+        ORDER_READS.labels(404).inc()
+        raise HTTPException(status_code=404, detail="Order not found")
+    order, status = found
+    headers = {"ETag": http_cache.order_etag(order, status), "Cache-Control": _ORDER_CACHE_CONTROL}
+    if http_cache.if_none_match(if_none_match, headers["ETag"]):
+        ORDER_READS.labels(304).inc()
+        return Response(status_code=304, headers=headers)
+    ORDER_READS.labels(200).inc()
+    response.headers.update(headers)
+    return {**order.model_dump(), "status": status}
 
 
 @app.post("/order")
-async def create_order(payload: OrderCreateRequest):
-    # common.ids + common.models: generate order id and build Order
-    order_id = new_order_id()
+async def create_order(
+    payload: OrderCreateRequest,
+    response: Response,
+    idempotency_key: str | None = Header(None),
+):
+    """
+    With an Idempotency-Key header, repeats of the same request get the first
+    response back (Idempotent-Replayed: true) without calling inventory or
+    notification again; concurrent repeats wait for the first one. A retry
+    after a 5xx runs again under the same order_id. The same key with a
+    different body is a 422.
+    """
+    if idempotency_key is None:
+        # common.ids: the order id doubles as correlation_id / trace id
+        return await _place_order(payload, new_order_id())
+    if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+    try:
+        result, replayed = await _idempotency.run(
+            idempotency_key,
+            fingerprint(codec.encode(payload)),
+            lambda order_id: _place_order(payload, order_id),
+        )
+    except IdempotencyKeyReused as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+
+async def _place_order(payload: OrderCreateRequest, order_id: str):
+    with ORDER_SECONDS.time(), tracing.span("POST /order", trace_id=order_id):
+        try:
+            result = await _create_order(payload, order_id)
+        except HTTPException as e:
+            ORDERS.labels(e.status_code).inc()
+            raise
+    ORDERS.labels(200).inc()
+    return result
+
+
+async def _create_order(payload: OrderCreateRequest, order_id: str):
+    # common.models: build Order
     created_at = now_iso()
     order = Order(
         order_id=order_id,
@@ -48,25 +372,22 @@ async def create_order(payload: OrderCreateRequest):
         items=payload.items,
         created_at=created_at,
     )
-    # common.storage: persist order
-    save_order(DB_PATH, order, "PENDING")
+    # common.storage: persist order (group commit; resolves once durable)
+    with tracing.span("save order"):
+        await asyncio.wrap_future(_order_writer.submit(order, "PENDING"))
 
     reserve_payload = ReserveRequest(order_id=order_id, items=payload.items)
 
-    async with httpx.AsyncClient() as client:
-        # Timeout handling for inventory call
-        try:
-            resp = await client.post(
-                f"{INVENTORY_URL}/reserve",
-                json=reserve_payload.model_dump(),
-                timeout=INVENTORY_TIMEOUT_MS / 1000.0,
+    async with _http_clients() as (inventory_client, notification_client):
+        # Timeouts, retries and the circuit breaker live in _reserve_inventory
+        reservation = await _reserve_inventory(inventory_client, reserve_payload)
+        if reservation["status"] != "RESERVED":
+            # Out of stock: inventory answered 200 with status FAILED. No notification.
+            await storage_aio.update_order_status(DB_PATH, order_id, "FAILED")
+            raise HTTPException(
+                status_code=409,
+                detail={"order_id": order_id, "status": "FAILED", "reason": reservation.get("reason")},
             )
-        except (httpx.TimeoutException, httpx.RequestError) as e:
-            logger.warning("Inventory request failed: %s", e)
-            raise HTTPException(status_code=504, detail="Inventory request timed out")
-
-        if resp.status_code != 200:
-            raise HTTPException(status_code=502, detail="Inventory reservation failed")
 
         # Notify using common.models.NotificationRequest
         notif_body = NotificationRequest(
@@ -74,16 +395,26 @@ async def create_order(payload: OrderCreateRequest):
             user_id=payload.user_id,
             message=f"Order {order_id} placed.",
         )
+        if _notifier is not None:
+            # Deferred: respond now; the background task sends (and retries) the notification
+            queued = _notifier.submit(notif_body)
+            return {
+                "order_id": order_id,
+                "inventory": reservation,
+                "notification": {"status": "queued" if queued else "dropped", "order_id": order_id},
+            }
         try:
-            nresp = await client.post(
-                f"{NOTIFICATION_URL}/send",
-                json=notif_body.model_dump(),
-            )
+            with NOTIFICATION_CALL_SECONDS.time(), tracing.span("http notification /send"):
+                nresp = await notification_client.post(
+                    f"{NOTIFICATION_URL}/send",
+                    content=codec.encode(notif_body),
+                    headers=tracing.inject(dict(_JSON_HEADERS)),
+                )
         except httpx.RequestError:
             raise HTTPException(status_code=502, detail="Notification failed")
 
         return {
             "order_id": order_id,
-            "inventory": resp.json(),
+            "inventory": reservation,
             "notification": nresp.json(),
         }
@@ -0,0 +1,83 @@
+"""
+Client-side micro-batcher: concurrent submit() calls made within max_delay_s
+of each other (or until max_batch is reached) are merged into one flush()
+call, and each caller gets its own element of the result list back.
+
+    batcher = MicroBatcher("inventory_reserve", flush_reservations, max_batch=64, max_delay_s=0.002)
+    result = await batcher.submit(reserve_request)
+
+flush(items) must return one result per item, in order. If it raises, every
+caller in that batch gets the exception. A caller that stops waiting (e.g.
+asyncio.wait_for timed out) does not affect the rest of its batch.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Awaitable, Callable, Generic, TypeVar
+
+from common import metrics
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+BATCH_SIZE = metrics.histogram("micro_batch_size", "Items per flushed micro-batch", ["name"], buckets=metrics.SIZE_BUCKETS)
+BATCH_WAIT = metrics.histogram("micro_batch_wait_seconds", "Time from first submit to flush", ["name"])
+
+
+class MicroBatcher(Generic[T, R]):
+    def __init__(
+        self,
+        name: str,
+        flush: Callable[[list[T]], Awaitable[list[R]]],
+        max_batch: int = 64,
+        max_delay_s: float = 0.002,
+    ) -> None:
+        self._flush = flush
+        self.max_batch = max_batch
+        self.max_delay_s = max_delay_s
+        self._pending: list[tuple[T, asyncio.Future]] = []
+        self._opened_at = 0.0
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self._size = BATCH_SIZE.labels(name)
+        self._wait = BATCH_WAIT.labels(name)
+
+    async def submit(self, item: T) -> R:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if not self._pending:
+            self._opened_at = loop.time()
+            self._timer = loop.call_later(self.max_delay_s, self._flush_pending)
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush_pending()
+        return await future
+
+    def _flush_pending(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        loop = asyncio.get_running_loop()
+        self._size.observe(len(batch))
+        self._wait.observe(loop.time() - self._opened_at)
+        task = loop.create_task(self._run(batch))
+        self._tasks.add(task)  # keep a strong reference until done
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list[tuple[T, asyncio.Future]]) -> None:
+        try:
+            results = await self._flush([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"flush returned {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,108 @@
+"""
+Deferred notifications: a bounded in-process queue drained by one background
+task, so POST /order can return as soon as inventory has reserved.
+
+Notifications are taken off the queue in batches (up to batch_size, whatever
+is waiting) and handed to send_batch. Failed batches are retried with
+exponential backoff, then dropped and counted. When the queue is full,
+submit() drops the notification and counts it instead of blocking the order
+path. notify_queue_depth and notify_dropped_total are the backpressure signals.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable
+
+from common import metrics
+from common.models import NotificationRequest
+
+logger = logging.getLogger(__name__)
+
+QUEUE_DEPTH = metrics.gauge("notify_queue_depth", "Deferred notifications waiting to be sent")
+ENQUEUED = metrics.counter("notify_enqueued_total", "Notifications accepted into the deferred queue")
+SENT = metrics.counter("notify_sent_total", "Deferred notifications delivered")
+RETRIES = metrics.counter("notify_retries_total", "Deferred notification batch retries")
+DROPPED = metrics.counter("notify_dropped_total", "Deferred notifications dropped", ["reason"])
+BATCH_SIZE = metrics.histogram("notify_batch_size", "Notifications per /send/batch call", buckets=metrics.SIZE_BUCKETS)
+QUEUE_WAIT = metrics.histogram("notify_queue_wait_seconds", "Time from enqueue to delivery attempt")
+
+
+class DeferredNotifier:
+    def __init__(
+        self,
+        send_batch: Callable[[list[NotificationRequest]], Awaitable[None]],
+        maxsize: int = 1000,
+        batch_size: int = 32,
+        max_retries: int = 3,
+        retry_base_s: float = 0.1,
+    ) -> None:
+        self._send_batch = send_batch
+        self._queue: asyncio.Queue[tuple[NotificationRequest, float]] = asyncio.Queue(maxsize)
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_base_s = retry_base_s
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def submit(self, request: NotificationRequest) -> bool:
+        """Queue a notification; False (and counted as dropped) if the queue is full."""
+        try:
+            self._queue.put_nowait((request, time.monotonic()))
+        except asyncio.QueueFull:
+            DROPPED.labels("queue_full").inc()
+            return False
+        ENQUEUED.inc()
+        QUEUE_DEPTH.set(self._queue.qsize())
+        return True
+
+    async def close(self, timeout: float = 5.0) -> None:
+        """Deliver what is queued (up to timeout), then stop the worker."""
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            DROPPED.labels("shutdown").inc(self._queue.qsize())
+            logger.warning("Shutdown: %d deferred notifications not sent", self._queue.qsize())
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            QUEUE_DEPTH.set(self._queue.qsize())
+            now = time.monotonic()
+            for _, enqueued_at in batch:
+                QUEUE_WAIT.observe(now - enqueued_at)
+            BATCH_SIZE.observe(len(batch))
+            try:
+                await self._deliver([request for request, _ in batch])
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _deliver(self, batch: list[NotificationRequest]) -> None:
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self._send_batch(batch)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    DROPPED.labels("retries_exhausted").inc(len(batch))
+                    logger.warning("Dropping %d notifications after %d attempts: %s", len(batch), attempt + 1, e)
+                    return
+                RETRIES.inc()
+                await asyncio.sleep(self.retry_base_s * 2**attempt)
+            else:
+                SENT.inc(len(batch))
+                return
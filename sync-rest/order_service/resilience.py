@@ -0,0 +1,178 @@
+"""
+Client-side resilience for downstream calls: circuit breaker, adaptive timeout
+and retry budget. All three are used from one event loop, so there are no locks.
+
+- CircuitBreaker: after failure_threshold consecutive failures, calls are
+  rejected without being attempted for reset_timeout_s. Then it goes half-open
+  and lets one probe through per reset_timeout_s. A probe success closes the
+  breaker; a probe failure opens it again.
+- AdaptiveTimeout: timeout = multiplier x the quantile of recent latencies,
+  clamped to [min_s, max_s]. It uses max_s until min_samples calls have been
+  seen. A timed-out call is recorded at the timeout value, so when the
+  dependency gets slower the timeout ratchets up towards max_s.
+- RetryBudget: each request deposits `ratio` tokens and each retry spends
+  one. A floor of min_per_s retries/sec refills independently. Retries
+  therefore add at most ~ratio extra load, instead of multiplying load
+  during an outage.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import deque
+
+from common import metrics
+
+CIRCUIT_STATE = metrics.gauge("circuit_state", "0 closed, 1 half-open, 2 open", ["name"])
+CIRCUIT_TRANSITIONS = metrics.counter("circuit_transitions_total", "Breaker state changes", ["name", "from_state", "to_state"])
+CIRCUIT_REJECTED = metrics.counter("circuit_rejected_total", "Calls rejected while open", ["name"])
+TIMEOUT_SECONDS = metrics.gauge("adaptive_timeout_seconds", "Current adaptive timeout", ["name"])
+RETRIES = metrics.counter("retries_total", "Retry decisions", ["name", "result"])
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreaker:
+    """
+    >>> cb = CircuitBreaker("doc", failure_threshold=2, reset_timeout_s=0.0)
+    >>> cb.record_failure(); cb.record_failure(); cb.state
+    'open'
+    >>> cb.allow(), cb.state          # reset timeout elapsed: one half-open probe
+    (True, 'half_open')
+    >>> cb.record_success(); cb.state
+    'closed'
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout_s: float = 5.0) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self.state = CLOSED
+        self._failures = 0
+        self._next_probe_at = 0.0
+        self._rejected = CIRCUIT_REJECTED.labels(name)
+        CIRCUIT_STATE.labels(name).set(0)
+
+    def _transition(self, to: str) -> None:
+        CIRCUIT_TRANSITIONS.labels(self.name, self.state, to).inc()
+        CIRCUIT_STATE.labels(self.name).set(_STATE_VALUE[to])
+        self.state = to
+
+    def allow(self) -> bool:
+        """True if a call may be attempted now."""
+        if self.state == CLOSED:
+            return True
+        now = time.monotonic()
+        if now >= self._next_probe_at:
+            if self.state == OPEN:
+                self._transition(HALF_OPEN)
+            self._next_probe_at = now + self.reset_timeout_s
+            return True
+        self._rejected.inc()
+        return False
+
+    def retry_after(self) -> float:
+        """Seconds until the next probe is allowed (0 when closed)."""
+        return 0.0 if self.state == CLOSED else max(0.0, self._next_probe_at - time.monotonic())
+
+    def record_success(self) -> None:
+        self._failures = 0
+        if self.state != CLOSED:
+            self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        if self.state == HALF_OPEN:
+            self._transition(OPEN)
+            self._next_probe_at = time.monotonic() + self.reset_timeout_s
+            return
+        self._failures += 1
+        if self.state == CLOSED and self._failures >= self.failure_threshold:
+            self._transition(OPEN)
+            self._next_probe_at = time.monotonic() + self.reset_timeout_s
+
+
+class AdaptiveTimeout:
+    """
+    >>> t = AdaptiveTimeout("doc", min_s=0.01, max_s=1.0, min_samples=4)
+    >>> t.current()
+    1.0
+    >>> for s in (0.02, 0.02, 0.03, 0.04): t.observe(s)
+    >>> t.current()                    # 1.5 x p99 of the window
+    0.06
+    """
+
+    def __init__(
+        self,
+        name: str,
+        min_s: float,
+        max_s: float,
+        quantile: float = 0.99,
+        multiplier: float = 1.5,
+        window: int = 256,
+        min_samples: int = 20,
+    ) -> None:
+        self.min_s = min_s
+        self.max_s = max_s
+        self.quantile = quantile
+        self.multiplier = multiplier
+        self.min_samples = min_samples
+        self._samples: deque[float] = deque(maxlen=window)
+        self._since_update = 0
+        self._current = max_s
+        self._gauge = TIMEOUT_SECONDS.labels(name)
+        self._gauge.set(max_s)
+
+    def current(self) -> float:
+        return self._current
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self._since_update += 1
+        n = len(self._samples)
+        # Re-sorting a 256-sample window costs a few µs; do it every 16 calls once warm
+        if n >= self.min_samples and (self._since_update >= 16 or n == self.min_samples):
+            self._since_update = 0
+            ordered = sorted(self._samples)
+            q = ordered[min(n - 1, int(self.quantile * n))]
+            self._current = round(min(self.max_s, max(self.min_s, q * self.multiplier)), 6)
+            self._gauge.set(self._current)
+
+
+class RetryBudget:
+    """
+    >>> b = RetryBudget("doc", ratio=0.5, min_per_s=0)
+    >>> b.try_withdraw()
+    False
+    >>> b.deposit(); b.deposit(); b.try_withdraw(), b.try_withdraw()
+    (True, False)
+    >>> b = RetryBudget("doc", ratio=0.1, min_per_s=0)
+    >>> for _ in range(10): b.deposit()
+    >>> b.try_withdraw(), b.try_withdraw()   # 10 requests at 10% buy exactly one retry
+    (True, False)
+    """
+
+    def __init__(self, name: str, ratio: float = 0.1, min_per_s: float = 5.0, cap: float = 20.0) -> None:
+        self.ratio = ratio
+        self.min_per_s = min_per_s
+        self.cap = cap
+        self._tokens = 0.0
+        self._last = time.monotonic()
+        self._allowed = RETRIES.labels(name, "allowed")
+        self._denied = RETRIES.labels(name, "budget_exhausted")
+
+    def deposit(self) -> None:
+        """Call once per original request."""
+        self._tokens = min(self.cap, self._tokens + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        """True (and one token spent) if a retry is within budget."""
+        now = time.monotonic()
+        self._tokens = min(self.cap, self._tokens + (now - self._last) * self.min_per_s)
+        self._last = now
+        if self._tokens >= 1.0 - 1e-9:  # ten deposits of 0.1 sum to 0.999...
+            self._tokens -= 1.0
+            self._allowed.inc()
+            return True
+        self._denied.inc()
+        return False
@@ -0,0 +1,120 @@
+"""
+Benchmark: POST /order under overload when inventory slows down mid-run,
+with admission control (common.admission) off and on.
+
+Runs the chain in process (inprocess.py, ASGI transport). Poisson arrivals
+at a fixed rate; after a third of the run inventory starts taking
+--slow-ms per reservation (its handlers run in a 40-thread pool, so it
+then serves at most ~40 / slow-ms reservations per second). The inventory
+resilience layer is off, so the only timeout is INVENTORY_TIMEOUT_MS.
+Per mode it reports goodput (200s/s), latency of the 200s, how many
+requests were shed (503) or timed out (504) and how fast, and the peak
+number of requests in flight at the order service.
+
+Run from repo root:
+    PYTHONPATH=. python sync-rest/tests/bench_admission.py [--rate 150] [--seconds 12] [--slow-ms 400]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+
+from common import metrics
+from common.loadgen import HdrHistogram
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from inprocess import sync_chain  # noqa: E402
+
+BODY = {"user_id": "overload", "items": [{"sku": "burger", "qty": 1}]}
+
+
+async def run_mode(admission: bool, args: argparse.Namespace) -> dict:
+    env = {
+        "ADMISSION_CONTROL": "true" if admission else "false",
+        "INVENTORY_RESILIENCE": "false",
+        "INVENTORY_TIMEOUT_MS": str(args.timeout_ms),
+        "NOTIFY_MODE": "deferred",
+        "LOG_HOT_RATE": "1",
+    }
+    async with sync_chain(env) as chain:
+        client, inventory = chain.client, chain.inventory
+        for _ in range(50):  # warm up; also gives the adaptive limit a latency baseline
+            await client.post("/order", json=BODY)
+
+        loop = asyncio.get_running_loop()
+        latency = {200: HdrHistogram(), 503: HdrHistogram(), 504: HdrHistogram()}
+        statuses: dict[int, int] = {}
+        inflight = peak = 0
+        slow_at = loop.time() + args.seconds / 3
+        rng = random.Random(7)
+
+        async def fire() -> None:
+            nonlocal inflight, peak
+            inflight += 1
+            peak = max(peak, inflight)
+            start = time.perf_counter()
+            resp = await client.post("/order", json=BODY)
+            elapsed_us = round((time.perf_counter() - start) * 1e6)
+            inflight -= 1
+            statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+            if resp.status_code in latency:
+                latency[resp.status_code].record(elapsed_us)
+
+        tasks = []
+        due = loop.time()
+        stop_at = due + args.seconds
+        while due < stop_at:
+            due += rng.expovariate(args.rate)
+            await asyncio.sleep(max(0.0, due - loop.time()))
+            if inventory.DELAY_MS == 0 and loop.time() >= slow_at:
+                inventory.DELAY_MS = args.slow_ms
+            tasks.append(loop.create_task(fire()))
+        await asyncio.gather(*tasks)
+        inventory.DELAY_MS = 0
+        limit = chain.order._admission.limit if admission else None
+
+    return {
+        "statuses": dict(sorted(statuses.items())),
+        "goodput": statuses.get(200, 0) / args.seconds,
+        "ok_p50": latency[200].percentile(50) / 1000,
+        "ok_p99": latency[200].percentile(99) / 1000,
+        "shed_p99": latency[503].percentile(99) / 1000 if latency[503].count else None,
+        "timeout_p50": latency[504].percentile(50) / 1000 if latency[504].count else None,
+        "peak_inflight": peak,
+        "final_limit": limit,
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # one INFO line per request otherwise
+    print(
+        f"{args.rate:g} req/s Poisson for {args.seconds:g} s; inventory +{args.slow_ms} ms per reservation "
+        f"after {args.seconds / 3:.0f} s; INVENTORY_TIMEOUT_MS={args.timeout_ms}"
+    )
+    print(f"{'admission':<10} {'goodput/s':>9} {'200 p50':>8} {'200 p99':>8} {'503 p99':>8} {'504 p50':>8} {'peak inflight':>14}  statuses")
+    for admission in (False, True):
+        r = await run_mode(admission, args)
+        fmt = lambda v: f"{v:>8.1f}" if v is not None else f"{'-':>8}"  # noqa: E731
+        mode = "on" if admission else "off"
+        print(
+            f"{mode:<10} {r['goodput']:>9.1f} {fmt(r['ok_p50'])} {fmt(r['ok_p99'])} {fmt(r['shed_p99'])} "
+            f"{fmt(r['timeout_p50'])} {r['peak_inflight']:>14}  {r['statuses']}"
+            + (f"  (limit at end: {r['final_limit']})" if admission else "")
+        )
+    shed = metrics.REGISTRY.get("admission_requests_total")
+    if shed is not None:
+        print("\nadmission_requests_total:", {key[1]: int(child.value) for key, child in shed.children()})
+    print("(latencies in ms)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Overload benchmark for admission control on POST /order.")
+    parser.add_argument("--rate", type=float, default=150.0, help="arrivals per second (Poisson)")
+    parser.add_argument("--seconds", type=float, default=12.0)
+    parser.add_argument("--slow-ms", type=int, default=400, help="inventory delay per reservation after 1/3 of the run")
+    parser.add_argument("--timeout-ms", type=int, default=1000, help="INVENTORY_TIMEOUT_MS")
+    asyncio.run(main(parser.parse_args()))
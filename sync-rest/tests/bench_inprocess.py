@@ -0,0 +1,129 @@
+"""
+Benchmark: the whole sync-rest chain (order -> inventory -> notification) in
+one process, no docker (see inprocess.py), driven by common.loadgen.
+
+Prints the load report, then per-stage timing:
+- spans (common.tracing): server handlers, outbound calls, order save
+- histograms (common.metrics) that moved during the run: storage ops,
+  group commit, downstream call latency
+With --transport asgi (default) there are no sockets, so the numbers are
+application overhead: validation, ids, SQLite, serialization. --profile N
+adds the top N functions by own time (cProfile). In loopback mode all three
+servers share this process's event loop, so hop latency includes waiting
+for it. The resilience layer and admission control are off unless
+--resilience / --admission: under profiling or overload their adaptive
+timeout, breaker and concurrency limit would turn slow calls into 503s.
+
+Run from repo root:
+    PYTHONPATH=. python sync-rest/tests/bench_inprocess.py [--transport asgi|loopback]
+        [--requests 2000 --concurrency 16 | --arrival poisson --rate 200 --duration 10]
+        [--notify sync|deferred] [--resilience] [--admission] [--profile 25] [--json result.json]
+
+--json output works with `python -m common.loadgen compare`.
+"""
+
+import argparse
+import asyncio
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+
+import httpx
+
+from common import loadgen, metrics, tracing
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from inprocess import sync_chain  # noqa: E402
+
+
+def histogram_state() -> dict[str, tuple[int, float]]:
+    """'name{labels}' -> (count, sum) for every histogram child."""
+    state = {}
+    for metric in metrics.REGISTRY.all():
+        if not isinstance(metric, metrics.Histogram):
+            continue
+        for key, child in metric.children():
+            labels = ",".join(f"{n}={v}" for n, v in zip(metric.labelnames, key))
+            state[f"{metric.name}{{{labels}}}" if labels else metric.name] = (child.count, child.sum)
+    return state
+
+
+async def main(args: argparse.Namespace) -> None:
+    env = {
+        "NOTIFY_MODE": args.notify,
+        "INVENTORY_RESILIENCE": "true" if args.resilience else "false",
+        "ADMISSION_CONTROL": "true" if args.admission else "false",
+        "LOG_HOT_RATE": "1",
+    }
+    async with sync_chain(env, transport=args.transport) as chain:
+        if args.transport == "asgi":
+            url, transport = "http://order/order", httpx.ASGITransport(app=chain.order.app)
+        else:
+            url, transport = f"{chain.client.base_url}/order", None
+        config = loadgen.config_from_args(args)
+        config.url = url
+
+        # Warm up (imports, SQLite pages, pools) before recording anything
+        await loadgen.run(loadgen.LoadConfig(url=url, arrival="closed", requests=200, concurrency=8), transport)
+        spans_path = os.path.join(chain.tmp, "spans.jsonl")
+        tracing.configure("sync-rest", sink=spans_path)
+        before = histogram_state()
+        profiler = cProfile.Profile() if args.profile else None
+        if profiler:
+            profiler.enable()
+        result = await loadgen.run(config, transport)
+        if profiler:
+            profiler.disable()
+        after = histogram_state()
+        tracing.shutdown()
+
+    print(f"in-process chain, transport={args.transport}, NOTIFY_MODE={args.notify}")
+    print(loadgen.report(result))
+
+    stages = {}
+    print(f"\n{'stage (span)':<36} {'count':>7} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+    for _, name, count, p50, p95, top in tracing.hop_breakdown(tracing.load_spans(spans_path)):
+        stages[name] = {"count": count, "p50_ms": round(p50, 3), "p95_ms": round(p95, 3), "max_ms": round(top, 3)}
+        print(f"{name:<36} {count:>7} {p50:>8.3f} {p95:>8.3f} {top:>8.3f}")
+
+    histograms = {}
+    print(f"\n{'histogram (seconds in ms; sizes in items)':<56} {'count':>7} {'mean':>8}")
+    for name, (count, total) in sorted(after.items()):
+        count_before, total_before = before.get(name, (0, 0.0))
+        n = count - count_before
+        if n <= 0:
+            continue
+        mean = (total - total_before) / n
+        if name.split("{")[0].endswith("_seconds"):
+            mean *= 1000
+        histograms[name] = {"count": n, "mean": round(mean, 3)}
+        print(f"{name:<56} {n:>7} {mean:>8.3f}")
+
+    if profiler:
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("tottime").print_stats(args.profile)
+        print("\n" + out.getvalue())
+
+    if args.json_path:
+        result.update(transport=args.transport, notify_mode=args.notify, stages=stages, histograms=histograms)
+        with open(args.json_path, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"results written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="In-process sync-rest chain benchmark with per-stage timing.")
+    loadgen.add_run_arguments(parser)
+    parser.add_argument("--transport", choices=("asgi", "loopback"), default="asgi")
+    parser.add_argument("--notify", choices=("sync", "deferred"), default="sync", help="order service NOTIFY_MODE")
+    parser.add_argument("--resilience", action="store_true", help="keep the inventory breaker / adaptive timeout on")
+    parser.add_argument("--admission", action="store_true", help="keep admission control on POST /order on")
+    parser.add_argument("--profile", type=int, default=0, metavar="N", help="print the top N functions (cProfile)")
+    parser.set_defaults(arrival="closed", requests=2000, concurrency=16)
+    args = parser.parse_args()
+    if args.arrival != "closed" and "--requests" not in sys.argv:
+        args.requests = None
+    asyncio.run(main(args))
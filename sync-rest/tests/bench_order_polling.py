@@ -0,0 +1,103 @@
+"""
+Benchmark: clients polling GET /order/{order_id} on the sync order service,
+with and without If-None-Match, with the storage read cache on and off.
+
+Runs the chain in process (inprocess.py, ASGI transport), creates a set of
+orders, then has closed-loop pollers fetch random orders for a fixed time.
+Reports req/s, p50/p99, 200 vs 304 responses, body bytes and how many
+lookups reached SQLite (read-cache misses, or every request with the cache
+off). A client that also honours Cache-Control max-age would skip most of
+these requests entirely; this measures what reaches the service.
+
+Run from repo root:
+    PYTHONPATH=. python sync-rest/tests/bench_order_polling.py [orders] [pollers] [seconds_per_mode]
+"""
+
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+
+from common import configure_read_cache, read_cache_stats
+from common.loadgen import HdrHistogram
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from inprocess import sync_chain  # noqa: E402
+
+BODY = {"user_id": "poller", "items": [{"sku": "burger", "qty": 1}, {"sku": "fries", "qty": 2}]}
+
+
+async def poll(client, order_ids: list[str], pollers: int, seconds: float, conditional: bool) -> dict:
+    latency = HdrHistogram()
+    statuses: dict[int, int] = {}
+    body_bytes = 0
+    etags: dict[str, str] = {}
+    stop_at = time.perf_counter() + seconds
+    rng = random.Random(1)
+
+    async def poller() -> None:
+        nonlocal body_bytes
+        while time.perf_counter() < stop_at:
+            order_id = rng.choice(order_ids)
+            headers = {"If-None-Match": etags[order_id]} if conditional and order_id in etags else {}
+            start = time.perf_counter()
+            resp = await client.get(f"/order/{order_id}", headers=headers)
+            latency.record(round((time.perf_counter() - start) * 1e6))
+            statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+            body_bytes += len(resp.content)
+            if resp.status_code == 200:
+                etags[order_id] = resp.headers["etag"]
+
+    cache_before = read_cache_stats()
+    start = time.perf_counter()
+    await asyncio.gather(*(poller() for _ in range(pollers)))
+    elapsed = time.perf_counter() - start
+    cache_after = read_cache_stats()
+    if cache_after["max_entries"]:
+        sqlite_reads = cache_after["misses"] - cache_before["misses"]
+    else:
+        sqlite_reads = latency.count  # cache disabled: every lookup is a SQLite read
+    return {
+        "rps": latency.count / elapsed,
+        "p50": latency.percentile(50) / 1000,
+        "p99": latency.percentile(99) / 1000,
+        "statuses": dict(sorted(statuses.items())),
+        "bytes_per_req": body_bytes / max(1, latency.count),
+        "sqlite_reads": sqlite_reads,
+        "requests": latency.count,
+    }
+
+
+async def main(n_orders: int, pollers: int, seconds: float) -> None:
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # one INFO line per request otherwise
+    async with sync_chain({"NOTIFY_MODE": "deferred", "LOG_HOT_RATE": "1"}) as chain:
+        client = chain.client
+        order_ids = []
+        for _ in range(n_orders):
+            resp = await client.post("/order", json=BODY)
+            resp.raise_for_status()
+            order_ids.append(resp.json()["order_id"])
+        cache_size = read_cache_stats()["max_entries"] or 10000
+
+        print(f"{n_orders} orders, {pollers} pollers, {seconds:g} s per mode")
+        print(f"{'mode':<28} {'req/s':>7} {'p50 ms':>7} {'p99 ms':>7} {'B/req':>6} {'SQLite reads':>13}  statuses")
+        for cache_on in (True, False):
+            configure_read_cache(cache_size if cache_on else 0)
+            for conditional in (False, True):
+                await poll(client, order_ids, pollers, 0.5, conditional)  # warm-up
+                r = await poll(client, order_ids, pollers, seconds, conditional)
+                mode = f"{'If-None-Match' if conditional else 'plain GET'}, cache {'on' if cache_on else 'off'}"
+                print(
+                    f"{mode:<28} {r['rps']:>7.0f} {r['p50']:>7.2f} {r['p99']:>7.2f} {r['bytes_per_req']:>6.0f} "
+                    f"{r['sqlite_reads']:>6}/{r['requests']:<6}  {r['statuses']}"
+                )
+        configure_read_cache(cache_size)
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    p = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    s = float(sys.argv[3]) if len(sys.argv) > 3 else 5.0
+    asyncio.run(main(n, p, s))
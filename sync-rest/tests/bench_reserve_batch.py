@@ -0,0 +1,119 @@
+"""
+Benchmark: direct POST /reserve vs the order service's micro-batcher
+(INVENTORY_BATCH=true -> POST /reserve/batch), at several concurrency levels.
+
+Starts inventory, notification and order (once per mode) as local uvicorn
+processes on loopback ports with temp SQLite files, then drives POST /order
+closed-loop and reports orders/sec, p50 and p95 per concurrency level.
+The resilience layer is switched off so that only batching differs.
+
+Run from repo root:
+    PYTHONPATH=. python sync-rest/tests/bench_reserve_batch.py [requests_per_level] [levels, e.g. 1,8,32,128]
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO = os.path.dirname(ROOT)
+PORTS = {"inventory_service": 18102, "notification_service": 18103, "order_service": 18101}
+
+
+def start(service: str, env: dict[str, str]) -> subprocess.Popen:
+    full_env = {**os.environ, "PYTHONPATH": REPO, "LOG_HOT_RATE": "1", **env}
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(PORTS[service]), "--log-level", "warning"],
+        cwd=os.path.join(ROOT, service),
+        env=full_env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+async def wait_ready(port: int) -> None:
+    async with httpx.AsyncClient() as client:
+        for _ in range(100):
+            try:
+                await client.get(f"http://127.0.0.1:{port}/metrics")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError(f"service on port {port} did not start")
+
+
+async def drive(n: int, concurrency: int) -> tuple[float, float, float, int]:
+    url = f"http://127.0.0.1:{PORTS['order_service']}/order"
+    payload = {"user_id": "bench", "items": [{"sku": "burger", "qty": 1}]}
+    latencies: list[float] = []
+    ok = 0
+    remaining = iter(range(n))
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        nonlocal ok
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                r = await client.post(url, json=payload, timeout=30.0)
+                ok += r.status_code == 200
+            except httpx.HTTPError:
+                pass
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    return n / elapsed, latencies[len(latencies) // 2], latencies[int(0.95 * len(latencies))], ok
+
+
+async def main(n: int, levels: list[int]) -> None:
+    tmp = tempfile.mkdtemp()
+    base = [
+        start("inventory_service", {"DB_PATH": os.path.join(tmp, "inventory.db")}),
+        start("notification_service", {}),
+    ]
+    try:
+        await wait_ready(PORTS["inventory_service"])
+        await wait_ready(PORTS["notification_service"])
+        print(f"{'mode':<8} {'conc':>5} {'orders/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'ok':>6}")
+        for mode in ("direct", "batched"):
+            order = start(
+                "order_service",
+                {
+                    "DB_PATH": os.path.join(tmp, f"orders-{mode}.db"),
+                    "INVENTORY_URL": f"http://127.0.0.1:{PORTS['inventory_service']}",
+                    "NOTIFICATION_URL": f"http://127.0.0.1:{PORTS['notification_service']}",
+                    "INVENTORY_BATCH": "true" if mode == "batched" else "false",
+                    "INVENTORY_TIMEOUT_MS": "10000",
+                    # Measure batching alone: no adaptive timeout / breaker / admission shedding under overload
+                    "INVENTORY_RESILIENCE": "false",
+                    "ADMISSION_CONTROL": "false",
+                },
+            )
+            try:
+                await wait_ready(PORTS["order_service"])
+                await drive(50, 8)  # warm-up
+                for c in levels:
+                    rate, p50, p95, ok = await drive(n, c)
+                    print(f"{mode:<8} {c:>5} {rate:>9.0f} {p50:>8.2f} {p95:>8.2f} {ok:>6}")
+            finally:
+                order.terminate()
+                order.wait()
+    finally:
+        for p in base:
+            p.terminate()
+            p.wait()
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    levels = [int(c) for c in sys.argv[2].split(",")] if len(sys.argv) > 2 else [1, 8, 32, 128]
+    asyncio.run(main(n, levels))
@@ -0,0 +1,106 @@
+"""
+In-process sync-rest chain: the order, inventory and notification FastAPI apps
+loaded into one Python process against temp SQLite files, no docker.
+
+    async with sync_chain(env={"NOTIFY_MODE": "deferred"}) as chain:
+        resp = await chain.client.post("/order", json=body)
+
+transport="asgi" (default) wires the apps with httpx.ASGITransport: no
+sockets, so a profile shows application overhead only (validation, ids,
+storage, serialization). transport="loopback" serves each app with an
+in-process uvicorn server on an ephemeral 127.0.0.1 port, adding real HTTP
+parsing and TCP.
+
+env is applied to os.environ before the apps are imported (they read their
+settings at import time). Used by test_resilience.py, test_idempotency.py
+and bench_inprocess.py.
+"""
+
+import asyncio
+import importlib.util
+import os
+import sys
+import tempfile
+from contextlib import asynccontextmanager, nullcontext
+from dataclasses import dataclass
+from types import ModuleType
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_app(service: str, name: str) -> ModuleType:
+    """Import <service>/app.py as module `name` (its directory goes on sys.path for sibling modules)."""
+    path = os.path.join(ROOT, service, "app.py")
+    sys.path.insert(0, os.path.dirname(path))
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@dataclass
+class Chain:
+    order: ModuleType
+    inventory: ModuleType
+    notification: ModuleType
+    client: httpx.AsyncClient  # to the order app; base_url set, so post("/order", ...)
+    tmp: str
+
+
+async def _serve(app) -> tuple[object, asyncio.Task, str]:
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning"))
+    server.capture_signals = nullcontext  # several servers in one process: the caller owns Ctrl-C
+    task = asyncio.get_running_loop().create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()  # startup failed: raise its error
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, task, f"http://127.0.0.1:{port}"
+
+
+@asynccontextmanager
+async def sync_chain(env: dict[str, str] | None = None, transport: str = "asgi", tmp: str | None = None):
+    """Load, start and wire the three apps; yields a Chain and shuts everything down after."""
+    if transport not in ("asgi", "loopback"):
+        raise ValueError(f"Unknown transport: {transport!r}")
+    tmp = tmp or tempfile.mkdtemp()
+    os.environ.update(env or {})
+    inventory = load_app("inventory_service", "inventory_app")
+    notification = load_app("notification_service", "notification_app")
+    order = load_app("order_service", "order_app")
+    inventory.DB_PATH = os.path.join(tmp, "inventory.db")
+    order.DB_PATH = os.path.join(tmp, "orders.db")
+
+    servers: list[tuple[object, asyncio.Task]] = []
+    if transport == "asgi":
+        inventory.startup()
+        order.startup()
+        for pool in (order._inventory_client, order._notification_client):
+            await pool.aclose()
+        order._inventory_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=inventory.app))
+        order._notification_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=notification.app))
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=order.app), base_url="http://order")
+    else:
+        for module, attr in ((inventory, "INVENTORY_URL"), (notification, "NOTIFICATION_URL")):
+            server, task, url = await _serve(module.app)
+            servers.append((server, task))
+            setattr(order, attr, url)
+        server, task, url = await _serve(order.app)  # lifespan runs order.startup() with the URLs above
+        servers.append((server, task))
+        limits = httpx.Limits(max_connections=1000, max_keepalive_connections=1000)
+        client = httpx.AsyncClient(base_url=url, limits=limits)
+
+    try:
+        yield Chain(order, inventory, notification, client, tmp)
+    finally:
+        await client.aclose()
+        if transport == "asgi":
+            await order.shutdown()
+        for server, task in reversed(servers):
+            server.should_exit = True
+            await task
@@ -1,45 +1,41 @@
-import time
-import asyncio
-import httpx
-
-URL = "http://localhost:8001/order"
-
-
-async def send_order(client, i):
-    # Request body matches common.models.OrderCreateRequest (user_id, items)
-    payload = {
-        "user_id": "load-test",
-        "items": [{"sku": "burger", "qty": 1}, {"sku": "fries", "qty": 1}],
-    }
-    start = time.perf_counter()
-    try:
-        r = await client.post(URL, json=payload, timeout=10.0)
-        latency = (time.perf_counter() - start) * 1000
-        return r.status_code, latency
-    except Exception as e:
-        latency = (time.perf_counter() - start) * 1000
-        return f"error:{e}", latency
-
-
-async def run(n=100, concurrency=10):
-    sem = asyncio.Semaphore(concurrency)
-    async with httpx.AsyncClient() as client:
-        async def task(i):
-            async with sem:
-                return await send_order(client, i)
-
-        tasks = [task(i) for i in range(n)]
-        results = await asyncio.gather(*tasks)
-
-    success = [r for r in results if isinstance(r[0], int) and r[0] == 200]
-    latencies = [r[1] for r in results if isinstance(r[1], float)]
-    print(f"requests: {n}, success: {len(success)}")
-    if latencies:
-        print(f"p50={sorted(latencies)[int(0.5*len(latencies))]:.2f}ms p95={sorted(latencies)[int(0.95*len(latencies))]:.2f}ms")
+"""
+Load test for POST /order, on top of common.loadgen. ORDER_URL overrides the
+target (default sync-rest on :8001; async-rabbitmq's order service uses the
+same port when that stack is up instead).
+
+    python3 tests/load_test.py 200 20          # 200 requests, 20 at a time (closed loop, as before)
+    python3 tests/load_test.py --rate 50 --duration 30 --warmup 5 --arrival poisson --json after.json
+    python3 -m common.loadgen compare before.json after.json   # from repo root
+
+The open-loop form is the one to use for latency numbers: it keeps sending
+at the target rate while the service stalls, so stalls show up in the
+percentiles (no coordinated omission).
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from common.loadgen import LoadConfig, add_run_arguments, config_from_args, run_and_report  # noqa: E402
+
+URL = os.getenv("ORDER_URL", "http://localhost:8001/order")
+
+
+def main(argv: list[str]) -> None:
+    if argv and all(a.isdigit() for a in argv) and len(argv) <= 2:
+        # Old form: load_test.py [n] [concurrency]
+        n = int(argv[0])
+        c = int(argv[1]) if len(argv) > 1 else 10
+        run_and_report(LoadConfig(url=URL, arrival="closed", requests=n, concurrency=c, warmup_s=0.0))
+        return
+    parser = argparse.ArgumentParser(description="Load test for POST /order (see common.loadgen).")
+    add_run_arguments(parser)
+    parser.set_defaults(url=URL)
+    args = parser.parse_args(argv)
+    run_and_report(config_from_args(args), args.json_path)
 
 
 if __name__ == "__main__":
-    import sys
-    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100
-    c = int(sys.argv[2]) if len(sys.argv) > 2 else 10
-    asyncio.run(run(n, c))
+    main(sys.argv[1:])
@@ -0,0 +1,107 @@
+"""
+Test: Idempotency-Key on POST /order in the sync order service.
+
+Runs the real order, inventory and notification apps in one process
+(httpx.ASGITransport, temp SQLite files), no docker needed:
+1. a repeat with the same key returns the stored response
+   (Idempotent-Replayed: true) without calling inventory or notification again
+2. 20 concurrent requests with one key make one reservation between them
+3. the same key with a different body is rejected with 422
+4. a retry after a 504 runs again, under the order_id of the failed attempt
+5. an order inventory cannot fill (INVENTORY_STOCK) is a 409: the order is
+   stored as FAILED and no notification goes out; a repeat replays the 409
+
+Run from repo root:
+    PYTHONPATH=. python sync-rest/tests/test_idempotency.py
+"""
+
+import asyncio
+import os
+import sys
+from collections import Counter
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from inprocess import sync_chain  # noqa: E402
+
+BODY = {"user_id": "idem-test", "items": [{"sku": "burger", "qty": 1}]}
+SCARCE = {"user_id": "idem-test", "items": [{"sku": "fries", "qty": 1}]}  # one in stock; burger is untracked
+
+
+async def main():
+    async with sync_chain({"INVENTORY_TIMEOUT_MS": "200", "INVENTORY_RESILIENCE": "false", "INVENTORY_STOCK": "fries=1"}) as chain:
+        await run_checks(chain.order, chain.inventory, chain.client)
+    print("OK")
+
+
+async def run_checks(order, inventory, client):
+    calls: Counter[str] = Counter()
+
+    async def count(request: httpx.Request) -> None:
+        calls[request.url.path] += 1
+
+    for pool in (order._inventory_client, order._notification_client):
+        pool.event_hooks["request"].append(count)
+
+    # 1. Sequential repeat: replayed, no downstream calls
+    first = await client.post("/order", json=BODY, headers={"Idempotency-Key": "k-seq"})
+    again = await client.post("/order", json=BODY, headers={"Idempotency-Key": "k-seq"})
+    assert first.status_code == again.status_code == 200, (first.text, again.text)
+    assert first.json() == again.json()
+    assert "Idempotent-Replayed" not in first.headers and again.headers["Idempotent-Replayed"] == "true"
+    assert calls == {"/reserve": 1, "/send": 1}, calls
+    print(f"repeat: same order_id {first.json()['order_id']}, downstream calls {dict(calls)}")
+
+    # 2. Concurrent requests with one key are coalesced into one execution
+    calls.clear()
+    responses = await asyncio.gather(
+        *(client.post("/order", json=BODY, headers={"Idempotency-Key": "k-burst"}) for _ in range(20))
+    )
+    assert {r.status_code for r in responses} == {200}
+    assert len({r.json()["order_id"] for r in responses}) == 1
+    assert calls == {"/reserve": 1, "/send": 1}, calls
+    replayed = sum(r.headers.get("Idempotent-Replayed") == "true" for r in responses)
+    print(f"burst: 20 requests, 1 order, {replayed} replayed, downstream calls {dict(calls)}")
+
+    # 3. Key reuse with a different body
+    other = {**BODY, "user_id": "someone-else"}
+    resp = await client.post("/order", json=other, headers={"Idempotency-Key": "k-seq"})
+    assert resp.status_code == 422, resp.text
+    print("reuse with a different body: 422")
+
+    # 4. 504 is not stored; the retry runs again with the same order_id
+    inventory.DELAY_MS = 400
+    resp = await client.post("/order", json=BODY, headers={"Idempotency-Key": "k-timeout"})
+    assert resp.status_code == 504, resp.text
+    pending_id = order._idempotency._entries["k-timeout"].request_id
+    inventory.DELAY_MS = 0
+    resp = await client.post("/order", json=BODY, headers={"Idempotency-Key": "k-timeout"})
+    assert resp.status_code == 200 and resp.json()["order_id"] == pending_id, resp.text
+    assert "Idempotent-Replayed" not in resp.headers
+    print(f"retry after 504: 200 under the same order_id {pending_id}")
+
+    # 5. Out of stock: 409 with the reason, order FAILED, no notification
+    calls.clear()
+    resp = await client.post("/order", json=SCARCE)
+    assert resp.status_code == 200, resp.text
+    resp = await client.post("/order", json=SCARCE, headers={"Idempotency-Key": "k-stock"})
+    assert resp.status_code == 409, resp.text
+    detail = resp.json()["detail"]
+    assert detail["status"] == "FAILED" and "Insufficient stock for fries" in detail["reason"], detail
+    stored = await client.get(f"/order/{detail['order_id']}")
+    assert stored.json()["status"] == "FAILED", stored.text
+    assert calls == {"/reserve": 2, "/send": 1}, calls
+    again = await client.post("/order", json=SCARCE, headers={"Idempotency-Key": "k-stock"})
+    assert again.status_code == 409 and again.json() == resp.json(), again.text
+    assert calls == {"/reserve": 2, "/send": 1}, calls
+    print(f"out of stock: 409 ({detail['reason']}), order {stored.json()['status']}, no notification")
+
+    # Without a key nothing changes: every request is a new order
+    a = await client.post("/order", json=BODY)
+    b = await client.post("/order", json=BODY)
+    assert a.json()["order_id"] != b.json()["order_id"]
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+"""
+Test: inventory resilience in the order service against inventory's own
+delayed (INVENTORY_DELAY_MS) and failing (INVENTORY_FAIL) modes.
+
+Runs the real order and inventory apps in one process (httpx.ASGITransport,
+temp SQLite files), no docker needed:
+1. healthy: orders succeed and the adaptive timeout drops below the cap
+2. slow inventory: attempts time out, the breaker opens, orders then fail
+   fast with 503 + Retry-After instead of waiting for the timeout
+3. recovery: after the reset timeout a half-open probe succeeds and closes it
+4. failing inventory (500): 10 requests' worth of budget (10%) buys
+   exactly one retry, and the next retry is refused
+
+Run from repo root:
+    PYTHONPATH=. python sync-rest/tests/test_resilience.py
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+from fastapi import HTTPException, Response
+
+from common.models import OrderCreateRequest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from inprocess import sync_chain  # noqa: E402
+
+
+async def place(order_app) -> tuple[int, float, dict]:
+    payload = OrderCreateRequest(user_id="resilience-test", items=[{"sku": "burger", "qty": 1}])
+    start = time.perf_counter()
+    try:
+        await order_app.create_order(payload, Response(), None)
+        status, headers = 200, {}
+    except HTTPException as e:
+        status, headers = e.status_code, e.headers or {}
+    return status, (time.perf_counter() - start) * 1000, headers
+
+
+async def main():
+    env = dict(
+        INVENTORY_RESILIENCE="true",
+        INVENTORY_TIMEOUT_MS="1000",
+        CB_FAILURE_THRESHOLD="3",
+        CB_RESET_TIMEOUT_MS="500",
+        RETRY_BUDGET_RATIO="0.1",
+        RETRY_BUDGET_MIN_PER_S="0",
+    )
+    async with sync_chain(env) as chain:
+        await run_checks(chain.order, chain.inventory)
+    print("OK")
+
+
+async def run_checks(order, inventory):
+    breaker, timeout = order._inventory_breaker, order._inventory_timeout
+    from resilience import RETRIES  # order_service/ is on sys.path now
+    allowed = RETRIES.labels("inventory", "allowed")
+    denied = RETRIES.labels("inventory", "budget_exhausted")
+
+    # 1. Healthy: timeout adapts from the 1 s cap down to observed latency
+    results = [await place(order) for _ in range(40)]
+    assert all(r[0] == 200 for r in results), results
+    assert timeout.current() < 1.0, timeout.current()
+    print(f"healthy: 40/40 ok, adaptive timeout {timeout.current() * 1000:.0f} ms, breaker {breaker.state}")
+
+    # 2. Slow inventory: timeouts open the breaker, then orders fail fast
+    inventory.DELAY_MS = 300
+    results = [await place(order) for _ in range(6)]
+    assert breaker.state == "open", breaker.state
+    fast = [r for r in results if r[0] == 503]
+    assert fast and all(r[1] < 50 for r in fast), results
+    assert all("Retry-After" in r[2] for r in fast)
+    print(f"slow: statuses {[r[0] for r in results]}, open-circuit rejections took {max(r[1] for r in fast):.1f} ms max")
+
+    # 3. Recovery: half-open probe after the reset timeout closes the breaker
+    inventory.DELAY_MS = 0
+    await asyncio.sleep(0.6)
+    status, _, _ = await place(order)
+    assert status == 200 and breaker.state == "closed", (status, breaker.state)
+    print(f"recovery: probe ok, breaker {breaker.state}")
+
+    # 4. Failing inventory: the budget holds 10 requests' deposits (ratio 0.1) = one retry.
+    # The breaker threshold is raised so every attempt reaches the retry path.
+    inventory.FAIL = True
+    breaker.failure_threshold = 100
+    budget = order._inventory_retry_budget
+    budget._tokens = 0.0
+    for _ in range(10):
+        budget.deposit()
+    allowed_before, denied_before = allowed.value, denied.value
+    first = await place(order)  # fails, retries once (budget spent), retry fails, next retry refused
+    assert first[0] == 502, first
+    assert (allowed.value - allowed_before, denied.value - denied_before) == (1, 1), (allowed.value, denied.value)
+    second = await place(order)  # its own deposit (0.1) is not enough: no retry
+    assert second[0] == 502, second
+    assert (allowed.value - allowed_before, denied.value - denied_before) == (1, 2), (allowed.value, denied.value)
+    assert breaker.state == "closed", breaker.state
+    print(f"failing: statuses {[first[0], second[0]]}, retries allowed 1, refused 2, breaker {breaker.state}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())